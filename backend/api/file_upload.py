@@ -7,7 +7,7 @@ import logging
 from typing import List, Optional, Dict, Any
 from pathlib import Path
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request
 from fastapi.responses import StreamingResponse, JSONResponse
 from pydantic import BaseModel, Field
 from datetime import datetime, timezone
@@ -67,6 +67,7 @@ async def get_current_user() -> str:
 
 @router.post("/upload", response_model=FileUploadResponse)
 async def upload_file(
+    request: Request,
     file: UploadFile = File(...),
     project_id: Optional[str] = Form(None),
     conversation_id: Optional[str] = Form(None),
@@ -78,6 +79,7 @@ async def upload_file(
     """Upload a file to the system
     
     Args:
+        request: Incoming request, used to reject oversized uploads early
         file: The file to upload
         project_id: Optional project ID to associate with the file
         conversation_id: Optional conversation ID to associate with the file
@@ -101,7 +103,8 @@ async def upload_file(
             file=file,
             uploaded_by=current_user,
             project_id=project_id,
-            conversation_id=conversation_id
+            conversation_id=conversation_id,
+            request=request
         )
         
         # Add additional metadata if provided
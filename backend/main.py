@@ -10,6 +10,7 @@ from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 import uvicorn
 import os
+import sys
 from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 import logging
@@ -85,6 +86,46 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("🛑 Catalyst Backend shutting down...")
+    
+    # Write knowledge base metadata changes still waiting for their flush.
+    # Only a service the app actually loaded is closed; importing the router
+    # here would create one just to close it.
+    kb_router = sys.modules.get("routers.v1.knowledge_base")
+    kb_service = getattr(kb_router, "kb_service", None)
+    if kb_service is None:
+        logger.info("Knowledge base service not loaded; skipping shutdown")
+    else:
+        try:
+            await kb_service.close()
+        except Exception as e:
+            logger.error(f"❌ Knowledge base shutdown failed: {e}")
+    
+    # Release the LLM router's HTTP connection pools and SDK clients
+    llm_router_module = sys.modules.get("services.enhanced_llm_router")
+    llm_router = getattr(llm_router_module, "enhanced_llm_router", None)
+    if llm_router is not None:
+        try:
+            await llm_router.close()
+        except Exception as e:
+            logger.error(f"❌ LLM router shutdown failed: {e}")
+    
+    # Write upload metadata still waiting for its batch
+    file_service_module = sys.modules.get("services.file_storage_service")
+    file_service = getattr(file_service_module, "_service_instance", None)
+    if file_service is not None:
+        try:
+            await file_service.flush_metadata()
+        except Exception as e:
+            logger.error(f"❌ File metadata flush failed: {e}")
+    
+    # Persist queued file access times and release the metadata backend
+    file_db_module = sys.modules.get("services.file_storage_database")
+    file_db = getattr(file_db_module, "_db_instance", None)
+    if file_db is not None:
+        try:
+            await file_db.close()
+        except Exception as e:
+            logger.error(f"❌ File storage database shutdown failed: {e}")
 
 
 # Create FastAPI application
@@ -4,15 +4,19 @@ Supports OpenAI, Mistral, Anthropic, OpenRouter, Ollama, Groq, and Huggingface
 """
 
 import asyncio
+import hashlib
 import logging
 import os
 import time
 import json
-import uuid
 from datetime import datetime, timedelta, timezone
-from typing import Dict, List, Optional, Any, Tuple, Union
+from typing import Dict, Iterator, List, Optional, Any, Tuple, Union
 from dataclasses import dataclass, field
-from collections import defaultdict
+from collections import deque
+from functools import lru_cache
+
+import orjson
+from cachetools import TTLCache
 
 try:
     import httpx
@@ -31,7 +35,7 @@ except ImportError:
     anthropic = None
 
 try:
-    from mistralai.client import MistralClient as MistralAIClient
+    from mistralai.async_client import MistralAsyncClient as MistralAIClient
     from mistralai.models.chat_completion import ChatMessage
 except ImportError:
     MistralAIClient = None
@@ -47,9 +51,41 @@ try:
 except ImportError:
     groq = None
 
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Connection pool for the httpx-based providers: enough keep-alive
+# connections that concurrent calls reuse sockets instead of reconnecting
+_HTTP_LIMITS = httpx.Limits(max_connections=128, max_keepalive_connections=64, keepalive_expiry=60.0) if httpx else None
+
+def _http_timeout(seconds: float):
+    """Overall request timeout with a shorter connect timeout"""
+    return httpx.Timeout(seconds, connect=min(seconds, 10.0))
+
+@lru_cache(maxsize=1)
+def _token_encoding():
+    """Shared tiktoken encoding, loaded on first use"""
+    return tiktoken.get_encoding("cl100k_base")
+
+def _estimate_tokens(text: str) -> int:
+    """Token count for providers that don't report usage; whitespace-separated
+    words when tiktoken is not installed"""
+    if tiktoken is not None:
+        return len(_token_encoding().encode(text, disallowed_special=()))
+    return len(text.split())
+
+# Days of per-provider usage aggregates the router keeps
+_USAGE_METRICS_DAYS = 31
+
+# Responses kept for use_cache requests, and for how long (seconds)
+_RESPONSE_CACHE_SIZE = 10_000
+_RESPONSE_CACHE_TTL = 3600
+
 # Define classes for AI provider management
 class AIProviderType:
     OPENAI = "openai"
@@ -73,7 +109,7 @@ class AIProviderType:
                 cls.OLLAMA, cls.GROQ, cls.HUGGINGFACE, cls.GOOGLE, cls.GEMINI, 
                 cls.DEEPSEEK]
 
-@dataclass
+@dataclass(slots=True)
 class AIResponse:
     """Response object from AI providers"""
     content: str
@@ -89,7 +125,7 @@ class AIResponse:
     metadata: Dict[str, Any] = field(default_factory=dict)
     response_time_ms: Optional[float] = None
 
-@dataclass
+@dataclass(slots=True)
 class ProviderTestResult:
     """Response object for provider connectivity tests"""
     success: bool
@@ -101,7 +137,7 @@ class ProviderTestResult:
     message: Optional[str] = None
     response_time_ms: Optional[float] = None
 
-@dataclass 
+@dataclass(slots=True)
 class AIRequest:
     """Request object for AI providers"""
     messages: List[Dict[str, str]]
@@ -113,7 +149,7 @@ class AIRequest:
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+@dataclass(slots=True)
 class ProviderConfig:
     """Configuration for a provider"""
     provider_type: AIProviderType
@@ -127,15 +163,48 @@ class ProviderConfig:
     max_retries: int = 3
     rate_limit_rpm: int = 60  # requests per minute
     confidence_score: float = 0.8
+    input_cost_per_1k: float = 0.0
+    output_cost_per_1k: float = 0.0
+    cached_input_cost_per_1k: Optional[float] = None  # defaults to half the input rate
+
+class TokenBucket:
+    """Token bucket rate limiter for concurrent callers.
+    
+    Each caller takes a token, borrowing against the refill when the bucket is
+    empty, and sleeps off its own debt - callers queue in arrival order without
+    holding a lock while they wait.
+    """
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate  # tokens per second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+    
+    async def acquire(self):
+        """Take a token, waiting until it has been refilled if necessary"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate) - 1
+        self._last = now
+        if self._tokens < 0:
+            await asyncio.sleep(-self._tokens / self.rate)
 
 class BaseProviderClient:
     """Base class for AI provider clients"""
     
-    def __init__(self, config: ProviderConfig):
+    # Whether the client sends its requests through the shared http_client
+    uses_shared_http_client = False
+    
+    def __init__(self, config: ProviderConfig, http_client: Optional["httpx.AsyncClient"] = None):
         self.config = config
         self.client = None
+        # Connection pool shared with other providers; owned by the router
+        self.http_client = http_client
         self._last_request_time = 0
         self._request_count = 0
+        # Allow up to one second's worth of requests in a burst
+        rate = config.rate_limit_rpm / 60
+        self._rate_limiter = TokenBucket(rate, max(rate, 1.0))
         self._initialize_client()
     
     def _initialize_client(self):
@@ -171,9 +240,9 @@ class BaseProviderClient:
                 )
             
             # Basic connectivity test
-            start_time = time.time()
+            start_time = time.perf_counter()
             await asyncio.sleep(0.1)  # Simulate network latency
-            latency = time.time() - start_time
+            latency = time.perf_counter() - start_time
             
             return ProviderTestResult(
                 success=True,
@@ -189,24 +258,44 @@ class BaseProviderClient:
                 timestamp=datetime.now(timezone.utc)
             )
     
-    def _rate_limit_check(self) -> bool:
-        """Check if request is within rate limits"""
-        current_time = time.time()
-        
-        # Simple rate limiting implementation
-        if current_time - self._last_request_time < 60 / self.config.rate_limit_rpm:
-            return False
-        
-        self._last_request_time = current_time
-        return True
+    async def _wait_for_rate_limit(self):
+        """Wait until the request fits the provider's rate limit"""
+        await self._rate_limiter.acquire()
+        self._last_request_time = time.time()
+        self._request_count += 1
+    
+    def _calculate_cost(self, input_tokens: int, output_tokens: int, model: str,
+                        cached_input_tokens: int = 0) -> float:
+        """Calculate cost for the request; cached_input_tokens are the part of
+        input_tokens read from the provider's prompt cache - override in subclasses"""
+        cached_rate = self.config.cached_input_cost_per_1k
+        if cached_rate is None:
+            cached_rate = self.config.input_cost_per_1k / 2
+        return (
+            (input_tokens - cached_input_tokens) * self.config.input_cost_per_1k
+            + cached_input_tokens * cached_rate
+            + output_tokens * self.config.output_cost_per_1k
+        ) / 1000
     
-    def _calculate_cost(self, input_tokens: int, output_tokens: int, model: str) -> float:
-        """Calculate cost for the request - override in subclasses"""
-        return 0.0
+    async def aclose(self):
+        """Close the underlying client and its connection pool"""
+        if self.uses_shared_http_client and self.http_client is not None:
+            return  # the shared pool is closed by its owner
+        close = getattr(self.client, "aclose", None) or getattr(self.client, "close", None)
+        if close is not None and asyncio.iscoroutinefunction(close):
+            await close()
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
 
 class OpenAIClient(BaseProviderClient):
     """OpenAI provider client"""
     
+    uses_shared_http_client = True
+    
     def _initialize_client(self):
         if not openai:
             raise ImportError("OpenAI library not installed")
@@ -214,19 +303,19 @@ class OpenAIClient(BaseProviderClient):
         if not self.config.api_key:
             raise ValueError("OpenAI API key not configured")
         
-        self.client = openai.OpenAI(
+        self.client = openai.AsyncOpenAI(
             api_key=self.config.api_key,
-            base_url=self.config.base_url if self.config.base_url != "https://api.openai.com/v1" else None
+            base_url=self.config.base_url if self.config.base_url != "https://api.openai.com/v1" else None,
+            http_client=self.http_client
         )
     
     async def generate_response(self, request: Dict[str, Any]) -> AIResponse:
         """Generate response using OpenAI"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         model = request.get("model", self.config.default_model)
         
         try:
-            if not self._rate_limit_check():
-                await asyncio.sleep(0.1)
+            await self._wait_for_rate_limit()
             
             # Prepare messages
             messages = []
@@ -237,32 +326,54 @@ class OpenAIClient(BaseProviderClient):
                 })
             
             # Make API call
-            response = await asyncio.to_thread(
-                self.client.chat.completions.create,
+            params = dict(
                 model=model,
                 messages=messages,
                 max_tokens=request.get("max_tokens", 1000),
-                temperature=request.get("temperature", 0.7),
-                stream=False
+                temperature=request.get("temperature", 0.7)
             )
+            ttft_ms = None
+            if request.get("stream"):
+                # Stream to measure time to first token; usage arrives in a final chunk
+                stream = await self.client.chat.completions.create(
+                    **params, stream=True, extra_body={"stream_options": {"include_usage": True}}
+                )
+                parts = []
+                usage = None
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        if ttft_ms is None:
+                            ttft_ms = (time.perf_counter() - start_time) * 1000
+                        parts.append(chunk.choices[0].delta.content)
+                    usage = getattr(chunk, "usage", None) or usage
+                content = "".join(parts)
+                if usage is None:
+                    usage = openai.types.CompletionUsage(prompt_tokens=0, completion_tokens=0, total_tokens=0)
+            else:
+                response = await self.client.chat.completions.create(**params, stream=False)
+                content, usage = response.choices[0].message.content, response.usage
             
             # Calculate metrics
-            response_time = (time.time() - start_time) * 1000
-            usage = response.usage
-            cost = self._calculate_cost(usage.prompt_tokens, usage.completion_tokens, model)
+            response_time = (time.perf_counter() - start_time) * 1000
+            # Prompt prefixes served from OpenAI's automatic prompt cache
+            cached_tokens = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None) or 0
+            cost = self._calculate_cost(usage.prompt_tokens, usage.completion_tokens, model, cached_tokens)
             
             return AIResponse(
-                content=response.choices[0].message.content,
+                content=content,
                 provider=self.config.provider_type,
                 model=model,
+                metadata={"ttft_ms": ttft_ms} if ttft_ms is not None else {},
                 usage={
                     "prompt_tokens": usage.prompt_tokens,
                     "completion_tokens": usage.completion_tokens,
-                    "total_tokens": usage.total_tokens
+                    "total_tokens": usage.total_tokens,
+                    "cached_tokens": cached_tokens
                 },
                 cost=cost,
                 latency=response_time / 1000,  # Convert to seconds
-                timestamp=datetime.now(timezone.utc)
+                timestamp=datetime.now(timezone.utc),
+                response_time_ms=response_time
             )
             
         except Exception as e:
@@ -271,17 +382,16 @@ class OpenAIClient(BaseProviderClient):
     
     async def test_connection(self) -> ProviderTestResult:
         """Test OpenAI connectivity"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         try:
-            response = await asyncio.to_thread(
-                self.client.chat.completions.create,
+            response = await self.client.chat.completions.create(
                 model=self.config.default_model,
                 messages=[{"role": "user", "content": "Hello"}],
                 max_tokens=10
             )
             
-            response_time = (time.time() - start_time) * 1000
+            response_time = (time.perf_counter() - start_time) * 1000
             
             return ProviderTestResult(
                 provider_id=0,
@@ -300,8 +410,8 @@ class OpenAIClient(BaseProviderClient):
                 provider_type=AIProviderType.OPENAI,
                 success=False,
                 message=str(e),
-                response_time_ms=(time.time() - start_time) * 1000,
-                latency=(time.time() - start_time),
+                response_time_ms=(time.perf_counter() - start_time) * 1000,
+                latency=(time.perf_counter() - start_time),
                 error=str(e),
                 timestamp=datetime.now(timezone.utc)
             )
@@ -309,6 +419,8 @@ class OpenAIClient(BaseProviderClient):
 class AnthropicClient(BaseProviderClient):
     """Anthropic provider client"""
     
+    uses_shared_http_client = True
+    
     def _initialize_client(self):
         if not anthropic:
             raise ImportError("Anthropic library not installed")
@@ -316,16 +428,15 @@ class AnthropicClient(BaseProviderClient):
         if not self.config.api_key:
             raise ValueError("Anthropic API key not configured")
         
-        self.client = anthropic.Anthropic(api_key=self.config.api_key)
+        self.client = anthropic.AsyncAnthropic(api_key=self.config.api_key, http_client=self.http_client)
     
     async def generate_response(self, request: Dict[str, Any]) -> AIResponse:
         """Generate response using Anthropic"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         model = request.get("model", self.config.default_model)
         
         try:
-            if not self._rate_limit_check():
-                await asyncio.sleep(0.1)
+            await self._wait_for_rate_limit()
             
             # Prepare messages for Anthropic format
             system_message = ""
@@ -340,21 +451,40 @@ class AnthropicClient(BaseProviderClient):
                         "content": msg.get("content", "")
                     })
             
+            # Mark the system prompt as a cacheable prefix so repeated
+            # requests read it from Anthropic's prompt cache
+            system = [{
+                "type": "text",
+                "text": system_message,
+                "cache_control": {"type": "ephemeral"}
+            }] if system_message else None
+            
             # Make API call
-            response = await asyncio.to_thread(
-                self.client.messages.create,
+            params = dict(
                 model=model,
                 max_tokens=request.get("max_tokens", 1000),
                 temperature=request.get("temperature", 0.7),
-                system=system_message if system_message else None,
+                system=system,
                 messages=user_messages
             )
+            ttft_ms = None
+            if request.get("stream"):
+                # Stream to measure time to first token, then use the assembled message
+                async with self.client.messages.stream(**params) as stream:
+                    async for _ in stream.text_stream:
+                        if ttft_ms is None:
+                            ttft_ms = (time.perf_counter() - start_time) * 1000
+                    response = await stream.get_final_message()
+            else:
+                response = await self.client.messages.create(**params)
             
-            # Calculate metrics
-            response_time = (time.time() - start_time) * 1000
-            input_tokens = response.usage.input_tokens
+            # Calculate metrics; input_tokens excludes cache reads and writes
+            response_time = (time.perf_counter() - start_time) * 1000
+            cache_read_tokens = getattr(response.usage, "cache_read_input_tokens", None) or 0
+            cache_write_tokens = getattr(response.usage, "cache_creation_input_tokens", None) or 0
+            input_tokens = response.usage.input_tokens + cache_read_tokens + cache_write_tokens
             output_tokens = response.usage.output_tokens
-            cost = self._calculate_cost(input_tokens, output_tokens, model)
+            cost = self._calculate_cost(input_tokens, output_tokens, model, cache_read_tokens)
             
             return AIResponse(
                 content=response.content[0].text,
@@ -364,14 +494,19 @@ class AnthropicClient(BaseProviderClient):
                 analysis_type=request.get("analysis_type", "general"),
                 metadata={
                     "stop_reason": response.stop_reason,
-                    "stop_sequence": response.stop_sequence
+                    "stop_sequence": response.stop_sequence,
+                    **({"ttft_ms": ttft_ms} if ttft_ms is not None else {})
                 },
                 usage={
                     "input_tokens": input_tokens,
                     "output_tokens": output_tokens,
-                    "total_tokens": input_tokens + output_tokens
+                    "total_tokens": input_tokens + output_tokens,
+                    "cache_read_input_tokens": cache_read_tokens,
+                    "cache_creation_input_tokens": cache_write_tokens
                 },
                 cost=cost,
+                latency=response_time / 1000,
+                timestamp=datetime.now(timezone.utc),
                 response_time_ms=response_time
             )
             
@@ -381,17 +516,16 @@ class AnthropicClient(BaseProviderClient):
     
     async def test_connection(self) -> ProviderTestResult:
         """Test Anthropic connectivity"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         try:
-            response = await asyncio.to_thread(
-                self.client.messages.create,
+            response = await self.client.messages.create(
                 model=self.config.default_model,
                 max_tokens=10,
                 messages=[{"role": "user", "content": "Hello"}]
             )
             
-            response_time = (time.time() - start_time) * 1000
+            response_time = (time.perf_counter() - start_time) * 1000
             
             return ProviderTestResult(
                 provider_id=0,
@@ -408,7 +542,7 @@ class AnthropicClient(BaseProviderClient):
                 provider_type=AIProviderType.ANTHROPIC.value,
                 success=False,
                 message=str(e),
-                response_time_ms=(time.time() - start_time) * 1000,
+                response_time_ms=(time.perf_counter() - start_time) * 1000,
                 timestamp=datetime.now(timezone.utc).isoformat()
             )
 
@@ -426,12 +560,11 @@ class MistralClient(BaseProviderClient):
     
     async def generate_response(self, request: Dict[str, Any]) -> AIResponse:
         """Generate response using Mistral"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         model = request.get("model", self.config.default_model)
         
         try:
-            if not self._rate_limit_check():
-                await asyncio.sleep(0.1)
+            await self._wait_for_rate_limit()
             
             # Prepare messages
             messages = []
@@ -442,8 +575,7 @@ class MistralClient(BaseProviderClient):
                 ))
             
             # Make API call
-            response = await asyncio.to_thread(
-                self.client.chat,
+            response = await self.client.chat(
                 model=model,
                 messages=messages,
                 max_tokens=request.get("max_tokens", 1000),
@@ -451,7 +583,7 @@ class MistralClient(BaseProviderClient):
             )
             
             # Calculate metrics
-            response_time = (time.time() - start_time) * 1000
+            response_time = (time.perf_counter() - start_time) * 1000
             usage = response.usage
             cost = self._calculate_cost(usage.prompt_tokens, usage.completion_tokens, model)
             
@@ -470,6 +602,8 @@ class MistralClient(BaseProviderClient):
                     "total_tokens": usage.total_tokens
                 },
                 cost=cost,
+                latency=response_time / 1000,
+                timestamp=datetime.now(timezone.utc),
                 response_time_ms=response_time
             )
             
@@ -479,17 +613,16 @@ class MistralClient(BaseProviderClient):
     
     async def test_connection(self) -> ProviderTestResult:
         """Test Mistral connectivity"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         try:
-            response = await asyncio.to_thread(
-                self.client.chat,
+            response = await self.client.chat(
                 model=self.config.default_model,
                 messages=[ChatMessage(role="user", content="Hello")],
                 max_tokens=10
             )
             
-            response_time = (time.time() - start_time) * 1000
+            response_time = (time.perf_counter() - start_time) * 1000
             
             return ProviderTestResult(
                 provider_id=0,
@@ -506,13 +639,15 @@ class MistralClient(BaseProviderClient):
                 provider_type=AIProviderType.MISTRAL.value,
                 success=False,
                 message=str(e),
-                response_time_ms=(time.time() - start_time) * 1000,
+                response_time_ms=(time.perf_counter() - start_time) * 1000,
                 timestamp=datetime.now(timezone.utc).isoformat()
             )
 
 class OpenRouterClient(BaseProviderClient):
     """OpenRouter provider client (OpenAI-compatible)"""
     
+    uses_shared_http_client = True
+    
     def _initialize_client(self):
         if not openai:
             raise ImportError("OpenAI library required for OpenRouter")
@@ -520,19 +655,19 @@ class OpenRouterClient(BaseProviderClient):
         if not self.config.api_key:
             raise ValueError("OpenRouter API key not configured")
         
-        self.client = openai.OpenAI(
+        self.client = openai.AsyncOpenAI(
             api_key=self.config.api_key,
-            base_url=self.config.base_url
+            base_url=self.config.base_url,
+            http_client=self.http_client
         )
     
     async def generate_response(self, request: Dict[str, Any]) -> AIResponse:
         """Generate response using OpenRouter"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         model = request.get("model", self.config.default_model)
         
         try:
-            if not self._rate_limit_check():
-                await asyncio.sleep(0.1)
+            await self._wait_for_rate_limit()
             
             # Prepare messages
             messages = []
@@ -543,8 +678,7 @@ class OpenRouterClient(BaseProviderClient):
                 })
             
             # Make API call with OpenRouter-specific headers
-            response = await asyncio.to_thread(
-                self.client.chat.completions.create,
+            response = await self.client.chat.completions.create(
                 model=model,
                 messages=messages,
                 max_tokens=request.get("max_tokens", 1000),
@@ -556,7 +690,7 @@ class OpenRouterClient(BaseProviderClient):
             )
             
             # Calculate metrics
-            response_time = (time.time() - start_time) * 1000
+            response_time = (time.perf_counter() - start_time) * 1000
             usage = response.usage
             cost = self._calculate_cost(usage.prompt_tokens, usage.completion_tokens, model)
             
@@ -576,6 +710,8 @@ class OpenRouterClient(BaseProviderClient):
                     "total_tokens": usage.total_tokens
                 },
                 cost=cost,
+                latency=response_time / 1000,
+                timestamp=datetime.now(timezone.utc),
                 response_time_ms=response_time
             )
             
@@ -585,17 +721,16 @@ class OpenRouterClient(BaseProviderClient):
     
     async def test_connection(self) -> ProviderTestResult:
         """Test OpenRouter connectivity"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         try:
-            response = await asyncio.to_thread(
-                self.client.chat.completions.create,
+            response = await self.client.chat.completions.create(
                 model=self.config.default_model,
                 messages=[{"role": "user", "content": "Hello"}],
                 max_tokens=10
             )
             
-            response_time = (time.time() - start_time) * 1000
+            response_time = (time.perf_counter() - start_time) * 1000
             
             return ProviderTestResult(
                 provider_id=0,
@@ -612,7 +747,7 @@ class OpenRouterClient(BaseProviderClient):
                 provider_type=AIProviderType.OPENROUTER.value,
                 success=False,
                 message=str(e),
-                response_time_ms=(time.time() - start_time) * 1000,
+                response_time_ms=(time.perf_counter() - start_time) * 1000,
                 timestamp=datetime.now(timezone.utc).isoformat()
             )
 
@@ -623,16 +758,15 @@ class OllamaClient(BaseProviderClient):
         # Ollama doesn't require a client library, just HTTP requests
         if not httpx:
             raise ImportError("httpx library not installed")
-        self.client = httpx.AsyncClient(timeout=self.config.timeout)
+        self.client = httpx.AsyncClient(timeout=_http_timeout(self.config.timeout), limits=_HTTP_LIMITS)
     
     async def generate_response(self, request: Dict[str, Any]) -> AIResponse:
         """Generate response using Ollama"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         model = request.get("model", self.config.default_model)
         
         try:
-            if not self._rate_limit_check():
-                await asyncio.sleep(0.1)
+            await self._wait_for_rate_limit()
             
             # Use Ollama's chat API format
             messages = []
@@ -657,10 +791,10 @@ class OllamaClient(BaseProviderClient):
             )
             
             response.raise_for_status()
-            result = response.json()
+            result = orjson.loads(response.content)
             
             # Calculate metrics
-            response_time = (time.time() - start_time) * 1000
+            response_time = (time.perf_counter() - start_time) * 1000
             
             # Extract response content
             content = ""
@@ -698,14 +832,14 @@ class OllamaClient(BaseProviderClient):
     
     async def test_connection(self) -> ProviderTestResult:
         """Test Ollama connectivity"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         try:
             # Test with the /api/tags endpoint to check if Ollama is running
             response = await self.client.get(f"{self.config.base_url}/api/tags")
             response.raise_for_status()
             
-            response_time = (time.time() - start_time) * 1000
+            response_time = (time.perf_counter() - start_time) * 1000
             
             return ProviderTestResult(
                 provider_id=0,
@@ -724,21 +858,17 @@ class OllamaClient(BaseProviderClient):
                 provider_type=AIProviderType.OLLAMA,
                 success=False,
                 message=str(e),
-                response_time_ms=(time.time() - start_time) * 1000,
-                latency=(time.time() - start_time),
+                response_time_ms=(time.perf_counter() - start_time) * 1000,
+                latency=(time.perf_counter() - start_time),
                 error=str(e),
                 timestamp=datetime.now(timezone.utc)
             )
-    
-    async def __aenter__(self):
-        return self
-    
-    async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.client.aclose()
 
 class GroqClient(BaseProviderClient):
     """Groq provider client (OpenAI-compatible)"""
     
+    uses_shared_http_client = True
+    
     def _initialize_client(self):
         if not openai:
             raise ImportError("OpenAI library required for Groq")
@@ -746,19 +876,19 @@ class GroqClient(BaseProviderClient):
         if not self.config.api_key:
             raise ValueError("Groq API key not configured")
         
-        self.client = openai.OpenAI(
+        self.client = openai.AsyncOpenAI(
             api_key=self.config.api_key,
-            base_url=self.config.base_url
+            base_url=self.config.base_url,
+            http_client=self.http_client
         )
     
     async def generate_response(self, request: Dict[str, Any]) -> AIResponse:
         """Generate response using Groq"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         model = request.get("model", self.config.default_model)
         
         try:
-            if not self._rate_limit_check():
-                await asyncio.sleep(0.1)
+            await self._wait_for_rate_limit()
             
             # Prepare messages
             messages = []
@@ -769,8 +899,7 @@ class GroqClient(BaseProviderClient):
                 })
             
             # Make API call
-            response = await asyncio.to_thread(
-                self.client.chat.completions.create,
+            response = await self.client.chat.completions.create(
                 model=model,
                 messages=messages,
                 max_tokens=request.get("max_tokens", 1000),
@@ -778,7 +907,7 @@ class GroqClient(BaseProviderClient):
             )
             
             # Calculate metrics
-            response_time = (time.time() - start_time) * 1000
+            response_time = (time.perf_counter() - start_time) * 1000
             usage = response.usage
             cost = self._calculate_cost(usage.prompt_tokens, usage.completion_tokens, model)
             
@@ -798,6 +927,8 @@ class GroqClient(BaseProviderClient):
                     "total_tokens": usage.total_tokens
                 },
                 cost=cost,
+                latency=response_time / 1000,
+                timestamp=datetime.now(timezone.utc),
                 response_time_ms=response_time
             )
             
@@ -807,17 +938,16 @@ class GroqClient(BaseProviderClient):
     
     async def test_connection(self) -> ProviderTestResult:
         """Test Groq connectivity"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         try:
-            response = await asyncio.to_thread(
-                self.client.chat.completions.create,
+            response = await self.client.chat.completions.create(
                 model=self.config.default_model,
                 messages=[{"role": "user", "content": "Hello"}],
                 max_tokens=10
             )
             
-            response_time = (time.time() - start_time) * 1000
+            response_time = (time.perf_counter() - start_time) * 1000
             
             return ProviderTestResult(
                 provider_id=0,
@@ -834,7 +964,7 @@ class GroqClient(BaseProviderClient):
                 provider_type=AIProviderType.GROQ.value,
                 success=False,
                 message=str(e),
-                response_time_ms=(time.time() - start_time) * 1000,
+                response_time_ms=(time.perf_counter() - start_time) * 1000,
                 timestamp=datetime.now(timezone.utc).isoformat()
             )
 
@@ -843,18 +973,18 @@ class HuggingFaceClient(BaseProviderClient):
     
     def _initialize_client(self):
         self.client = httpx.AsyncClient(
-            timeout=self.config.timeout,
+            timeout=_http_timeout(self.config.timeout),
+            limits=_HTTP_LIMITS,
             headers={"Authorization": f"Bearer {self.config.api_key}"} if self.config.api_key else {}
         )
     
     async def generate_response(self, request: Dict[str, Any]) -> AIResponse:
         """Generate response using Hugging Face Inference API"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         model = request.get("model", self.config.default_model)
         
         try:
-            if not self._rate_limit_check():
-                await asyncio.sleep(0.1)
+            await self._wait_for_rate_limit()
             
             # Prepare input text from messages
             input_text = ""
@@ -882,10 +1012,10 @@ class HuggingFaceClient(BaseProviderClient):
             )
             
             response.raise_for_status()
-            result = response.model_dump_json()
+            result = orjson.loads(response.content)
             
             # Calculate metrics
-            response_time = (time.time() - start_time) * 1000
+            response_time = (time.perf_counter() - start_time) * 1000
             
             # Extract generated text
             generated_text = ""
@@ -896,6 +1026,10 @@ class HuggingFaceClient(BaseProviderClient):
                     if generated_text.startswith(input_text):
                         generated_text = generated_text[len(input_text):].strip()
             
+            # Estimate token usage (the Inference API doesn't report counts)
+            prompt_tokens = _estimate_tokens(input_text)
+            completion_tokens = _estimate_tokens(generated_text)
+            
             return AIResponse(
                 content=generated_text,
                 provider=AIProviderType.HUGGINGFACE,
@@ -906,11 +1040,13 @@ class HuggingFaceClient(BaseProviderClient):
                     "model_loaded": True
                 },
                 usage={
-                    "prompt_tokens": len(input_text.split()),
-                    "completion_tokens": len(generated_text.split()),
-                    "total_tokens": len(input_text.split()) + len(generated_text.split())
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens
                 },
                 cost=0.0,  # Hugging Face Inference API is often free
+                latency=response_time / 1000,
+                timestamp=datetime.now(timezone.utc),
                 response_time_ms=response_time
             )
             
@@ -920,18 +1056,18 @@ class HuggingFaceClient(BaseProviderClient):
     
     async def test_connection(self) -> ProviderTestResult:
         """Test Hugging Face connectivity"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         try:
             # Test with a simple model info request
             response = await self.client.get(f"{self.config.base_url}/models/{self.config.default_model}")
             response.raise_for_status()
             
-            response_time = (time.time() - start_time) * 1000
+            response_time = (time.perf_counter() - start_time) * 1000
             
             return ProviderTestResult(
                 provider_id=0,
-                provider_type=AIProviderType.HUGGINGFACE.value,
+                provider_type=AIProviderType.HUGGINGFACE,
                 success=True,
                 message="Connection successful",
                 response_time_ms=response_time,
@@ -941,18 +1077,12 @@ class HuggingFaceClient(BaseProviderClient):
         except Exception as e:
             return ProviderTestResult(
                 provider_id=0,
-                provider_type=AIProviderType.HUGGINGFACE.value,
+                provider_type=AIProviderType.HUGGINGFACE,
                 success=False,
                 message=str(e),
-                response_time_ms=(time.time() - start_time) * 1000,
+                response_time_ms=(time.perf_counter() - start_time) * 1000,
                 timestamp=datetime.now(timezone.utc).isoformat()
             )
-    
-    async def __aenter__(self):
-        return self
-    
-    async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.client.aclose()
 
 class GoogleGeminiClient(BaseProviderClient):
     """Google Gemini provider client"""
@@ -969,12 +1099,11 @@ class GoogleGeminiClient(BaseProviderClient):
     
     async def generate_response(self, request: Dict[str, Any]) -> AIResponse:
         """Generate response using Google Gemini"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         model_name = request.get("model", self.config.default_model or "gemini-pro")
         
         try:
-            if not self._rate_limit_check():
-                await asyncio.sleep(0.1)
+            await self._wait_for_rate_limit()
             
             # Create a new model instance if needed
             if model_name != (self.config.default_model or "gemini-pro"):
@@ -1001,21 +1130,20 @@ class GoogleGeminiClient(BaseProviderClient):
             )
             
             # Make API call
-            response = await asyncio.to_thread(
-                model.generate_content,
+            response = await model.generate_content_async(
                 input_text,
                 generation_config=generation_config
             )
             
             # Calculate metrics
-            response_time = (time.time() - start_time) * 1000
+            response_time = (time.perf_counter() - start_time) * 1000
             
             # Extract content
             content = response.text if response.text else ""
             
             # Estimate token usage (Gemini doesn't provide exact counts)
-            prompt_tokens = len(input_text.split())
-            completion_tokens = len(content.split())
+            prompt_tokens = _estimate_tokens(input_text)
+            completion_tokens = _estimate_tokens(content)
             
             return AIResponse(
                 content=content,
@@ -1041,15 +1169,14 @@ class GoogleGeminiClient(BaseProviderClient):
     
     async def test_connection(self) -> ProviderTestResult:
         """Test Google Gemini connectivity"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         try:
-            response = await asyncio.to_thread(
-                self.client.generate_content,
+            response = await self.client.generate_content_async(
                 "Hello",
             )
             
-            response_time = (time.time() - start_time) * 1000
+            response_time = (time.perf_counter() - start_time) * 1000
             
             return ProviderTestResult(
                 success=True,
@@ -1064,12 +1191,12 @@ class GoogleGeminiClient(BaseProviderClient):
         except Exception as e:
             return ProviderTestResult(
                 success=False,
-                latency=(time.time() - start_time),
+                latency=(time.perf_counter() - start_time),
                 error=str(e),
                 timestamp=datetime.now(timezone.utc),
                 provider_type=AIProviderType.GEMINI,
                 message=str(e),
-                response_time_ms=(time.time() - start_time) * 1000
+                response_time_ms=(time.perf_counter() - start_time) * 1000
             )
 
 class DeepseekClient(BaseProviderClient):
@@ -1083,7 +1210,8 @@ class DeepseekClient(BaseProviderClient):
             raise ValueError("Deepseek API key not configured")
         
         self.client = httpx.AsyncClient(
-            timeout=self.config.timeout,
+            timeout=_http_timeout(self.config.timeout),
+            limits=_HTTP_LIMITS,
             headers={
                 "Authorization": f"Bearer {self.config.api_key}",
                 "Content-Type": "application/json"
@@ -1093,12 +1221,11 @@ class DeepseekClient(BaseProviderClient):
     
     async def generate_response(self, request: Dict[str, Any]) -> AIResponse:
         """Generate response using Deepseek"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         model = request.get("model", self.config.default_model or "deepseek-chat")
         
         try:
-            if not self._rate_limit_check():
-                await asyncio.sleep(0.1)
+            await self._wait_for_rate_limit()
             
             # Prepare messages
             messages = []
@@ -1121,10 +1248,10 @@ class DeepseekClient(BaseProviderClient):
             )
             
             response.raise_for_status()
-            result = response.json()
+            result = orjson.loads(response.content)
             
             # Calculate metrics
-            response_time = (time.time() - start_time) * 1000
+            response_time = (time.perf_counter() - start_time) * 1000
             usage = result.get("usage", {})
             
             return AIResponse(
@@ -1151,7 +1278,7 @@ class DeepseekClient(BaseProviderClient):
     
     async def test_connection(self) -> ProviderTestResult:
         """Test Deepseek connectivity"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         try:
             response = await self.client.post(
@@ -1164,7 +1291,7 @@ class DeepseekClient(BaseProviderClient):
             )
             
             response.raise_for_status()
-            response_time = (time.time() - start_time) * 1000
+            response_time = (time.perf_counter() - start_time) * 1000
             
             return ProviderTestResult(
                 success=True,
@@ -1179,19 +1306,13 @@ class DeepseekClient(BaseProviderClient):
         except Exception as e:
             return ProviderTestResult(
                 success=False,
-                latency=(time.time() - start_time),
+                latency=(time.perf_counter() - start_time),
                 error=str(e),
                 timestamp=datetime.now(timezone.utc),
                 provider_type=AIProviderType.DEEPSEEK,
                 message=str(e),
-                response_time_ms=(time.time() - start_time) * 1000
+                response_time_ms=(time.perf_counter() - start_time) * 1000
             )
-    
-    async def __aenter__(self):
-        return self
-    
-    async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.client.aclose()
 
 class EnhancedLLMRouter:
     """Enhanced LLM Router supporting multiple providers"""
@@ -1199,8 +1320,19 @@ class EnhancedLLMRouter:
     def __init__(self):
         self.clients: Dict[AIProviderType, BaseProviderClient] = {}
         self.provider_configs: Dict[AIProviderType, ProviderConfig] = {}
-        self.usage_metrics: Dict[str, Any] = defaultdict(dict)
-        self.response_cache: Dict[str, AIResponse] = {}
+        # Registered providers by ascending priority, kept up to date by add_client
+        self._provider_order: Tuple[str, ...] = ()
+        # analysis_type -> provider to try first for requests of that type
+        self.analysis_routes: Dict[str, str] = {}
+        self.usage_metrics: Dict[str, Dict[str, Any]] = {}
+        # Days with usage_metrics entries, oldest first; (next UTC midnight, date) of the current one
+        self._usage_days: deque = deque()
+        self._usage_day: Tuple[float, str] = (0.0, "")
+        self.response_cache: TTLCache = TTLCache(maxsize=_RESPONSE_CACHE_SIZE, ttl=_RESPONSE_CACHE_TTL)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # One keep-alive pool for the SDK-based providers (OpenAI-compatible and Anthropic)
+        self._http_client = httpx.AsyncClient(limits=_HTTP_LIMITS, timeout=_http_timeout(60.0)) if httpx else None
         self._initialize_providers()
     
     def _initialize_providers(self):
@@ -1302,14 +1434,20 @@ class EnhancedLLMRouter:
                 try:
                     client_class = client_classes.get(provider_type)
                     if client_class:
-                        self.clients[provider_type] = client_class(config)
-                        self.provider_configs[provider_type] = config
+                        self.add_client(client_class(config, http_client=self._http_client))
                         logger.info(f"Initialized {provider_type} client")
                     else:
                         logger.warning(f"No client class found for {provider_type}")
                 except Exception as e:
                     logger.warning(f"Failed to initialize {provider_type} client: {str(e)}")
     
+    def add_client(self, client: BaseProviderClient):
+        """Register a provider client, replacing any client of the same type"""
+        provider_type = client.config.provider_type
+        self.clients[provider_type] = client
+        self.provider_configs[provider_type] = client.config
+        self._provider_order = tuple(sorted(self.clients, key=lambda pt: self.provider_configs[pt].priority))
+    
     async def generate_response(self, request: Dict[str, Any]) -> AIResponse:
         """Generate response using the best available provider"""
         # Select provider based on request preferences and availability
@@ -1320,8 +1458,18 @@ class EnhancedLLMRouter:
         
         client = self.clients[provider_type]
         
+        # Callers opt in to reusing an identical earlier request's response
+        cache_key = self._generate_cache_key(request) if request.get("use_cache") else None
+        if cache_key is not None:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                self.cache_hits += 1
+                return cached
+            self.cache_misses += 1
+        
         # Generate response with retries
         max_retries = self.provider_configs[provider_type].max_retries
+        fallbacks = None
         for attempt in range(max_retries):
             try:
                 response = await client.generate_response(request)
@@ -1329,15 +1477,19 @@ class EnhancedLLMRouter:
                 # Record usage metrics
                 self._record_usage(provider_type, response)
                 
+                if cache_key is not None:
+                    self.response_cache[cache_key] = response
                 return response
                 
             except Exception as e:
                 logger.warning(f"Attempt {attempt + 1} failed for {provider_type}: {str(e)}")
                 
                 if attempt < max_retries - 1:
-                    # Try fallback provider
-                    fallback_provider = self._get_fallback_provider(provider_type)
-                    if fallback_provider and fallback_provider in self.clients:
+                    # Try the remaining providers in priority order
+                    if fallbacks is None:
+                        fallbacks = self._fallback_providers(provider_type)
+                    fallback_provider = next(fallbacks, None)
+                    if fallback_provider is not None:
                         provider_type = fallback_provider
                         client = self.clients[provider_type]
                         logger.info(f"Falling back to {provider_type}")
@@ -1348,53 +1500,120 @@ class EnhancedLLMRouter:
         
         raise Exception("All retry attempts failed")
     
+    async def generate_many(self, requests: List[Dict[str, Any]],
+                            max_concurrency: int = 16) -> List[Union[AIResponse, Exception]]:
+        """Generate responses for several requests concurrently.
+        
+        At most max_concurrency requests are in flight at once. Results are in
+        request order; a failed request yields its exception instead of a response.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def generate_one(request: Dict[str, Any]) -> AIResponse:
+            async with semaphore:
+                return await self.generate_response(request)
+        
+        return await asyncio.gather(*map(generate_one, requests), return_exceptions=True)
+    
+    async def close(self):
+        """Close every provider client's connections (e.g. on shutdown)"""
+        for client in self.clients.values():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"Failed to close {client.config.provider_type} client: {str(e)}")
+        if self._http_client is not None:
+            await self._http_client.aclose()
+    
+    @staticmethod
+    def _generate_cache_key(request: Dict[str, Any]) -> str:
+        """Hash the request fields that determine the response"""
+        digest = hashlib.blake2b(digest_size=16)
+        
+        def add(text: str):
+            # Length-prefixed so adjacent fields cannot run into each other
+            data = text.encode("utf-8", "surrogatepass")
+            digest.update(len(data).to_bytes(4, "little"))
+            digest.update(data)
+        
+        for name in ("provider_preference", "model", "max_tokens", "temperature"):
+            add(repr(request.get(name)))
+        for msg in request.get("messages", ()):
+            add(msg.get("role", "user"))
+            add(msg.get("content", ""))
+        return digest.hexdigest()
+    
     def _select_provider(self, request: Dict[str, Any]) -> AIProviderType:
         """Select the best provider for the request"""
-        # Check if provider is explicitly requested
-        if "provider_preference" in request:
-            provider_pref = AIProviderType(request["provider_preference"])
+        # Check if provider is explicitly requested (AIProviderType values or enum members)
+        provider_pref = request.get("provider_preference")
+        if provider_pref is not None:
+            provider_pref = getattr(provider_pref, "value", provider_pref)
             if provider_pref in self.clients:
                 return provider_pref
         
-        # Select based on priority and availability
-        available_providers = sorted(
-            self.provider_configs.items(),
-            key=lambda x: x[1].priority
-        )
+        # Then any provider routed to for this analysis type
+        routed = self.analysis_routes.get(request.get("analysis_type"))
+        if routed in self.clients and self.provider_configs[routed].enabled:
+            return routed
         
-        for provider_type, config in available_providers:
-            if provider_type in self.clients and config.enabled:
+        # Select based on priority and availability
+        for provider_type in self._provider_order:
+            if self.provider_configs[provider_type].enabled:
                 return provider_type
         
         raise Exception("No available providers")
     
-    def _get_fallback_provider(self, current_provider: AIProviderType) -> Optional[AIProviderType]:
-        """Get fallback provider for the current one"""
-        available_providers = sorted(
-            [(pt, config) for pt, config in self.provider_configs.items() 
-             if pt != current_provider and pt in self.clients],
-            key=lambda x: x[1].priority
+    def _fallback_providers(self, selected: AIProviderType) -> Iterator[AIProviderType]:
+        """Enabled providers other than the selected one, in priority order"""
+        return (
+            provider_type for provider_type in self._provider_order
+            if provider_type != selected and self.provider_configs[provider_type].enabled
         )
-        
-        return available_providers[0][0] if available_providers else None
+    
+    def _usage_date(self) -> str:
+        """Current UTC date, formatted once per day rather than per request"""
+        now = time.time()
+        if now >= self._usage_day[0]:
+            day_start = now - now % 86400
+            date = datetime.fromtimestamp(day_start, timezone.utc).strftime('%Y-%m-%d')
+            self._usage_day = (day_start + 86400, date)
+            if not self._usage_days or self._usage_days[-1] != date:
+                self._usage_days.append(date)
+            # Drop the aggregates of days past the retention window
+            while len(self._usage_days) > _USAGE_METRICS_DAYS:
+                expired = "_" + self._usage_days.popleft()
+                for key in [key for key in self.usage_metrics if key.endswith(expired)]:
+                    del self.usage_metrics[key]
+        return self._usage_day[1]
     
     def _record_usage(self, provider_type: AIProviderType, response: AIResponse):
         """Record usage metrics"""
-        metrics_key = f"{provider_type}_{datetime.now(timezone.utc).strftime('%Y-%m-%d')}"
+        metrics_key = f"{provider_type}_{self._usage_date()}"
         
-        if metrics_key not in self.usage_metrics:
-            self.usage_metrics[metrics_key] = {
+        metrics = self.usage_metrics.get(metrics_key)
+        if metrics is None:
+            metrics = self.usage_metrics[metrics_key] = {
                 "requests": 0,
                 "total_tokens": 0,
                 "total_cost": 0.0,
-                "total_time": 0.0
+                "total_time": 0.0,
+                "streamed_requests": 0,
+                "total_ttft": 0.0
             }
         
-        metrics = self.usage_metrics[metrics_key]
         metrics["requests"] += 1
         metrics["total_tokens"] += response.usage.get("total_tokens", 0)
         metrics["total_cost"] += response.cost
-        metrics["total_time"] += response.response_time_ms
+        # Not every client sets response_time_ms; latency is always in seconds
+        if response.response_time_ms is not None:
+            metrics["total_time"] += response.response_time_ms
+        else:
+            metrics["total_time"] += response.latency * 1000
+        ttft_ms = response.metadata.get("ttft_ms")
+        if ttft_ms is not None:
+            metrics["streamed_requests"] += 1
+            metrics["total_ttft"] += ttft_ms
 
 # Global router instance
 enhanced_llm_router = EnhancedLLMRouter()
@@ -2,13 +2,40 @@
 Provides database integration for file metadata storage and retrieval
 """
 
+import asyncio
+import heapq
 import logging
-import json
-from typing import List, Optional, Dict, Any
+import os
+from collections import defaultdict
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta, timezone
-from dataclasses import dataclass
+from dataclasses import dataclass, fields, is_dataclass, replace
 from enum import Enum
 
+from cachetools import TTLCache
+
+try:
+    from sqlalchemy import Column, BigInteger, DateTime, Index, Integer, MetaData, String, Table, Text
+    from sqlalchemy import and_, bindparam, delete as sql_delete, func, or_, select, update
+    from sqlalchemy.ext.asyncio import create_async_engine
+    SQLALCHEMY_AVAILABLE = True
+except ImportError:
+    SQLALCHEMY_AVAILABLE = False
+
+try:
+    import tantivy
+    TANTIVY_AVAILABLE = True
+except ImportError:
+    tantivy = None
+    TANTIVY_AVAILABLE = False
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    ahocorasick = None
+    AHOCORASICK_AVAILABLE = False
+
 try:
     from database.enhanced_models import (
         FileMetadata, FileType, StorageLocation, 
@@ -43,7 +70,7 @@ except ImportError:
         INFECTED = "infected"
         FAILED = "failed"
     
-    @dataclass
+    @dataclass(slots=True)
     class FileMetadata:
         id: str
         filename: str
@@ -52,7 +79,7 @@ except ImportError:
         mime_type: str
         size_bytes: int
         checksum_md5: str
-        checksum_sha256: str
+        checksum_sha256: Optional[str]
         storage_path: str
         uploaded_by: str
         project_id: Optional[str] = None
@@ -70,20 +97,508 @@ except ImportError:
         expires_at: Optional[datetime] = None
         description: Optional[str] = None
         extracted_text: Optional[str] = None
+        # Digest used for deduplication and the algorithm that produced it
+        content_hash: Optional[str] = None
+        hash_algorithm: Optional[str] = None
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Stable sort keys for files without a created_at/expires_at timestamp
+_MIN_DT = datetime.min.replace(tzinfo=timezone.utc)
+_MAX_DT = datetime.max.replace(tzinfo=timezone.utc)
+
+def _created_at_key(metadata: FileMetadata) -> datetime:
+    return metadata.created_at or _MIN_DT
+
+def _newest_first(files: List[FileMetadata], offset: int, limit: int) -> List[FileMetadata]:
+    """Return one page of files ordered newest first
+    
+    Heap-selects the first offset + limit entries when the page is a small
+    part of the input instead of sorting everything.
+    """
+    needed = offset + limit
+    if needed < len(files) // 2:
+        ordered = heapq.nlargest(needed, files, key=_created_at_key)
+    else:
+        ordered = sorted(files, key=_created_at_key, reverse=True)
+    return ordered[offset:needed]
+
+# Corpus size above which CPU-bound filtering/sorting runs in a worker
+# thread so it does not stall the event loop
+_OFFLOAD_THRESHOLD = 5000
+
+async def _run_cpu_bound(size: int, func, *args):
+    """Run func inline for small inputs, or via asyncio.to_thread for large ones
+    
+    Callers pass snapshots (lists) rather than live views of the store, so
+    writes on the event loop cannot race with the worker thread.
+    """
+    if size > _OFFLOAD_THRESHOLD:
+        return await asyncio.to_thread(func, *args)
+    return func(*args)
+
+# Field names that update_file_metadata may assign
+if is_dataclass(FileMetadata):
+    _FILE_METADATA_FIELDS = frozenset(f.name for f in fields(FileMetadata))
+else:
+    _FILE_METADATA_FIELDS = frozenset(getattr(FileMetadata, "__annotations__", {}))
+
+# Fields that need converting back from their stored SQL form
+_ENUM_FIELDS = {
+    "file_type": FileType,
+    "processing_status": ProcessingStatus,
+    "storage_location": StorageLocation,
+    "virus_scan_status": VirusScanStatus,
+}
+_DATETIME_FIELDS = ("created_at", "updated_at", "last_accessed_at", "expires_at")
+
+# Text fields covered by the full-text index used in search_files
+_SEARCH_INDEX_FIELDS = ("filename", "original_filename", "extracted_text", "description")
+
+# Fields with a value -> file ids bucket index, used for owner/project
+# listings and duplicate detection
+_BUCKET_FIELDS = ("uploaded_by", "project_id", "file_type", "checksum_md5", "checksum_sha256", "content_hash")
+
+# Number of pending index writes before the search index is committed
+_SEARCH_INDEX_COMMIT_BATCH = 64
+
+if SQLALCHEMY_AVAILABLE:
+    _sql_metadata = MetaData()
+    
+    file_metadata_table = Table(
+        "file_storage_metadata",
+        _sql_metadata,
+        Column("id", String(36), primary_key=True),
+        Column("filename", String(255), nullable=False),
+        Column("original_filename", String(255), nullable=False),
+        Column("file_type", String(50), nullable=False),
+        Column("mime_type", String(100), nullable=False),
+        Column("size_bytes", BigInteger, nullable=False),
+        Column("checksum_md5", String(32), nullable=False),
+        Column("checksum_sha256", String(64)),
+        Column("storage_path", Text, nullable=False),
+        Column("uploaded_by", String(255), nullable=False),
+        Column("project_id", String(36)),
+        Column("conversation_id", String(36)),
+        Column("analysis_id", String(36)),
+        Column("processing_status", String(20), nullable=False),
+        Column("processing_error", Text),
+        Column("version", Integer, nullable=False),
+        Column("parent_file_id", String(36)),
+        Column("storage_location", String(20), nullable=False),
+        Column("virus_scan_status", String(20), nullable=False),
+        Column("created_at", DateTime(timezone=True)),
+        Column("updated_at", DateTime(timezone=True)),
+        Column("last_accessed_at", DateTime(timezone=True)),
+        Column("expires_at", DateTime(timezone=True)),
+        Column("description", Text),
+        Column("extracted_text", Text),
+        Column("content_hash", String(64)),
+        Column("hash_algorithm", String(16)),
+    )
+    
+    # Composite indexes matching the list/search access paths
+    Index("ix_file_storage_metadata_user_created",
+          file_metadata_table.c.uploaded_by, file_metadata_table.c.created_at.desc())
+    Index("ix_file_storage_metadata_project_created",
+          file_metadata_table.c.project_id, file_metadata_table.c.created_at.desc())
+    Index("ix_file_storage_metadata_checksum_md5", file_metadata_table.c.checksum_md5)
+    Index("ix_file_storage_metadata_content_hash", file_metadata_table.c.content_hash)
+    Index("ix_file_storage_metadata_expires_at", file_metadata_table.c.expires_at)
+
+# Rows per INSERT statement, keeping bound parameters under driver limits
+_SQL_UPSERT_CHUNK_SIZE = 500
+
+# Seconds read access times are collected before one batched write
+_ACCESS_TIME_FLUSH_DELAY = 5.0
+
+class SQLFileMetadataBackend:
+    """Persists file metadata in SQL through SQLAlchemy's async engine
+    
+    Writes are issued as multi-row INSERT ... ON CONFLICT DO UPDATE
+    statements, one transaction per batch. Supports PostgreSQL (asyncpg)
+    and SQLite (aiosqlite); the driver for the configured URL must be
+    installed separately.
+    """
+    
+    def __init__(self, database_url: str, **engine_kwargs):
+        """Initialize the SQL backend
+        
+        Args:
+            database_url: Async SQLAlchemy URL, e.g. postgresql+asyncpg://...
+            **engine_kwargs: Extra arguments for create_async_engine
+        """
+        if not SQLALCHEMY_AVAILABLE:
+            raise RuntimeError("SQLAlchemy is required for SQLFileMetadataBackend")
+        
+        if not database_url.startswith("sqlite"):
+            engine_kwargs.setdefault("pool_size", int(os.getenv("DB_POOL_SIZE", "30")))
+            engine_kwargs.setdefault("max_overflow", int(os.getenv("DB_MAX_OVERFLOW", "50")))
+        self.engine = create_async_engine(database_url, **engine_kwargs)
+        
+        dialect = self.engine.dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            raise ValueError(f"Unsupported database dialect for file metadata: {dialect}")
+        self._insert = insert
+        self._tables_ready = False
+    
+    async def _ensure_tables(self):
+        """Create the metadata table and indexes on first use"""
+        if self._tables_ready:
+            return
+        async with self.engine.begin() as conn:
+            await conn.run_sync(_sql_metadata.create_all)
+        self._tables_ready = True
+    
+    @staticmethod
+    def _to_row(metadata: FileMetadata) -> Dict[str, Any]:
+        """Convert metadata into a column/value mapping"""
+        row = {}
+        for column in file_metadata_table.c:
+            value = getattr(metadata, column.name)
+            row[column.name] = value.value if isinstance(value, Enum) else value
+        return row
+    
+    async def upsert_many(self, items: List[FileMetadata]):
+        """Insert or update metadata rows in a single transaction"""
+        if not items:
+            return
+        await self._ensure_tables()
+        rows = [self._to_row(metadata) for metadata in items]
+        async with self.engine.begin() as conn:
+            for start in range(0, len(rows), _SQL_UPSERT_CHUNK_SIZE):
+                stmt = self._insert(file_metadata_table).values(rows[start:start + _SQL_UPSERT_CHUNK_SIZE])
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[file_metadata_table.c.id],
+                    set_={
+                        column.name: stmt.excluded[column.name]
+                        for column in file_metadata_table.c
+                        if column.name != "id"
+                    }
+                )
+                await conn.execute(stmt)
+    
+    @staticmethod
+    def _from_row(row) -> FileMetadata:
+        """Convert a result row back into metadata"""
+        values = dict(row._mapping)
+        for field, enum_type in _ENUM_FIELDS.items():
+            if values.get(field) is not None:
+                values[field] = enum_type(values[field])
+        for field in _DATETIME_FIELDS:
+            value = values.get(field)
+            if value is not None and value.tzinfo is None:
+                # SQLite hands back naive datetimes; they were stored as UTC
+                values[field] = value.replace(tzinfo=timezone.utc)
+        return FileMetadata(**values)
+    
+    async def load_all(self) -> List[FileMetadata]:
+        """Read every stored metadata row"""
+        await self._ensure_tables()
+        async with self.engine.connect() as conn:
+            result = await conn.execute(select(file_metadata_table))
+            return [self._from_row(row) for row in result]
+    
+    async def search_ids(self,
+                         terms: List[str],
+                         file_type: Optional[FileType],
+                         user_id: Optional[str],
+                         project_id: Optional[str],
+                         limit: int,
+                         offset: int) -> List[str]:
+        """Return one page of matching file ids, newest first
+        
+        A file matches the text terms when every term occurs in one of its
+        searchable fields, case-insensitively.
+        """
+        await self._ensure_tables()
+        columns = file_metadata_table.c
+        stmt = select(columns.id)
+        if user_id:
+            stmt = stmt.where(columns.uploaded_by == user_id)
+        if project_id:
+            stmt = stmt.where(columns.project_id == project_id)
+        if file_type:
+            stmt = stmt.where(columns.file_type == getattr(file_type, "value", file_type))
+        if terms:
+            stmt = stmt.where(and_(*(
+                or_(*(
+                    func.lower(columns[field]).contains(term, autoescape=True)
+                    for field in _SEARCH_INDEX_FIELDS
+                ))
+                for term in terms
+            )))
+        stmt = stmt.order_by(columns.created_at.desc().nulls_last()).limit(limit).offset(offset)
+        async with self.engine.connect() as conn:
+            return list((await conn.execute(stmt)).scalars())
+    
+    async def delete_many(self, file_ids: List[str]):
+        """Delete metadata rows in a single statement"""
+        if not file_ids:
+            return
+        await self._ensure_tables()
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                sql_delete(file_metadata_table).where(file_metadata_table.c.id.in_(file_ids))
+            )
+    
+    async def update_access_times(self, access_times: Dict[str, datetime]):
+        """Write last_accessed_at for many files in a single statement"""
+        if not access_times:
+            return
+        await self._ensure_tables()
+        stmt = (
+            update(file_metadata_table)
+            .where(file_metadata_table.c.id == bindparam("file_id"))
+            .values(last_accessed_at=bindparam("accessed_at"))
+        )
+        async with self.engine.begin() as conn:
+            await conn.execute(stmt, [
+                {"file_id": file_id, "accessed_at": accessed_at}
+                for file_id, accessed_at in access_times.items()
+            ])
+    
+    async def close(self):
+        """Dispose of pooled connections"""
+        await self.engine.dispose()
+
 class FileStorageDatabase:
     """Database service for file storage system"""
     
-    def __init__(self):
-        """Initialize database service"""
-        # Note: In a real implementation, this would connect to actual database
-        # For now, using in-memory storage for testing
+    def __init__(self,
+                 backend: Optional[SQLFileMetadataBackend] = None,
+                 read_cache_size: int = 10_000,
+                 read_cache_ttl: float = 60.0):
+        """Initialize database service
+        
+        Args:
+            backend: Optional SQL backend persisting the metadata
+            read_cache_size: Maximum entries in the get_file_metadata cache
+            read_cache_ttl: Seconds a cached read stays valid
+        """
+        # Metadata is served from memory; when a backend is configured, it
+        # is the source of truth: writes go to it first, its rows are loaded
+        # on first use and search_files queries it directly
+        self._backend = backend
+        # Stored metadata is loaded from the backend before first use
+        self._loaded = backend is None
+        self._load_lock = asyncio.Lock()
+        # Read access times waiting for their batched write to the backend
+        self._pending_access: Dict[str, datetime] = {}
+        self._access_flush_handle: Optional[asyncio.TimerHandle] = None
+        self._access_flush_tasks: set = set()
         self._file_metadata: Dict[str, FileMetadata] = {}
+        # Hot reads within the TTL skip the last_accessed_at bookkeeping
+        self._read_cache: TTLCache = TTLCache(maxsize=read_cache_size, ttl=read_cache_ttl)
+        # Bucket indexes keyed by owner, project and checksum
+        # Buckets are insertion-ordered dicts used as ordered sets of ids
+        self._buckets: Dict[str, Dict[Any, Dict[str, None]]] = {
+            field: defaultdict(dict) for field in _BUCKET_FIELDS
+        }
+        self._bucket_keys: Dict[str, Tuple] = {}
+        # Lowercased searchable text fields joined by newlines, computed once
+        # per save. Query terms never contain whitespace so they cannot match
+        # across a field boundary.
+        self._lowercase_cache: Dict[str, str] = {}
+        self._search_index = None
+        self._search_writer = None
+        self._search_pending = 0
+        if TANTIVY_AVAILABLE:
+            self._init_search_index()
         logger.info("FileStorageDatabase initialized with in-memory storage")
     
+    def _index_buckets(self, metadata: FileMetadata):
+        """Place a file in the bucket indexes, moving it if a bucketed field changed"""
+        keys = tuple(getattr(metadata, field) for field in _BUCKET_FIELDS)
+        previous = self._bucket_keys.get(metadata.id)
+        if previous == keys:
+            return
+        if previous is not None:
+            self._unindex_buckets(metadata.id)
+        for field, key in zip(_BUCKET_FIELDS, keys):
+            if key is not None:
+                self._buckets[field][key][metadata.id] = None
+        self._bucket_keys[metadata.id] = keys
+    
+    def _unindex_buckets(self, file_id: str):
+        """Remove a file from the bucket indexes"""
+        previous = self._bucket_keys.pop(file_id, None)
+        if previous is None:
+            return
+        for field, key in zip(_BUCKET_FIELDS, previous):
+            buckets = self._buckets[field]
+            bucket = buckets.get(key)
+            if bucket is not None:
+                bucket.pop(file_id, None)
+                if not bucket:
+                    del buckets[key]
+    
+    def _bucket(self, field: str, key: Any) -> List[FileMetadata]:
+        """Return the files whose field equals key, in insertion order"""
+        return [self._file_metadata[file_id] for file_id in self._buckets[field].get(key, ())]
+    
+    def _init_search_index(self):
+        """Create the in-memory tantivy index backing text search
+        
+        The index holds each file's lowercased searchable text as character
+        trigrams, so it can answer substring queries: a file containing a
+        term contains every trigram of it.
+        """
+        try:
+            schema_builder = tantivy.SchemaBuilder()
+            schema_builder.add_text_field("id", stored=True, tokenizer_name="raw")
+            schema_builder.add_text_field("text", tokenizer_name="trigram", index_option="basic")
+            self._search_schema = schema_builder.build()
+            self._search_index = tantivy.Index(self._search_schema)
+            self._search_index.register_tokenizer(
+                "trigram", tantivy.TextAnalyzerBuilder(tantivy.Tokenizer.ngram(3, 3, False)).build()
+            )
+            self._search_writer = self._search_index.writer(num_threads=1)
+        except Exception as e:
+            logger.warning("Full-text index unavailable, using linear search: %s", e)
+            self._search_index = None
+            self._search_writer = None
+    
+    def _delete_from_search_index(self, file_id: str):
+        """Queue removal of a file from the search index"""
+        if self._search_writer is None:
+            return
+        if hasattr(self._search_writer, "delete_documents_by_term"):
+            self._search_writer.delete_documents_by_term("id", file_id)
+        else:
+            self._search_writer.delete_documents("id", file_id)
+        self._mark_search_index_dirty()
+    
+    def _add_to_search_index(self, metadata: FileMetadata):
+        """Queue (re)indexing of a file's searchable text fields"""
+        if self._search_writer is None:
+            return
+        self._delete_from_search_index(metadata.id)
+        document = tantivy.Document(id=metadata.id)
+        document.add_text("text", self._lowercase_cache[metadata.id])
+        self._search_writer.add_document(document)
+        self._mark_search_index_dirty()
+    
+    def _mark_search_index_dirty(self):
+        """Record a pending index write, committing once the batch is full"""
+        self._search_pending += 1
+        if self._search_pending >= _SEARCH_INDEX_COMMIT_BATCH:
+            self._commit_search_index()
+    
+    def _commit_search_index(self):
+        """Commit pending index writes so they become visible to searches"""
+        if self._search_writer is None or not self._search_pending:
+            return
+        self._search_writer.commit()
+        self._search_index.reload()
+        self._search_pending = 0
+    
+    def _search_index_ids(self, query_lower: str) -> Optional[set]:
+        """Return ids of files that may match a lowercased text query, or None
+        if the index cannot narrow it
+        
+        Hits are the files containing every trigram of every query term: a
+        superset of the substring matches, which the caller confirms.
+        Terms shorter than a trigram cannot be looked up.
+        """
+        if self._search_index is None:
+            return None
+        terms = query_lower.split()
+        if not terms or any(len(term) < 3 for term in terms):
+            return None
+        self._commit_search_index()
+        searcher = self._search_index.searcher()
+        if not searcher.num_docs:
+            return set()
+        query = tantivy.Query.boolean_query([
+            (tantivy.Occur.Must, tantivy.Query.term_query(self._search_schema, "text", gram))
+            for gram in {term[i:i + 3] for term in terms for i in range(len(term) - 2)}
+        ])
+        hits = searcher.search(query, searcher.num_docs).hits
+        return {searcher.doc(address)["id"][0] for _, address in hits}
+    
+    def _persist(self, metadata: FileMetadata):
+        """Store metadata and refresh its index entries"""
+        self._file_metadata[metadata.id] = metadata
+        self._read_cache.pop(metadata.id, None)
+        self._index_buckets(metadata)
+        self._index_text(metadata)
+    
+    def _index_text(self, metadata: FileMetadata):
+        """Refresh the lowercase cache and full-text index for a file"""
+        self._lowercase_cache[metadata.id] = "\n".join(
+            getattr(metadata, field).lower()
+            for field in _SEARCH_INDEX_FIELDS
+            if getattr(metadata, field)
+        )
+        self._add_to_search_index(metadata)
+    
+    def _remove(self, file_id: str):
+        """Drop stored metadata and its index entries"""
+        del self._file_metadata[file_id]
+        self._read_cache.pop(file_id, None)
+        self._unindex_buckets(file_id)
+        self._lowercase_cache.pop(file_id, None)
+        self._delete_from_search_index(file_id)
+        self._pending_access.pop(file_id, None)
+    
+    def _queue_access_time(self, file_id: str, accessed_at: datetime):
+        """Queue a read access time for the next batched backend write"""
+        self._pending_access[file_id] = accessed_at
+        if self._access_flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._access_flush_handle = loop.call_later(
+                _ACCESS_TIME_FLUSH_DELAY, self._start_access_flush, loop
+            )
+    
+    def _start_access_flush(self, loop: asyncio.AbstractEventLoop):
+        """Run a scheduled access time flush, keeping the task referenced"""
+        self._access_flush_handle = None
+        task = loop.create_task(self.flush_access_times())
+        self._access_flush_tasks.add(task)
+        task.add_done_callback(self._access_flush_tasks.discard)
+    
+    async def flush_access_times(self):
+        """Write the queued read access times to the backend"""
+        if self._access_flush_handle is not None:
+            self._access_flush_handle.cancel()
+            self._access_flush_handle = None
+        pending, self._pending_access = self._pending_access, {}
+        if not pending or not self._backend:
+            return
+        try:
+            await self._backend.update_access_times(pending)
+        except Exception as e:
+            # Keep the times for the next flush unless a newer read replaced them
+            for file_id, accessed_at in pending.items():
+                self._pending_access.setdefault(file_id, accessed_at)
+            logger.error("Failed to persist file access times: %s", e)
+    
+    async def close(self):
+        """Write queued access times and release the backend's connections"""
+        await self.flush_access_times()
+        if self._backend:
+            await self._backend.close()
+    
+    async def _ensure_loaded(self):
+        """Load the backend's stored metadata into memory on first use"""
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if self._loaded:
+                return
+            stored = await self._backend.load_all()
+            for metadata in stored:
+                if metadata.id not in self._file_metadata:
+                    self._persist(metadata)
+            self._loaded = True
+            logger.info("Loaded %s file metadata entries from the backend", len(stored))
+    
     async def save_file_metadata(self, metadata: FileMetadata) -> FileMetadata:
         """Save file metadata to database
         
@@ -94,13 +609,37 @@ class FileStorageDatabase:
             Saved FileMetadata object
         """
         try:
-            # In a real implementation, this would save to database
-            self._file_metadata[metadata.id] = metadata
-            logger.info(f"File metadata saved: {metadata.id}")
+            await self._ensure_loaded()
+            if self._backend:
+                await self._backend.upsert_many([metadata])
+            self._persist(metadata)
+            logger.info("File metadata saved: %s", metadata.id)
             return metadata
             
         except Exception as e:
-            logger.error(f"Failed to save file metadata: {e}")
+            logger.error("Failed to save file metadata: %s", e)
+            raise
+    
+    async def save_many(self, items: List[FileMetadata]) -> List[FileMetadata]:
+        """Save several file metadata objects in one batch
+        
+        Args:
+            items: FileMetadata objects to save
+            
+        Returns:
+            Saved FileMetadata objects
+        """
+        try:
+            await self._ensure_loaded()
+            if self._backend:
+                await self._backend.upsert_many(items)
+            for metadata in items:
+                self._persist(metadata)
+            logger.info("File metadata saved in batch: %s", len(items))
+            return items
+            
+        except Exception as e:
+            logger.error("Failed to save file metadata batch: %s", e)
             raise
     
     async def get_file_metadata(self, file_id: str) -> Optional[FileMetadata]:
@@ -113,18 +652,26 @@ class FileStorageDatabase:
             FileMetadata object or None if not found
         """
         try:
+            await self._ensure_loaded()
+            cached = self._read_cache.get(file_id)
+            if cached is not None:
+                return cached
+            
             metadata = self._file_metadata.get(file_id)
             if metadata:
-                # Update last accessed time
+                # Update last accessed time on the stored object; no index
+                # covers it, and the backend gets it in a batched write
                 metadata.last_accessed_at = datetime.now(timezone.utc)
-                await self.save_file_metadata(metadata)
-                logger.debug(f"File metadata retrieved: {file_id}")
+                if self._backend:
+                    self._queue_access_time(file_id, metadata.last_accessed_at)
+                self._read_cache[file_id] = metadata
+                logger.debug("File metadata retrieved: %s", file_id)
             else:
-                logger.warning(f"File metadata not found: {file_id}")
+                logger.warning("File metadata not found: %s", file_id)
             return metadata
             
         except Exception as e:
-            logger.error(f"Failed to retrieve file metadata: {e}")
+            logger.error("Failed to retrieve file metadata: %s", e)
             raise
     
     async def update_file_metadata(self, file_id: str, updates: Dict[str, Any]) -> Optional[FileMetadata]:
@@ -138,24 +685,37 @@ class FileStorageDatabase:
             Updated FileMetadata object or None if not found
         """
         try:
+            await self._ensure_loaded()
             metadata = self._file_metadata.get(file_id)
             if not metadata:
-                logger.warning(f"File metadata not found for update: {file_id}")
+                logger.warning("File metadata not found for update: %s", file_id)
                 return None
             
-            # Update fields
-            for field, value in updates.items():
-                if hasattr(metadata, field):
-                    setattr(metadata, field, value)
-                    logger.debug(f"Updated {field} for file {file_id}")
+            changes = {field: value for field, value in updates.items() if field in _FILE_METADATA_FIELDS}
+            changes["updated_at"] = datetime.now(timezone.utc)
+            if self._backend:
+                # Store the updated row before touching the in-memory copy
+                await self._backend.upsert_many([replace(metadata, **changes)])
             
-            # Save updated metadata
-            await self.save_file_metadata(metadata)
-            logger.info(f"File metadata updated: {file_id}")
+            # Update fields in place on the stored object
+            debug_enabled = logger.isEnabledFor(logging.DEBUG)
+            updated_fields = set()
+            for field, value in changes.items():
+                setattr(metadata, field, value)
+                updated_fields.add(field)
+                if debug_enabled and field != "updated_at":
+                    logger.debug("Updated %s for file %s", field, file_id)
+            
+            # Only indexes covering a changed field need refreshing
+            if not updated_fields.isdisjoint(_BUCKET_FIELDS):
+                self._index_buckets(metadata)
+            if not updated_fields.isdisjoint(_SEARCH_INDEX_FIELDS):
+                self._index_text(metadata)
+            logger.info("File metadata updated: %s", file_id)
             return metadata
             
         except Exception as e:
-            logger.error(f"Failed to update file metadata: {e}")
+            logger.error("Failed to update file metadata: %s", e)
             raise
     
     async def delete_file_metadata(self, file_id: str) -> bool:
@@ -168,16 +728,42 @@ class FileStorageDatabase:
             True if deleted, False if not found
         """
         try:
+            await self._ensure_loaded()
             if file_id in self._file_metadata:
-                del self._file_metadata[file_id]
-                logger.info(f"File metadata deleted: {file_id}")
+                if self._backend:
+                    await self._backend.delete_many([file_id])
+                self._remove(file_id)
+                logger.info("File metadata deleted: %s", file_id)
                 return True
             else:
-                logger.warning(f"File metadata not found for deletion: {file_id}")
+                logger.warning("File metadata not found for deletion: %s", file_id)
                 return False
                 
         except Exception as e:
-            logger.error(f"Failed to delete file metadata: {e}")
+            logger.error("Failed to delete file metadata: %s", e)
+            raise
+    
+    async def delete_many(self, file_ids: List[str]) -> int:
+        """Delete several file metadata entries in one batch
+        
+        Args:
+            file_ids: File IDs to delete
+            
+        Returns:
+            Number of entries that existed and were deleted
+        """
+        try:
+            await self._ensure_loaded()
+            deleted_ids = [file_id for file_id in set(file_ids) if file_id in self._file_metadata]
+            if self._backend:
+                await self._backend.delete_many(deleted_ids)
+            for file_id in deleted_ids:
+                self._remove(file_id)
+            logger.info("File metadata deleted in batch: %s", len(deleted_ids))
+            return len(deleted_ids)
+            
+        except Exception as e:
+            logger.error("Failed to delete file metadata batch: %s", e)
             raise
     
     async def list_files_by_user(self, user_id: str, limit: int = 100, offset: int = 0) -> List[FileMetadata]:
@@ -192,22 +778,19 @@ class FileStorageDatabase:
             List of FileMetadata objects
         """
         try:
-            user_files = [
-                metadata for metadata in self._file_metadata.values()
-                if metadata.uploaded_by == user_id
-            ]
+            await self._ensure_loaded()
+            user_files = self._bucket("uploaded_by", user_id)
             
-            # Sort by upload date (newest first)
-            user_files.sort(key=lambda x: x.created_at or datetime.now(), reverse=True)
+            # Newest first, selecting only the entries the page needs
+            paginated_files = await _run_cpu_bound(
+                len(user_files), _newest_first, user_files, offset, limit
+            )
             
-            # Apply pagination
-            paginated_files = user_files[offset:offset + limit]
-            
-            logger.debug(f"Retrieved {len(paginated_files)} files for user {user_id}")
+            logger.debug("Retrieved %s files for user %s", len(paginated_files), user_id)
             return paginated_files
             
         except Exception as e:
-            logger.error(f"Failed to list files for user: {e}")
+            logger.error("Failed to list files for user: %s", e)
             raise
     
     async def list_files_by_project(self, project_id: str, limit: int = 100, offset: int = 0) -> List[FileMetadata]:
@@ -222,22 +805,19 @@ class FileStorageDatabase:
             List of FileMetadata objects
         """
         try:
-            project_files = [
-                metadata for metadata in self._file_metadata.values()
-                if metadata.project_id == project_id
-            ]
-            
-            # Sort by upload date (newest first)
-            project_files.sort(key=lambda x: x.created_at or datetime.now(), reverse=True)
+            await self._ensure_loaded()
+            project_files = self._bucket("project_id", project_id)
             
-            # Apply pagination
-            paginated_files = project_files[offset:offset + limit]
+            # Newest first, selecting only the entries the page needs
+            paginated_files = await _run_cpu_bound(
+                len(project_files), _newest_first, project_files, offset, limit
+            )
             
-            logger.debug(f"Retrieved {len(paginated_files)} files for project {project_id}")
+            logger.debug("Retrieved %s files for project %s", len(paginated_files), project_id)
             return paginated_files
             
         except Exception as e:
-            logger.error(f"Failed to list files for project: {e}")
+            logger.error("Failed to list files for project: %s", e)
             raise
     
     async def search_files(self, 
@@ -261,41 +841,103 @@ class FileStorageDatabase:
             List of FileMetadata objects matching criteria
         """
         try:
-            results = list(self._file_metadata.values())
-            
-            # Apply filters
-            if user_id:
-                results = [f for f in results if f.uploaded_by == user_id]
-            
-            if project_id:
-                results = [f for f in results if f.project_id == project_id]
-            
-            if file_type:
-                results = [f for f in results if f.file_type == file_type]
+            await self._ensure_loaded()
+            if self._backend:
+                # Filters, ordering and the page are resolved in SQL
+                terms = []
+                if query:
+                    query_lower = query.lower()
+                    terms = query_lower.split() if len(query_lower.split()) > 1 else [query_lower]
+                file_ids = await self._backend.search_ids(terms, file_type, user_id, project_id, limit, offset)
+                return [self._file_metadata[file_id] for file_id in file_ids if file_id in self._file_metadata]
             
+            # Intersect the bucket indexes of the requested filters, walking
+            # the smallest bucket and probing the others
+            filter_buckets = [
+                self._buckets[field].get(key, {})
+                for field, key in (("uploaded_by", user_id), ("project_id", project_id), ("file_type", file_type))
+                if key
+            ]
+            if filter_buckets:
+                filter_buckets.sort(key=len)
+                smallest, *others = filter_buckets
+                candidates = [
+                    self._file_metadata[file_id] for file_id in smallest
+                    if all(file_id in bucket for bucket in others)
+                ]
+            else:
+                candidates = self._file_metadata.values()
+            matches_text = None
             if query:
                 query_lower = query.lower()
-                results = [
-                    f for f in results
-                    if (query_lower in f.filename.lower() or
-                        query_lower in f.original_filename.lower() or
-                        (f.extracted_text and query_lower in f.extracted_text.lower()) or
-                        (f.description and query_lower in f.description.lower()))
-                ]
-            
-            # Sort by relevance (for now, just by upload date)
-            results.sort(key=lambda x: x.created_at or datetime.now(), reverse=True)
+                matches_text = self._build_text_matcher(query_lower)
+                matching_ids = self._search_index_ids(query_lower)
+                if matching_ids is not None:
+                    # The index narrows the candidates to its hits; the
+                    # substring matcher still confirms each one
+                    if len(matching_ids) < len(candidates):
+                        candidates = [self._file_metadata[file_id] for file_id in matching_ids]
+                    else:
+                        matches_text = lambda file_id, confirm=matches_text: (
+                            file_id in matching_ids and confirm(file_id)
+                        )
             
-            # Apply pagination
-            paginated_results = results[offset:offset + limit]
+            paginated_results = await _run_cpu_bound(
+                len(candidates), self._filter_files,
+                list(candidates), user_id, project_id, file_type, matches_text, offset, limit
+            )
             
-            logger.debug(f"Search returned {len(paginated_results)} files")
+            logger.debug("Search returned %s files", len(paginated_results))
             return paginated_results
             
         except Exception as e:
-            logger.error(f"Failed to search files: {e}")
+            logger.error("Failed to search files: %s", e)
             raise
     
+    @staticmethod
+    def _filter_files(candidates: List[FileMetadata],
+                      user_id: Optional[str],
+                      project_id: Optional[str],
+                      file_type: Optional[FileType],
+                      matches_text,
+                      offset: int,
+                      limit: int) -> List[FileMetadata]:
+        """Filter, sort and paginate search candidates"""
+        # Apply all filters in one pass, cheapest checks first so the
+        # text scan only runs on files that survive them
+        results = [
+            f for f in candidates
+            if (not user_id or f.uploaded_by == user_id)
+            and (not project_id or f.project_id == project_id)
+            and (not file_type or f.file_type == file_type)
+            and (matches_text is None or matches_text(f.id))
+        ]
+        
+        # Sort by relevance (for now, just by upload date) and paginate
+        return _newest_first(results, offset, limit)
+    
+    def _build_text_matcher(self, query_lower: str):
+        """Build a predicate testing a file id against a lowercased query
+        
+        A single-term query is a plain substring test. A multi-term query
+        matches when every term occurs, scanning each file's text once with
+        an Aho-Corasick automaton when pyahocorasick is installed.
+        """
+        cache = self._lowercase_cache
+        terms = set(query_lower.split())
+        if len(terms) < 2:
+            needle = query_lower
+            return lambda file_id: needle in cache.get(file_id, "")
+        
+        if AHOCORASICK_AVAILABLE:
+            automaton = ahocorasick.Automaton()
+            for term in terms:
+                automaton.add_word(term, term)
+            automaton.make_automaton()
+            return lambda file_id: {term for _, term in automaton.iter(cache.get(file_id, ""))} == terms
+        
+        return lambda file_id: all(term in cache.get(file_id, "") for term in terms)
+    
     async def get_files_by_checksum(self, checksum_md5: str) -> List[FileMetadata]:
         """Find files with the same checksum (duplicates)
         
@@ -306,45 +948,149 @@ class FileStorageDatabase:
             List of FileMetadata objects with matching checksum
         """
         try:
-            duplicate_files = [
-                metadata for metadata in self._file_metadata.values()
-                if metadata.checksum_md5 == checksum_md5
-            ]
+            await self._ensure_loaded()
+            duplicate_files = self._bucket("checksum_md5", checksum_md5)
+            
+            logger.debug("Found %s files with checksum %s", len(duplicate_files), checksum_md5)
+            return duplicate_files
+            
+        except Exception as e:
+            logger.error("Failed to search by checksum: %s", e)
+            raise
+    
+    async def get_files_by_sha256(self, checksum_sha256: str) -> List[FileMetadata]:
+        """Find files with the same SHA-256 checksum (duplicates)
+        
+        Args:
+            checksum_sha256: SHA-256 checksum to search for
+            
+        Returns:
+            List of FileMetadata objects with matching checksum
+        """
+        try:
+            await self._ensure_loaded()
+            duplicate_files = self._bucket("checksum_sha256", checksum_sha256)
+            
+            logger.debug("Found %s files with SHA-256 %s", len(duplicate_files), checksum_sha256)
+            return duplicate_files
+            
+        except Exception as e:
+            logger.error("Failed to search by SHA-256: %s", e)
+            raise
+    
+    async def get_files_by_content_hash(self, content_hash: str, hash_algorithm: str) -> List[FileMetadata]:
+        """Find files with the same content digest under the same algorithm
+        
+        SHA-256 digests are looked up by checksum_sha256, which also covers
+        files stored before content_hash was recorded.
+        
+        Args:
+            content_hash: Hex digest to search for
+            hash_algorithm: Algorithm that produced the digest ("sha256", "blake3")
+            
+        Returns:
+            List of FileMetadata objects with matching digest
+        """
+        try:
+            await self._ensure_loaded()
+            if hash_algorithm == "sha256":
+                duplicate_files = self._bucket("checksum_sha256", content_hash)
+            else:
+                duplicate_files = [
+                    f for f in self._bucket("content_hash", content_hash)
+                    if f.hash_algorithm == hash_algorithm
+                ]
             
-            logger.debug(f"Found {len(duplicate_files)} files with checksum {checksum_md5}")
+            logger.debug("Found %s files with %s %s", len(duplicate_files), hash_algorithm, content_hash)
             return duplicate_files
             
         except Exception as e:
-            logger.error(f"Failed to search by checksum: {e}")
+            logger.error("Failed to search by content hash: %s", e)
             raise
     
-    async def get_expiring_files(self, days_ahead: int = 7) -> List[FileMetadata]:
+    async def get_expiring_files(self, days_ahead: int = 7, limit: Optional[int] = None) -> List[FileMetadata]:
         """Get files that are expiring within specified days
         
         Args:
             days_ahead: Number of days to look ahead for expiring files
+            limit: Maximum number of files to return (soonest first)
             
         Returns:
             List of FileMetadata objects that are expiring
         """
         try:
+            await self._ensure_loaded()
             cutoff_date = datetime.now(timezone.utc) + timedelta(days=days_ahead)
             
-            expiring_files = [
+            expiring_files = (
                 metadata for metadata in self._file_metadata.values()
                 if metadata.expires_at and metadata.expires_at <= cutoff_date
-            ]
+            )
             
-            # Sort by expiration date (earliest first)
-            expiring_files.sort(key=lambda x: x.expires_at or datetime.max)
+            # Sort by expiration date (earliest first); only select the top
+            # entries when the caller bounds the result size
+            if limit is not None:
+                expiring_files = heapq.nsmallest(limit, expiring_files, key=lambda x: x.expires_at)
+            else:
+                expiring_files = sorted(expiring_files, key=lambda x: x.expires_at)
             
-            logger.debug(f"Found {len(expiring_files)} files expiring within {days_ahead} days")
+            logger.debug("Found %s files expiring within %s days", len(expiring_files), days_ahead)
             return expiring_files
             
         except Exception as e:
-            logger.error(f"Failed to get expiring files: {e}")
+            logger.error("Failed to get expiring files: %s", e)
             raise
     
+    @staticmethod
+    def _compute_statistics(files: List[FileMetadata]) -> Dict[str, Any]:
+        """Aggregate statistics over a snapshot of stored files"""
+        if not files:
+            return {
+                "total_files": 0,
+                "total_size_bytes": 0,
+                "file_types": {},
+                "storage_locations": {},
+                "processing_status": {},
+                "virus_scan_status": {}
+            }
+        
+        # Calculate statistics
+        total_size = sum(f.size_bytes for f in files)
+        
+        # Group by file types
+        file_types = {}
+        for f in files:
+            file_types[f.file_type.value] = file_types.get(f.file_type.value, 0) + 1
+        
+        # Group by storage locations
+        storage_locations = {}
+        for f in files:
+            storage_locations[f.storage_location.value] = storage_locations.get(f.storage_location.value, 0) + 1
+        
+        # Group by processing status
+        processing_status = {}
+        for f in files:
+            processing_status[f.processing_status.value] = processing_status.get(f.processing_status.value, 0) + 1
+        
+        # Group by virus scan status
+        virus_scan_status = {}
+        for f in files:
+            virus_scan_status[f.virus_scan_status.value] = virus_scan_status.get(f.virus_scan_status.value, 0) + 1
+        
+        created_times = [f.created_at for f in files if f.created_at]
+        
+        return {
+            "total_files": len(files),
+            "total_size_bytes": total_size,
+            "average_size_bytes": total_size / len(files),
+            "file_types": file_types,
+            "storage_locations": storage_locations,
+            "processing_status": processing_status,
+            "virus_scan_status": virus_scan_status,
+            "oldest_file": min(created_times).isoformat() if created_times else None,
+            "newest_file": max(created_times).isoformat() if created_times else None
+        }
+    
     async def get_statistics(self) -> Dict[str, Any]:
         """Get file storage statistics
         
@@ -352,58 +1098,15 @@ class FileStorageDatabase:
             Dictionary containing various statistics
         """
         try:
+            await self._ensure_loaded()
             files = list(self._file_metadata.values())
-            
-            if not files:
-                return {
-                    "total_files": 0,
-                    "total_size_bytes": 0,
-                    "file_types": {},
-                    "storage_locations": {},
-                    "processing_status": {},
-                    "virus_scan_status": {}
-                }
-            
-            # Calculate statistics
-            total_size = sum(f.size_bytes for f in files)
-            
-            # Group by file types
-            file_types = {}
-            for f in files:
-                file_types[f.file_type.value] = file_types.get(f.file_type.value, 0) + 1
-            
-            # Group by storage locations
-            storage_locations = {}
-            for f in files:
-                storage_locations[f.storage_location.value] = storage_locations.get(f.storage_location.value, 0) + 1
-            
-            # Group by processing status
-            processing_status = {}
-            for f in files:
-                processing_status[f.processing_status.value] = processing_status.get(f.processing_status.value, 0) + 1
-            
-            # Group by virus scan status
-            virus_scan_status = {}
-            for f in files:
-                virus_scan_status[f.virus_scan_status.value] = virus_scan_status.get(f.virus_scan_status.value, 0) + 1
-            
-            stats = {
-                "total_files": len(files),
-                "total_size_bytes": total_size,
-                "average_size_bytes": total_size / len(files),
-                "file_types": file_types,
-                "storage_locations": storage_locations,
-                "processing_status": processing_status,
-                "virus_scan_status": virus_scan_status,
-                "oldest_file": min(f.created_at or datetime.now() for f in files).isoformat(),
-                "newest_file": max(f.created_at or datetime.now() for f in files).isoformat()
-            }
+            stats = await _run_cpu_bound(len(files), self._compute_statistics, files)
             
             logger.debug("File storage statistics calculated")
             return stats
             
         except Exception as e:
-            logger.error(f"Failed to calculate statistics: {e}")
+            logger.error("Failed to calculate statistics: %s", e)
             raise
 
 # Global database instance
@@ -413,5 +1116,7 @@ def get_file_storage_database() -> FileStorageDatabase:
     """Get global file storage database instance"""
     global _db_instance
     if _db_instance is None:
-        _db_instance = FileStorageDatabase()
+        database_url = os.getenv("FILE_METADATA_DATABASE_URL")
+        backend = SQLFileMetadataBackend(database_url) if database_url else None
+        _db_instance = FileStorageDatabase(backend=backend)
     return _db_instance
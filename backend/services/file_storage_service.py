@@ -4,25 +4,50 @@ Provides secure file upload, storage, and management capabilities with database
 """
 
 import os
+import asyncio
 import hashlib
 import uuid
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+import queue
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import List, Dict, Any, Optional, Tuple, FrozenSet, Mapping, Callable, Awaitable, Set
 from datetime import datetime, timezone
 from pathlib import Path
 from dataclasses import dataclass, field
 from enum import Enum
+from types import MappingProxyType
+
+from cachetools import TTLCache
+
+try:
+    import blake3
+    BLAKE3_AVAILABLE = True
+except ImportError:
+    blake3 = None
+    BLAKE3_AVAILABLE = False
 
 try:
-    from fastapi import UploadFile, HTTPException
+    from fastapi import UploadFile, HTTPException, Request
 except ImportError:
+    Request = Any
+    
     class UploadFile:
         def __init__(self):
             self.filename = "test.txt"
             self.content_type = "text/plain"
+            self._content = b"test content"
+            self._position = 0
+        
+        async def read(self, size: int = -1):
+            end = len(self._content) if size < 0 else self._position + size
+            chunk = self._content[self._position:end]
+            self._position += len(chunk)
+            return chunk
         
-        async def read(self):
-            return b"test content"
+        async def seek(self, offset: int):
+            self._position = offset
     
     class HTTPException(Exception):
         def __init__(self, status_code, detail):
@@ -41,6 +66,11 @@ except ImportError:
             self._file_metadata[metadata.id] = metadata
             return metadata
         
+        async def save_many(self, items):
+            for metadata in items:
+                self._file_metadata[metadata.id] = metadata
+            return items
+        
         async def get_file_metadata(self, file_id):
             return self._file_metadata.get(file_id)
         
@@ -70,6 +100,17 @@ except ImportError:
                 files = [f for f in files if f.project_id == project_id]
             return files[offset:offset+limit]
         
+        async def get_files_by_sha256(self, checksum_sha256):
+            return [f for f in self._file_metadata.values() if f.checksum_sha256 == checksum_sha256]
+        
+        async def get_files_by_content_hash(self, content_hash, hash_algorithm):
+            if hash_algorithm == "sha256":
+                return await self.get_files_by_sha256(content_hash)
+            return [
+                f for f in self._file_metadata.values()
+                if f.content_hash == content_hash and f.hash_algorithm == hash_algorithm
+            ]
+        
         async def get_statistics(self):
             files = list(self._file_metadata.values())
             total_size = sum(f.size_bytes for f in files)
@@ -89,112 +130,359 @@ try:
         FileType, StorageLocation, ProcessingStatus, VirusScanStatus
     )
 except ImportError:
-    # Define local enum classes
-    class FileType(Enum):
-        TEXT = "text"
-        DOCUMENT = "document"
-        IMAGE = "image"
-        AUDIO = "audio"
-        VIDEO = "video"
-        ARCHIVE = "archive"
-        SPREADSHEET = "spreadsheet"
-        CHAT_EXPORT = "chat_export"
-        OTHER = "other"
+    try:
+        # Share the metadata types of the database service so enums and
+        # instances are the same classes on both sides
+        from services.file_storage_database import (
+            FileMetadata,
+            FileType, StorageLocation, ProcessingStatus, VirusScanStatus
+        )
+    except ImportError:
+        # Define local enum classes
+        class FileType(Enum):
+            TEXT = "text"
+            DOCUMENT = "document"
+            IMAGE = "image"
+            AUDIO = "audio"
+            VIDEO = "video"
+            ARCHIVE = "archive"
+            SPREADSHEET = "spreadsheet"
+            CHAT_EXPORT = "chat_export"
+            OTHER = "other"
     
-    class StorageLocation(Enum):
-        LOCAL = "local"
-        CLOUD = "cloud"
+        class StorageLocation(Enum):
+            LOCAL = "local"
+            CLOUD = "cloud"
     
-    class ProcessingStatus(Enum):
-        PENDING = "pending"
-        PROCESSING = "processing"
-        COMPLETED = "completed"
-        FAILED = "failed"
+        class ProcessingStatus(Enum):
+            PENDING = "pending"
+            PROCESSING = "processing"
+            COMPLETED = "completed"
+            FAILED = "failed"
     
-    class VirusScanStatus(Enum):
-        PENDING = "pending"
-        CLEAN = "clean"
-        INFECTED = "infected"
-        FAILED = "failed"
+        class VirusScanStatus(Enum):
+            PENDING = "pending"
+            CLEAN = "clean"
+            INFECTED = "infected"
+            FAILED = "failed"
     
-    @dataclass
-    class FileMetadata:
-        id: str
-        filename: str
-        original_filename: str
-        file_type: FileType
-        mime_type: str
-        size_bytes: int
-        checksum_md5: str
-        checksum_sha256: str
-        storage_path: str
-        uploaded_by: str
-        project_id: Optional[str] = None
-        conversation_id: Optional[str] = None
-        analysis_id: Optional[str] = None
-        processing_status: ProcessingStatus = ProcessingStatus.PENDING
-        processing_error: Optional[str] = None
-        version: int = 1
-        parent_file_id: Optional[str] = None
-        storage_location: StorageLocation = StorageLocation.LOCAL
-        virus_scan_status: VirusScanStatus = VirusScanStatus.PENDING
-        created_at: Optional[datetime] = None
-        updated_at: Optional[datetime] = None
-        last_accessed_at: Optional[datetime] = None
-        expires_at: Optional[datetime] = None
-        description: Optional[str] = None
-        extracted_text: Optional[str] = None
+        @dataclass(slots=True)
+        class FileMetadata:
+            id: str
+            filename: str
+            original_filename: str
+            file_type: FileType
+            mime_type: str
+            size_bytes: int
+            checksum_md5: str
+            checksum_sha256: Optional[str]
+            storage_path: str
+            uploaded_by: str
+            project_id: Optional[str] = None
+            conversation_id: Optional[str] = None
+            analysis_id: Optional[str] = None
+            processing_status: ProcessingStatus = ProcessingStatus.PENDING
+            processing_error: Optional[str] = None
+            version: int = 1
+            parent_file_id: Optional[str] = None
+            storage_location: StorageLocation = StorageLocation.LOCAL
+            virus_scan_status: VirusScanStatus = VirusScanStatus.PENDING
+            created_at: Optional[datetime] = None
+            updated_at: Optional[datetime] = None
+            last_accessed_at: Optional[datetime] = None
+            expires_at: Optional[datetime] = None
+            description: Optional[str] = None
+            extracted_text: Optional[str] = None
+            # Digest used for deduplication and the algorithm that produced it
+            content_hash: Optional[str] = None
+            hash_algorithm: Optional[str] = None
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-@dataclass
+# Extensions accepted for upload
+_ALLOWED_EXTS: FrozenSet[str] = frozenset({
+    # Images
+    '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.svg',
+    # Documents
+    '.pdf', '.doc', '.docx', '.txt', '.rtf', '.odt',
+    # Spreadsheets
+    '.xls', '.xlsx', '.csv', '.ods',
+    # Chat exports
+    '.zip', '.json', '.xml', '.html',
+    # Media
+    '.mp4', '.avi', '.mov', '.mp3', '.wav', '.m4a',
+    # Archives
+    '.tar', '.gz', '.7z', '.rar'
+})
+
+# Map MIME types to file types
+_MIME_TO_TYPE: Mapping[str, FileType] = MappingProxyType({
+    'text/plain': FileType.TEXT,
+    'text/html': FileType.DOCUMENT,
+    'text/csv': FileType.SPREADSHEET,
+    'application/pdf': FileType.DOCUMENT,
+    'application/msword': FileType.DOCUMENT,
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': FileType.DOCUMENT,
+    'application/json': FileType.OTHER,
+    'application/zip': FileType.ARCHIVE,
+    'image/jpeg': FileType.IMAGE,
+    'image/png': FileType.IMAGE,
+    'image/gif': FileType.IMAGE,
+    'video/mp4': FileType.VIDEO,
+    'audio/mpeg': FileType.AUDIO,
+})
+
+# Zip uploads whose name mentions "chat" are treated as chat exports
+_CHAT_EXPORT_RE = re.compile(r'chat', re.IGNORECASE)
+
+# Slice size fed to the hashers; each slice stays cache-resident while
+# both digests consume it
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+# Room for multipart boundaries, part headers and small form fields when
+# comparing a request's Content-Length with the file size limit
+_MULTIPART_OVERHEAD_ALLOWANCE = 64 * 1024
+
+# hashlib is backed by OpenSSL, which already selects SHA-NI / ARMv8 SHA2
+# (and the best MD5 code path) at runtime. MD5 is only a dedupe key here,
+# so it is requested as non-security use to keep it available on FIPS builds.
+_new_md5 = partial(hashlib.md5, usedforsecurity=False)
+_new_sha256 = hashlib.sha256
+
+def _new_blake3():
+    """Create a BLAKE3 hasher that may use several threads per update"""
+    return blake3.blake3(max_threads=blake3.blake3.AUTO)
+
+# Process-wide pool shared by all uploads for checksum work. hashlib drops
+# the GIL while hashing, so concurrent uploads hash on separate cores, and
+# a dedicated pool keeps bursts of uploads from starving the default
+# executor used by asyncio.to_thread elsewhere. A process pool would not
+# hash any faster: with 1 MiB chunks the GIL is held only between chunks,
+# and every chunk would have to be pickled across the process boundary.
+_HASH_WORKERS = min(8, os.cpu_count() or 1)
+_HASH_EXECUTOR = ThreadPoolExecutor(
+    max_workers=_HASH_WORKERS,
+    thread_name_prefix="upload-hash"
+)
+
+# Chunk buffers reused across uploads by the copy workers. At most one
+# buffer is borrowed per worker, so the pool never needs more than that.
+_BUFFER_POOL: "queue.LifoQueue[bytearray]" = queue.LifoQueue(maxsize=_HASH_WORKERS)
+
+def _borrow_buffer() -> bytearray:
+    """Take a chunk buffer from the pool, allocating one if it is empty"""
+    try:
+        return _BUFFER_POOL.get_nowait()
+    except queue.Empty:
+        return bytearray(_HASH_CHUNK_SIZE)
+
+def _return_buffer(buffer: bytearray):
+    """Give a chunk buffer back to the pool, dropping it if the pool is full"""
+    try:
+        _BUFFER_POOL.put_nowait(buffer)
+    except queue.Full:
+        pass
+
+def _hash_and_write(hashers: Tuple[Any, ...], out, chunk: bytes):
+    """Feed one chunk to every hasher and the output file while it is cache-resident"""
+    for hasher in hashers:
+        hasher.update(chunk)
+    out.write(chunk)
+
+def _copy_spooled_upload(spool, storage_path: str, hashers: Tuple[Any, ...], max_size: int) -> int:
+    """Copy a spooled upload to storage, hashing each chunk on the way
+    
+    Runs entirely in one worker thread and reads into a pooled buffer, so
+    no per-chunk bytes objects are allocated. Stops once max_size is
+    exceeded and returns the number of bytes seen.
+    """
+    size_bytes = 0
+    buffer = _borrow_buffer()
+    try:
+        spool.seek(0)
+        with memoryview(buffer) as view, open(storage_path, 'wb') as out:
+            while read := spool.readinto(view):
+                size_bytes += read
+                if size_bytes > max_size:
+                    break
+                _hash_and_write(hashers, out, view[:read])
+    finally:
+        _return_buffer(buffer)
+    return size_bytes
+
+def _link_to_existing(existing_path: str, storage_path: str) -> bool:
+    """Replace storage_path with a hard link to an identical stored file
+    
+    Returns:
+        True if the link replaced the new copy, False if it was kept
+    """
+    directory, name = os.path.split(storage_path)
+    temp_path = os.path.join(directory, f".{name}.link")
+    try:
+        os.link(existing_path, temp_path)
+    except OSError:
+        # Missing original, different filesystem or no hard link support
+        return False
+    os.replace(temp_path, storage_path)
+    return True
+
+def _file_extension(filename: str) -> str:
+    """Return the lowercased suffix of filename, as Path(filename).suffix.lower() would"""
+    name = filename.rstrip('/').rpartition('/')[2]
+    dot = name.rfind('.')
+    if 0 < dot < len(name) - 1:
+        return name[dot:].lower()
+    return ''
+
+def _probe_upload_size(file: UploadFile) -> Optional[int]:
+    """Return the upload size without reading its content, if it can be known"""
+    size = getattr(file, "size", None)
+    if size is not None:
+        return size
+    
+    # Starlette spools uploads into a SpooledTemporaryFile; seek/tell on it
+    # is a cheap synchronous probe
+    spool = getattr(file, "file", None)
+    if spool is None or not hasattr(spool, "seek"):
+        return None
+    position = spool.tell()
+    spool.seek(0, os.SEEK_END)
+    size = spool.tell()
+    spool.seek(position)
+    return size
+
+@dataclass(slots=True)
 class FileValidationResult:
     """Result of file validation"""
     is_valid: bool
     file_type: FileType
     mime_type: str
-    size_bytes: int
+    size_bytes: Optional[int]  # None when the size cannot be probed up front
     errors: List[str] = field(default_factory=list)
     warnings: List[str] = field(default_factory=list)
 
+class _MetadataBatcher:
+    """Coalesces metadata saves from concurrent uploads into batched writes
+    
+    The first save in a quiet period schedules a flush after max_delay; a
+    batch that reaches max_batch items is flushed right away. Each caller
+    awaits its own future, which carries the saved object or the error of
+    the batch it was written in.
+    """
+    
+    def __init__(self,
+                 save_many: Callable[[List[FileMetadata]], Awaitable[List[FileMetadata]]],
+                 max_batch: int = 64,
+                 max_delay: float = 0.01):
+        self._save_many = save_many
+        self._max_batch = max_batch
+        self._max_delay = max_delay
+        self._pending: List[Tuple[FileMetadata, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # Scheduled flushes in flight; the loop only keeps weak references
+        self._flush_tasks: Set[asyncio.Task] = set()
+    
+    async def save(self, metadata: FileMetadata) -> FileMetadata:
+        """Queue metadata for the next batch and wait until it is written"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((metadata, future))
+        if len(self._pending) >= self._max_batch:
+            self._schedule_flush(loop, 0)
+        elif self._flush_handle is None:
+            self._schedule_flush(loop, self._max_delay)
+        return await future
+    
+    def _schedule_flush(self, loop: asyncio.AbstractEventLoop, delay: float):
+        """Arrange for the pending batch to be written after delay seconds"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._flush_handle = loop.call_later(delay, self._start_flush, loop)
+    
+    def _start_flush(self, loop: asyncio.AbstractEventLoop):
+        """Run a scheduled flush, keeping the task referenced until it ends"""
+        self._flush_handle = None
+        task = loop.create_task(self.flush())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+    
+    async def flush(self):
+        """Write everything queued so far in a single batch"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        
+        try:
+            saved = await self._save_many([metadata for metadata, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), metadata in zip(batch, saved):
+            if not future.done():
+                future.set_result(metadata)
+
 class FileStorageService:
     """Enhanced file storage service with database integration"""
     
     def __init__(self, 
                  storage_root: str = "./storage",
-                 max_file_size: int = 100 * 1024 * 1024):  # 100MB
+                 max_file_size: int = 100 * 1024 * 1024,  # 100MB
+                 use_blake3: Optional[bool] = None):
         """Initialize file storage service
         
         Args:
             storage_root: Root directory for file storage
             max_file_size: Maximum file size in bytes
+            use_blake3: Hash content with BLAKE3 instead of SHA-256 for
+                deduplication; defaults to the FILE_STORAGE_USE_BLAKE3 env var
         """
         self.storage_root = Path(storage_root)
+        self._storage_root_str = os.fspath(self.storage_root)
         self.max_file_size = max_file_size
+        
+        # The content hash is only used internally (dedupe, integrity), so the
+        # faster BLAKE3 can replace SHA-256. Its digest goes in content_hash;
+        # checksum_sha256 is then left empty rather than holding a non-SHA-256 value.
+        if use_blake3 is None:
+            use_blake3 = os.getenv("FILE_STORAGE_USE_BLAKE3", "").lower() in ("1", "true", "yes")
+        if use_blake3 and not BLAKE3_AVAILABLE:
+            logger.warning("BLAKE3 checksums requested but blake3 is not installed; using SHA-256")
+            use_blake3 = False
+        self._hash_algorithm = "blake3" if use_blake3 else "sha256"
+        self._new_content_hash = _new_blake3 if use_blake3 else _new_sha256
         self.database = get_file_storage_database()
         
-        # Default allowed extensions
-        self.allowed_extensions = [
-            # Images
-            '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.svg',
-            # Documents
-            '.pdf', '.doc', '.docx', '.txt', '.rtf', '.odt',
-            # Spreadsheets
-            '.xls', '.xlsx', '.csv', '.ods',
-            # Chat exports
-            '.zip', '.json', '.xml', '.html',
-            # Media
-            '.mp4', '.avi', '.mov', '.mp3', '.wav', '.m4a',
-            # Archives
-            '.tar', '.gz', '.7z', '.rar'
-        ]
+        # Hot metadata lookups (downloads, permission re-checks) and recent
+        # search pages are served from memory. Both caches are only touched
+        # from the event loop thread, so no lock is needed around them.
+        self._meta_cache: TTLCache = TTLCache(maxsize=4096, ttl=60)
+        self._search_cache: TTLCache = TTLCache(maxsize=1024, ttl=5)
+        
+        # Metadata writes from concurrent uploads go to the database in batches
+        self._metadata_batcher = _MetadataBatcher(self._save_metadata_batch)
+        
+        # Upload directories already created, so the hot path skips mkdir
+        self._ensured_dirs: set = set()
+        
+        # Last formatted date directory, as (date, "YYYY/MM/DD")
+        self._date_dir_cache: Tuple[Optional[Any], str] = (None, "")
         
         # Initialize storage directories
         self._init_storage_structure()
         
         logger.info(f"FileStorageService initialized with root: {self.storage_root}")
 
+    @property
+    def allowed_extensions(self) -> FrozenSet[str]:
+        """File extensions accepted for upload"""
+        return _ALLOWED_EXTS
+
     def _init_storage_structure(self):
         """Initialize storage directory structure"""
         directories = [
@@ -211,16 +499,22 @@ class FileStorageService:
             dir_path.mkdir(parents=True, exist_ok=True)
             logger.debug(f"Created directory: {dir_path}")
 
-    def _get_storage_path(self, file_type: FileType, filename: str) -> Path:
+    def _get_storage_path(self, file_type: FileType, filename: str,
+                          timestamp: Optional[datetime] = None) -> str:
         """Get storage path for a file"""
-        # Create date-based subdirectory
-        date_dir = datetime.now(timezone.utc).strftime("%Y/%m/%d")
-        type_dir = file_type.value
+        # Create date-based subdirectory; strftime only runs when the day changes
+        day = (timestamp or datetime.now(timezone.utc)).date()
+        cached_day, date_dir = self._date_dir_cache
+        if day != cached_day:
+            date_dir = day.strftime("%Y/%m/%d")
+            self._date_dir_cache = (day, date_dir)
         
-        storage_path = self.storage_root / "uploads" / type_dir / date_dir
-        storage_path.mkdir(parents=True, exist_ok=True)
+        storage_dir = os.path.join(self._storage_root_str, "uploads", file_type.value, date_dir)
+        if storage_dir not in self._ensured_dirs:
+            os.makedirs(storage_dir, exist_ok=True)
+            self._ensured_dirs.add(storage_dir)
         
-        return storage_path / filename
+        return os.path.join(storage_dir, filename)
 
     async def _validate_file(self, file: UploadFile) -> FileValidationResult:
         """Validate uploaded file"""
@@ -239,46 +533,29 @@ class FileStorageService:
                 mime_type="application/octet-stream"
             )
         
-        # Check file size
-        content = await file.read()
-        size_bytes = len(content)
-        await file.seek(0)  # Reset file pointer
+        # Check file size without reading the content; upload_file re-checks
+        # the streamed byte count for uploads whose size is unknown here
+        size_bytes = _probe_upload_size(file)
+        max_file_size = self.max_file_size
         
-        if size_bytes > self.max_file_size:
-            errors.append(f"File size ({size_bytes} bytes) exceeds maximum allowed size ({self.max_file_size} bytes)")
+        if size_bytes is not None and size_bytes > max_file_size:
+            errors.append(f"File size ({size_bytes} bytes) exceeds maximum allowed size ({max_file_size} bytes)")
         
         if size_bytes == 0:
             errors.append("File is empty")
         
         # Check file extension
-        file_extension = Path(file.filename).suffix.lower()
-        if file_extension not in self.allowed_extensions:
+        file_extension = _file_extension(file.filename)
+        if file_extension not in _ALLOWED_EXTS:
             errors.append(f"File extension '{file_extension}' is not allowed")
         
         # Determine MIME type and file type
         mime_type = file.content_type or "application/octet-stream"
         
-        # Map MIME types to file types
-        file_type_mapping = {
-            'text/plain': FileType.TEXT,
-            'text/html': FileType.DOCUMENT,
-            'text/csv': FileType.SPREADSHEET,
-            'application/pdf': FileType.DOCUMENT,
-            'application/msword': FileType.DOCUMENT,
-            'application/vnd.openxmlformats-officedocument.wordprocessingml.document': FileType.DOCUMENT,
-            'application/json': FileType.OTHER,
-            'application/zip': FileType.ARCHIVE,
-            'image/jpeg': FileType.IMAGE,
-            'image/png': FileType.IMAGE,
-            'image/gif': FileType.IMAGE,
-            'video/mp4': FileType.VIDEO,
-            'audio/mpeg': FileType.AUDIO,
-        }
-        
-        file_type = file_type_mapping.get(mime_type, FileType.OTHER)
+        file_type = _MIME_TO_TYPE.get(mime_type, FileType.OTHER)
         
         # Special handling for chat exports
-        if file_extension == '.zip' and 'chat' in file.filename.lower():
+        if file_extension == '.zip' and _CHAT_EXPORT_RE.search(file.filename):
             file_type = FileType.CHAT_EXPORT
         
         return FileValidationResult(
@@ -290,13 +567,109 @@ class FileStorageService:
             warnings=warnings
         )
 
+    def _check_content_length(self, request: Request):
+        """Reject a request whose declared body size already exceeds the limit
+        
+        The multipart body is slightly larger than the file it carries, so
+        this only catches uploads that cannot possibly fit; the streamed byte
+        count remains the authoritative check.
+        """
+        content_length = request.headers.get("content-length")
+        if content_length is None or not content_length.isdigit():
+            return
+        declared = int(content_length)
+        if declared > self.max_file_size + _MULTIPART_OVERHEAD_ALLOWANCE:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Payload too large ({declared} > {self.max_file_size} bytes)"
+            )
+
+    async def _stream_to_storage(self, file: UploadFile, storage_path: str) -> Tuple[int, str, str]:
+        """Copy an upload to storage in one pass, hashing as it goes
+        
+        Returns:
+            Tuple of (size in bytes, MD5 hex digest, content hash hex digest)
+        """
+        loop = asyncio.get_running_loop()
+        hashers = (_new_md5(), self._new_content_hash())
+        try:
+            spool = getattr(file, "file", None)
+            if hasattr(spool, "readinto") and hasattr(spool, "seek"):
+                # Starlette spools uploads into a SpooledTemporaryFile: do the
+                # whole read/hash/write loop in one worker thread instead of
+                # hopping threads for every chunk read
+                size_bytes = await loop.run_in_executor(
+                    _HASH_EXECUTOR, _copy_spooled_upload,
+                    spool, storage_path, hashers, self.max_file_size
+                )
+            else:
+                size_bytes = 0
+                with open(storage_path, 'wb') as out:
+                    while chunk := await file.read(_HASH_CHUNK_SIZE):
+                        size_bytes += len(chunk)
+                        if size_bytes > self.max_file_size:
+                            break
+                        # Hash and write off the event loop (both release the GIL)
+                        await loop.run_in_executor(_HASH_EXECUTOR, _hash_and_write, hashers, out, chunk)
+            
+            if size_bytes > self.max_file_size:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"File validation failed: File size exceeds maximum allowed size ({self.max_file_size} bytes)"
+                )
+            if size_bytes == 0:
+                raise HTTPException(status_code=400, detail="File validation failed: File is empty")
+        except BaseException:
+            try:
+                os.unlink(storage_path)
+            except FileNotFoundError:
+                pass
+            raise
+        
+        md5_hasher, content_hasher = hashers
+        return size_bytes, md5_hasher.hexdigest(), content_hasher.hexdigest()
+
+    async def _deduplicate_storage(self, storage_path: str, content_hash: str, size_bytes: int) -> bool:
+        """Hard-link a new upload to an existing file with the same content
+        
+        Each metadata entry keeps its own path, so deleting one file only
+        drops its link and the content stays on disk for the others.
+        
+        Returns:
+            True if the upload now shares storage with an earlier file
+        """
+        for existing in await self.database.get_files_by_content_hash(content_hash, self._hash_algorithm):
+            if existing.size_bytes != size_bytes:
+                continue
+            existing_path = existing.storage_path
+            if await asyncio.to_thread(_link_to_existing, existing_path, storage_path):
+                logger.debug(f"Deduplicated upload {storage_path} against {existing_path}")
+                return True
+        return False
+
     async def upload_file(self,
                          file: UploadFile,
                          uploaded_by: str,
                          project_id: Optional[str] = None,
-                         conversation_id: Optional[str] = None) -> FileMetadata:
-        """Upload and process a file"""
+                         conversation_id: Optional[str] = None,
+                         request: Optional[Request] = None) -> FileMetadata:
+        """Upload and process a file
+        
+        Args:
+            file: Uploaded file
+            uploaded_by: ID of the uploading user
+            project_id: Optional project to associate the file with
+            conversation_id: Optional conversation to associate the file with
+            request: Optional originating request; an oversized Content-Length
+                is rejected with 413 before any of the upload is read
+            
+        Returns:
+            Stored FileMetadata
+        """
         try:
+            if request is not None:
+                self._check_content_length(request)
+            
             # Validate file
             validation_result = await self._validate_file(file)
             if not validation_result.is_valid:
@@ -305,36 +678,39 @@ class FileStorageService:
                     detail=f"File validation failed: {', '.join(validation_result.errors)}"
                 )
             
-            # Read file content
-            content = await file.read()
-            
-            # Generate checksums
-            md5_hash = hashlib.md5(content).hexdigest()
-            sha256_hash = hashlib.sha256(content).hexdigest()
-            
             # Generate stored filename
             if not file.filename:
                 raise ValueError("Filename is required")
             
-            file_extension = Path(file.filename).suffix.lower()
+            file_extension = _file_extension(file.filename)
             stored_filename = f"{uuid.uuid4()}{file_extension}"
             
+            # One timestamp for the storage directory and the metadata stamps
+            current_time = datetime.now(timezone.utc)
+            
             # Determine storage path
-            storage_path = self._get_storage_path(validation_result.file_type, stored_filename)
+            storage_path = self._get_storage_path(
+                validation_result.file_type, stored_filename, current_time
+            )
+            
+            # Stream the upload to storage, hashing each chunk as it passes
+            size_bytes, md5_hash, content_hash = await self._stream_to_storage(file, storage_path)
+            
+            # Share storage with an identical earlier upload
+            await self._deduplicate_storage(storage_path, content_hash, size_bytes)
             
             # Create file metadata
             file_id = str(uuid.uuid4())
-            current_time = datetime.now()
             metadata = FileMetadata(
                 id=file_id,
                 filename=stored_filename,
                 original_filename=file.filename,
                 file_type=validation_result.file_type,
                 mime_type=validation_result.mime_type,
-                size_bytes=validation_result.size_bytes,
+                size_bytes=size_bytes,
                 checksum_md5=md5_hash,
-                checksum_sha256=sha256_hash,
-                storage_path=str(storage_path),
+                checksum_sha256=content_hash if self._hash_algorithm == "sha256" else None,
+                storage_path=storage_path,
                 uploaded_by=uploaded_by,
                 project_id=project_id,
                 conversation_id=conversation_id,
@@ -348,15 +724,13 @@ class FileStorageService:
                 last_accessed_at=None,
                 expires_at=None,
                 description=None,
-                extracted_text=None
+                extracted_text=None,
+                content_hash=content_hash,
+                hash_algorithm=self._hash_algorithm
             )
             
-            # Save file to storage
-            with open(storage_path, 'wb') as f:
-                f.write(content)
-            
             # Save metadata to database
-            saved_metadata = await self.database.save_file_metadata(metadata)
+            saved_metadata = await self.save_file_metadata(metadata)
             
             logger.info(f"File uploaded successfully: {metadata.id} ({file.filename})")
             return saved_metadata
@@ -367,10 +741,39 @@ class FileStorageService:
             logger.error(f"Failed to upload file: {e}")
             raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
+    async def _save_metadata_batch(self, items: List[FileMetadata]) -> List[FileMetadata]:
+        """Write a batch of metadata to the current database"""
+        return await self.database.save_many(items)
+
+    async def save_file_metadata(self, metadata: FileMetadata) -> FileMetadata:
+        """Save file metadata, batched with other concurrent saves"""
+        saved_metadata = await self._metadata_batcher.save(metadata)
+        self._search_cache.clear()
+        self._meta_cache[saved_metadata.id] = saved_metadata
+        return saved_metadata
+
+    async def flush_metadata(self):
+        """Write any metadata still waiting for its batch (e.g. on shutdown)"""
+        await self._metadata_batcher.flush()
+
+    async def _get_cached_metadata(self, file_id: str) -> Optional[FileMetadata]:
+        """Get file metadata, consulting the in-memory cache first"""
+        metadata = self._meta_cache.get(file_id)
+        if metadata is None:
+            metadata = await self.database.get_file_metadata(file_id)
+            if metadata is not None:
+                self._meta_cache[file_id] = metadata
+        return metadata
+
+    def _invalidate_cached_metadata(self, file_id: str):
+        """Drop a file from the metadata cache and all cached searches"""
+        self._meta_cache.pop(file_id, None)
+        self._search_cache.clear()
+
     async def get_file_metadata(self, file_id: str) -> Optional[FileMetadata]:
         """Get file metadata by ID"""
         try:
-            return await self.database.get_file_metadata(file_id)
+            return await self._get_cached_metadata(file_id)
         except Exception as e:
             logger.error(f"Failed to get file metadata: {e}")
             raise HTTPException(status_code=500, detail=f"Failed to get file metadata: {str(e)}")
@@ -378,7 +781,7 @@ class FileStorageService:
     async def get_file_content(self, file_id: str, user_id: str) -> Tuple[bytes, str]:
         """Get file content and MIME type"""
         try:
-            metadata = await self.database.get_file_metadata(file_id)
+            metadata = await self._get_cached_metadata(file_id)
             if not metadata:
                 raise HTTPException(status_code=404, detail="File not found")
             
@@ -387,13 +790,12 @@ class FileStorageService:
                 raise HTTPException(status_code=403, detail="Access denied")
             
             # Read file content
-            storage_path = Path(metadata.storage_path)
-            if not storage_path.exists():
+            try:
+                with open(metadata.storage_path, 'rb') as f:
+                    content = f.read()
+            except FileNotFoundError:
                 raise HTTPException(status_code=404, detail="File not found on storage")
             
-            with open(storage_path, 'rb') as f:
-                content = f.read()
-            
             return content, metadata.mime_type
             
         except HTTPException:
@@ -405,7 +807,7 @@ class FileStorageService:
     async def delete_file(self, file_id: str, user_id: str) -> bool:
         """Delete a file and its metadata"""
         try:
-            metadata = await self.database.get_file_metadata(file_id)
+            metadata = await self._get_cached_metadata(file_id)
             if not metadata:
                 raise HTTPException(status_code=404, detail="File not found")
             
@@ -414,12 +816,14 @@ class FileStorageService:
                 raise HTTPException(status_code=403, detail="Access denied")
             
             # Delete file from storage
-            storage_path = Path(metadata.storage_path)
-            if storage_path.exists():
-                storage_path.unlink()
+            try:
+                os.unlink(metadata.storage_path)
+            except FileNotFoundError:
+                pass
             
             # Delete metadata from database
             await self.database.delete_file_metadata(file_id)
+            self._invalidate_cached_metadata(file_id)
             
             logger.info(f"File deleted: {file_id}")
             return True
@@ -455,14 +859,19 @@ class FileStorageService:
                           offset: int = 0) -> List[FileMetadata]:
         """Search files based on criteria"""
         try:
-            return await self.database.search_files(
-                query=query,
-                file_type=file_type,
-                user_id=user_id,
-                project_id=project_id,
-                limit=limit,
-                offset=offset
-            )
+            cache_key = (query, file_type, user_id, project_id, limit, offset)
+            results = self._search_cache.get(cache_key)
+            if results is None:
+                results = await self.database.search_files(
+                    query=query,
+                    file_type=file_type,
+                    user_id=user_id,
+                    project_id=project_id,
+                    limit=limit,
+                    offset=offset
+                )
+                self._search_cache[cache_key] = results
+            return list(results)
         except Exception as e:
             logger.error(f"Failed to search files: {e}")
             raise HTTPException(status_code=500, detail=f"Failed to search files: {str(e)}")
@@ -5,15 +5,45 @@ Combines the Knowledge Base and AI capabilities for enhanced functionality
 
 import logging
 import asyncio
-from typing import List, Dict, Any, Optional, Union
+import dataclasses
+import hashlib
+from typing import List, Dict, Any, Optional, Union, Callable, Awaitable, Tuple
+
+from cachetools import LRUCache
 
 from services.knowledge_base import KnowledgeBaseService, SearchFilters
+from services.vector_search import SearchResult
 from services.ai_service_kb import AIService
 from services.ai_service import AIProvider, AnalysisType
 from config import get_logger
 
 logger = get_logger(__name__)
 
+# SearchResult field names, resolved once instead of per enriched result
+try:
+    _SR_FIELDS = tuple(f.name for f in dataclasses.fields(SearchResult))
+except TypeError:
+    _SR_FIELDS = ()
+
+# Supported enrichment kinds and how many AI calls may be in flight at once
+_ENRICHMENT_KINDS = ("summary", "sentiment")
+_ENRICHMENT_CONCURRENCY = 8
+
+# Upper bound on KB context characters sent along with a question
+_MAX_KB_CONTEXT_CHARS = 32 * 1024
+
+# Number of AI results kept per (enrichment kind, content) pair
+_AI_RESULT_CACHE_SIZE = 10_000
+
+
+def _result_to_dict(result: Any) -> Dict[str, Any]:
+    """Convert a search result into a plain dict of its fields"""
+    if _SR_FIELDS and isinstance(result, SearchResult):
+        return {name: getattr(result, name) for name in _SR_FIELDS}
+    if isinstance(result, dict):
+        return dict(result)
+    return dict(getattr(result, '__dict__', {}))
+
 class KnowledgeBaseAIIntegration:
     """Service that integrates Knowledge Base and AI functionalities"""
     
@@ -25,8 +55,46 @@ class KnowledgeBaseAIIntegration:
         """Initialize the integration service with KB and AI services"""
         self.kb_service = kb_service or KnowledgeBaseService()
         self.ai_service = ai_service or AIService()
+        
+        # AI results keyed by enrichment kind and content digest, so the same
+        # chunk is not re-sent to the model on every query
+        self._ai_result_cache: LRUCache = LRUCache(maxsize=_AI_RESULT_CACHE_SIZE)
         logger.info("Initialized Knowledge Base AI Integration service")
     
+    async def _cached_ai_call(
+        self,
+        kind: str,
+        content: str,
+        call: Callable[[str], Awaitable[Any]]
+    ) -> Any:
+        """
+        Return a cached AI result for this content, calling the model on a miss
+        
+        Args:
+            kind: Enrichment kind, part of the cache key
+            content: Content sent to the AI service
+            call: Coroutine function performing the AI call
+            
+        Returns:
+            The AI result; failures are raised and not cached
+        """
+        key: Tuple[str, bytes] = (kind, hashlib.blake2b(content.encode(), digest_size=16).digest())
+        try:
+            return self._ai_result_cache[key]
+        except KeyError:
+            pass
+        
+        result = await call(content)
+        self._ai_result_cache[key] = result
+        return result
+    
+    async def _analyze_sentiment(self, content: str) -> Any:
+        """Run sentiment analysis on content"""
+        return await self.ai_service.analyze_text(
+            content, 
+            analysis_type=AnalysisType.SENTIMENT
+        )
+    
     async def semantic_search_with_ai_enrichment(
         self, 
         query: str,
@@ -71,19 +139,13 @@ class KnowledgeBaseAIIntegration:
         if not search_results:
             return []
         
-        # Enrich results with AI analysis
+        # Convert results and collect the (result, enrichment) pairs to run
         enriched_results = []
+        jobs = []
         for result in search_results:
             # Convert SearchResult to dict
-            if hasattr(result, '__dict__'):
-                # Convert the object to a dictionary
-                enriched_result = {k: v for k, v in result.__dict__.items()}
-            else:
-                # If it's already a dict-like object
-                enriched_result = dict()
-                for key in dir(result):
-                    if not key.startswith('_') and not callable(getattr(result, key)):
-                        enriched_result[key] = getattr(result, key)
+            enriched_result = _result_to_dict(result)
+            enriched_results.append(enriched_result)
             
             # Get content for AI processing
             content = enriched_result.get('content', '')
@@ -91,30 +153,37 @@ class KnowledgeBaseAIIntegration:
                 content = result.content
                 
             if not content:
-                enriched_results.append(enriched_result)
                 continue
             
-            # Apply requested enrichments
-            if "summary" in enrich_with:
-                try:
-                    summary = await self.ai_service.generate_summary(content)
-                    enriched_result["ai_summary"] = summary
-                except Exception as e:
-                    logger.error(f"Error generating summary: {str(e)}")
-                    enriched_result["ai_summary"] = "Summary unavailable"
-            
-            if "sentiment" in enrich_with:
-                try:
-                    sentiment = await self.ai_service.analyze_text(
-                        content, 
-                        analysis_type=AnalysisType.SENTIMENT
-                    )
-                    enriched_result["ai_sentiment"] = sentiment
-                except Exception as e:
-                    logger.error(f"Error analyzing sentiment: {str(e)}")
-                    enriched_result["ai_sentiment"] = {"status": "error", "message": str(e)}
-            
-            enriched_results.append(enriched_result)
+            for kind in _ENRICHMENT_KINDS:
+                if kind in enrich_with:
+                    jobs.append((enriched_result, kind, content))
+        
+        # Run all enrichments concurrently, bounded so the AI backend is not flooded
+        semaphore = asyncio.Semaphore(_ENRICHMENT_CONCURRENCY)
+        
+        async def run_enrichment(kind: str, content: str) -> Any:
+            async with semaphore:
+                if kind == "summary":
+                    return await self._cached_ai_call(kind, content, self.ai_service.generate_summary)
+                return await self._cached_ai_call(kind, content, self._analyze_sentiment)
+        
+        outcomes = await asyncio.gather(
+            *(run_enrichment(kind, content) for _, kind, content in jobs),
+            return_exceptions=True
+        )
+        
+        for (enriched_result, kind, _), outcome in zip(jobs, outcomes):
+            if kind == "summary":
+                if isinstance(outcome, Exception):
+                    logger.error(f"Error generating summary: {str(outcome)}")
+                    outcome = "Summary unavailable"
+                enriched_result["ai_summary"] = outcome
+            else:
+                if isinstance(outcome, Exception):
+                    logger.error(f"Error analyzing sentiment: {str(outcome)}")
+                    outcome = {"status": "error", "message": str(outcome)}
+                enriched_result["ai_sentiment"] = outcome
         
         return enriched_results
     
@@ -156,7 +225,8 @@ class KnowledgeBaseAIIntegration:
         )
         
         # Extract content from results to use as context
-        kb_context = ""
+        context_parts = []
+        context_length = 0
         kb_sources = []
         
         for result in kb_results:
@@ -169,7 +239,11 @@ class KnowledgeBaseAIIntegration:
                 content = ""
                 
             if content:
-                kb_context += f"{content}\n\n"
+                # Stop once the context window is full; the first result is always kept
+                if context_parts and context_length + len(content) > _MAX_KB_CONTEXT_CHARS:
+                    break
+                context_parts.append(content)
+                context_length += len(content) + 2
                 
                 # Track source for citation
                 source = {
@@ -179,6 +253,8 @@ class KnowledgeBaseAIIntegration:
                 }
                 kb_sources.append(source)
         
+        kb_context = "".join(f"{part}\n\n" for part in context_parts)
+        
         # Generate AI response with the KB context
         response_text = await self.ai_service.generate_response(
             query=query,
@@ -225,7 +301,7 @@ class KnowledgeBaseAIIntegration:
         
         # Use AI to generate tags
         try:
-            tags_response = await self.ai_service.generate_tags(content)
+            tags_response = await self._cached_ai_call("tags", content, self.ai_service.generate_tags)
             
             # Process the response into a list of tags
             if isinstance(tags_response, list):
@@ -4,19 +4,32 @@ Handles document management, processing, and semantic search integration
 """
 
 import asyncio
+import heapq
+import io
 import logging
 import hashlib
-import json
+import orjson
 import os
 import mimetypes
+import mmap
+import shutil
+from bisect import bisect_left, bisect_right, insort
+from itertools import count, filterfalse, islice
+from operator import itemgetter
+import time
+from collections import Counter, OrderedDict
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import aiofiles
 try:
-    from typing import List, Dict, Any, Optional, Union, Tuple, IO, Callable
+    from typing import List, Dict, Any, Optional, Union, Tuple, IO, Callable, Iterator
     from datetime import datetime, timezone
-    from dataclasses import dataclass, asdict
+    from dataclasses import dataclass, replace as dataclass_replace
     from enum import Enum
     from pathlib import Path
     import re
     import functools
+    import numpy as np
 except ImportError:
     pass
 
@@ -41,9 +54,20 @@ except ImportError:
 # Try importing document processing libraries
 try:
     import PyPDF2
-    PDF_AVAILABLE = True
+    PYPDF2_AVAILABLE = True
 except ImportError:
-    PDF_AVAILABLE = False
+    PyPDF2 = None
+    PYPDF2_AVAILABLE = False
+
+# PDFium bindings extract text in C and are much faster than PyPDF2
+try:
+    import pypdfium2 as pdfium
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    pdfium = None
+    PDFIUM_AVAILABLE = False
+
+PDF_AVAILABLE = PDFIUM_AVAILABLE or PYPDF2_AVAILABLE
 
 try:
     from docx import Document as DocxDocument
@@ -58,8 +82,318 @@ try:
 except ImportError:
     OCR_AVAILABLE = False
 
+# JIT compiler for the chunk boundary scan used in bulk ingestion
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    numba = None
+    NUMBA_AVAILABLE = False
+
+# Lexbor-based HTML parser for fast, correct text extraction
+try:
+    from selectolax.parser import HTMLParser
+    SELECTOLAX_AVAILABLE = True
+except ImportError:
+    HTMLParser = None
+    SELECTOLAX_AVAILABLE = False
+
+# SIMD multi-pattern matcher for keyword scans (x86 only)
+try:
+    import hyperscan
+    HYPERSCAN_AVAILABLE = True
+except ImportError:
+    hyperscan = None
+    HYPERSCAN_AVAILABLE = False
+
+# Typed JSON decoding straight into KnowledgeDocument
+try:
+    import msgspec
+    MSGSPEC_AVAILABLE = True
+except ImportError:
+    msgspec = None
+    MSGSPEC_AVAILABLE = False
+
+# C Aho-Corasick automaton, the keyword scanner where Hyperscan is unavailable
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    ahocorasick = None
+    AHOCORASICK_AVAILABLE = False
+
+try:
+    import blake3
+    BLAKE3_AVAILABLE = True
+except ImportError:
+    blake3 = None
+    BLAKE3_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Seconds to coalesce document changes before they are written to metadata.db
+_METADATA_FLUSH_DELAY = 0.5
+
+# Fallback HTML tag stripper when selectolax is not installed
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+
+def _html_to_text(html_content: str) -> str:
+    """Extract the visible text of an HTML document"""
+    if SELECTOLAX_AVAILABLE:
+        tree = HTMLParser(html_content)
+        tree.strip_tags(["script", "style", "noscript"])
+        return tree.text(separator=" ", strip=True)
+    # Remove HTML tags (basic)
+    return _HTML_TAG_RE.sub('', html_content).strip()
+
+# Seconds get_statistics reuses the vector database item count
+_VECTOR_COUNT_TTL = 5.0
+
+# Seconds health_check reuses a healthy result, and the minimum seconds
+# between its add/process/delete round-trip probes
+_HEALTH_CHECK_TTL = 30.0
+_HEALTH_PROBE_INTERVAL = 300.0
+
+# Sentence terminators used for chunk boundaries
+_SENTENCE_END_RE = re.compile(r'[.!?]+')
+
+# PDF parsing, DOCX parsing and OCR are CPU-bound Python/C code that holds
+# the GIL, so they run in worker processes to keep the event loop free and
+# let a batch of documents extract in parallel. Created on first use and
+# shut down when the service closes. Each worker holds a full interpreter,
+# so the default is capped rather than one per core.
+_EXTRACT_WORKERS = int(os.getenv("CATALYST_KB_EXTRACT_WORKERS", str(min(os.cpu_count() or 1, 4))))
+_EXTRACT_POOL: Optional[ProcessPoolExecutor] = None
+
+# PDFs averaging fewer extracted characters per page are treated as scans
+_SCANNED_PDF_CHARS_PER_PAGE = 100
+
+def _extract_pool() -> ProcessPoolExecutor:
+    """Return the shared extraction process pool"""
+    global _EXTRACT_POOL
+    if _EXTRACT_POOL is None:
+        _EXTRACT_POOL = ProcessPoolExecutor(max_workers=_EXTRACT_WORKERS)
+    return _EXTRACT_POOL
+
+def _shutdown_extract_pool():
+    """Stop the extraction worker processes; the next extraction starts a new pool"""
+    global _EXTRACT_POOL
+    pool, _EXTRACT_POOL = _EXTRACT_POOL, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def _iter_pdf_page_text(file_path: str):
+    """Yield the text of each PDF page, using PDFium when installed"""
+    if PDFIUM_AVAILABLE:
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            for page in pdf:
+                yield page.get_textpage().get_text_range()
+        finally:
+            pdf.close()
+        return
+    with open(file_path, 'rb') as f:
+        for page in PyPDF2.PdfReader(f).pages:
+            yield page.extract_text()
+
+def _iter_pdf_page_images(file_path: str):
+    """
+    Yield one PIL image per scanned PDF page
+    
+    The images embedded in each page are used as-is when PyPDF2 can read
+    them, which skips rasterizing the page. PDFium rendering is the fallback.
+    """
+    if PYPDF2_AVAILABLE:
+        with open(file_path, 'rb') as f:
+            for page in PyPDF2.PdfReader(f).pages:
+                for image in page.images:
+                    yield Image.open(io.BytesIO(image.data))
+    elif PDFIUM_AVAILABLE:
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            for page in pdf:
+                yield page.render(scale=300 / 72).to_pil()
+        finally:
+            pdf.close()
+
+def _pdf_ocr_sync(file_path: str) -> str:
+    """OCR the page images of a scanned PDF"""
+    texts = []
+    for image in _iter_pdf_page_images(file_path):
+        with image:
+            text = pytesseract.image_to_string(image).strip()
+        if text:
+            texts.append(text)
+    return '\n\n'.join(texts)
+
+def _pdf_extract_sync(file_path: str, ocr: bool = False) -> str:
+    """Extract text from a PDF file (runs in a worker process)"""
+    # Stream pages into one buffer rather than keeping every page string alive
+    buf = io.StringIO()
+    separator = ""
+    page_count = 0
+    text_chars = 0
+    for text in _iter_pdf_page_text(file_path):
+        page_count += 1
+        if text.strip():
+            buf.write(separator)
+            buf.write(text)
+            separator = "\n\n"
+            text_chars += len(text)
+    
+    # Next to no text layer means a scanned PDF: OCR its page images instead
+    if ocr and page_count and text_chars < _SCANNED_PDF_CHARS_PER_PAGE * page_count:
+        try:
+            ocr_text = _pdf_ocr_sync(file_path)
+        except Exception as e:
+            logger.warning(f"OCR of scanned PDF {file_path} failed: {e}")
+        else:
+            if ocr_text:
+                return ocr_text
+    return buf.getvalue()
+
+def _docx_extract_sync(file_path: str) -> str:
+    """Extract text from a DOCX file (runs in a worker process)"""
+    doc = DocxDocument(file_path)
+    return '\n\n'.join(p.text for p in doc.paragraphs if p.text.strip())
+
+def _ocr_extract_sync(file_path: str) -> str:
+    """Extract text from an image using OCR (runs in a worker process)"""
+    with Image.open(file_path) as image:
+        return pytesseract.image_to_string(image).strip()
+
+def _chunk_bounds(content: str, chunk_size: int) -> List[Tuple[int, int]]:
+    """
+    Return (start, end) character offsets of sentence-boundary chunks
+    
+    Walks the sentence ends and cuts a chunk at the last boundary before it
+    would exceed chunk_size. Text after the last sentence end joins the
+    final chunk if it fits.
+    """
+    bounds = []
+    chunk_start = 0
+    sentence_end = 0
+    for match in _SENTENCE_END_RE.finditer(content):
+        if match.end() - chunk_start > chunk_size and sentence_end > chunk_start:
+            bounds.append((chunk_start, sentence_end))
+            chunk_start = sentence_end
+        sentence_end = match.end()
+    
+    if len(content) - chunk_start > chunk_size and sentence_end > chunk_start:
+        bounds.append((chunk_start, sentence_end))
+        chunk_start = sentence_end
+    bounds.append((chunk_start, len(content)))
+    return bounds
+
+def _window_bounds(content: str,
+                   bounds: List[Tuple[int, int]],
+                   chunk_size: int,
+                   chunk_overlap: int) -> List[Tuple[int, int]]:
+    """
+    Bound sentence chunks to chunk_size and overlap neighbours by chunk_overlap
+    
+    The sentence chunks are expected to be cut at chunk_size - chunk_overlap.
+    A span still longer than that (text with no sentence end in reach) is
+    hard-split at word boundaries, like VectorSearchService._chunk_text.
+    Every chunk after the first then starts up to chunk_overlap characters
+    earlier, at a word boundary.
+    """
+    step = chunk_size - chunk_overlap
+    pieces = []
+    for start, end in bounds:
+        while end - start > step:
+            cut = start + step
+            # Break at a space within the last 100 characters when there is one
+            space = content.rfind(' ', start, cut)
+            if space > max(start, cut - 100):
+                cut = space
+            pieces.append((start, cut))
+            start = cut
+        pieces.append((start, end))
+    
+    windows = pieces[:1]
+    for start, end in pieces[1:]:
+        window_start = max(start - chunk_overlap, 0)
+        if window_start > 0 and not content[window_start - 1].isspace():
+            # Skip the partial word the overlap would start in
+            space = content.find(' ', window_start, start)
+            if space != -1:
+                window_start = space + 1
+        windows.append((window_start, end))
+    return windows
+
+def _chunk_bounds_kernel(codes, chunk_size):
+    """
+    _chunk_bounds over an array of code points, returning an (n, 2) array
+    
+    Written in the subset of Python that Numba compiles: only integers
+    and arrays, no strings.
+    """
+    n = codes.shape[0]
+    starts = [0]
+    ends = [0]
+    starts.pop()
+    ends.pop()
+    chunk_start = 0
+    sentence_end = 0
+    for i in range(n):
+        c = codes[i]
+        if c != 46 and c != 33 and c != 63:  # . ! ?
+            continue
+        if i + 1 < n:
+            following = codes[i + 1]
+            if following == 46 or following == 33 or following == 63:
+                continue
+        # i + 1 ends a run of sentence terminators
+        if i + 1 - chunk_start > chunk_size and sentence_end > chunk_start:
+            starts.append(chunk_start)
+            ends.append(sentence_end)
+            chunk_start = sentence_end
+        sentence_end = i + 1
+    
+    if n - chunk_start > chunk_size and sentence_end > chunk_start:
+        starts.append(chunk_start)
+        ends.append(sentence_end)
+        chunk_start = sentence_end
+    starts.append(chunk_start)
+    ends.append(n)
+    
+    bounds = np.empty((len(starts), 2), dtype=np.int64)
+    for k in range(len(starts)):
+        bounds[k, 0] = starts[k]
+        bounds[k, 1] = ends[k]
+    return bounds
+
+_chunk_bounds_jit = numba.njit(cache=True)(_chunk_bounds_kernel) if NUMBA_AVAILABLE else None
+
+def _code_points(content: str) -> np.ndarray:
+    """View text as an array with one element per character"""
+    if content.isascii():
+        return np.frombuffer(content.encode('ascii'), dtype=np.uint8)
+    return np.frombuffer(content.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+
+def _copy_and_hash(source_path: Path, stored_path: Path, file_size: int) -> str:
+    """Copy a source file into storage and return its source hash"""
+    # Let the kernel copy the file (sendfile/copy_file_range), then
+    # hash the source straight from the page cache through a mapping
+    shutil.copyfile(source_path, stored_path)
+    with open(source_path, 'rb') as src:
+        if not file_size:
+            return _source_hash(b"")
+        with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return _source_hash(mapped)
+
+def _source_hash(data) -> str:
+    """
+    Hash document bytes for change detection (32 hex chars)
+    
+    Uses BLAKE3 when installed, otherwise MD5. The hash is only an identity
+    check for document content, not a security boundary.
+    """
+    if BLAKE3_AVAILABLE:
+        return blake3.blake3(data, max_threads=blake3.blake3.AUTO).hexdigest(length=16)
+    return hashlib.md5(data, usedforsecurity=False).hexdigest()
+
 class DocumentType(str, Enum):
     """Document types for categorization"""
     GUIDANCE = "guidance"
@@ -81,6 +415,107 @@ class ProcessingStatus(str, Enum):
     FAILED = "failed"
     INDEXED = "indexed"
 
+# Categorization keywords in precedence order; the first category with a hit wins
+_CATEGORY_KEYWORDS = (
+    (DocumentType.GUIDANCE, ("guide", "how to", "tutorial", "instruction")),
+    (DocumentType.REFERENCE, ("reference", "documentation", "spec", "standard")),
+    (DocumentType.CASE_STUDY, ("case study", "example", "scenario")),
+    (DocumentType.TEMPLATE, ("template", "form", "format")),
+    (DocumentType.RESEARCH, ("research", "study", "analysis", "findings")),
+    (DocumentType.MANUAL, ("manual", "handbook", "procedures")),
+    (DocumentType.FAQ, ("faq", "questions", "q&a")),
+)
+_CATEGORY_RANK = {
+    word: rank
+    for rank, (_, words) in enumerate(_CATEGORY_KEYWORDS)
+    for word in words
+}
+
+# Common relationship/therapy keywords, plus words mapped to document type tags
+_TAG_FOR_KEYWORD = {
+    **{keyword: keyword for keyword in (
+        "communication", "relationship", "therapy", "counseling", "conflict",
+        "emotional", "intimacy", "trust", "attachment", "boundaries",
+        "empathy", "listening", "validation", "support", "growth"
+    )},
+    "guide": "guide", "tutorial": "guide",
+    "example": "example", "case": "example",
+    "research": "research", "study": "research",
+}
+
+class _KeywordScanner:
+    """
+    Finds which keywords occur in a text in a single scan
+    
+    Uses a Hyperscan database when available, then an Aho-Corasick
+    automaton, and otherwise one regex alternation wrapped in a lookahead.
+    All report every (possibly overlapping) occurrence, matching plain
+    substring semantics.
+    """
+    
+    def __init__(self, keywords, backend: Optional[str] = None):
+        self.keywords = tuple(keywords)
+        if backend is None:
+            backend = "hyperscan" if HYPERSCAN_AVAILABLE else "ahocorasick" if AHOCORASICK_AVAILABLE else "regex"
+        self.backend = backend
+        
+        if backend == "hyperscan":
+            self._database = hyperscan.Database()
+            self._database.compile(
+                expressions=[re.escape(word).encode() for word in self.keywords],
+                ids=list(range(len(self.keywords))),
+                flags=[hyperscan.HS_FLAG_SINGLEMATCH] * len(self.keywords),
+            )
+        elif backend == "ahocorasick":
+            self._automaton = ahocorasick.Automaton()
+            for word in self.keywords:
+                self._automaton.add_word(word, word)
+            self._automaton.make_automaton()
+        else:
+            alternation = "|".join(re.escape(word) for word in sorted(self.keywords, key=len, reverse=True))
+            self._pattern = re.compile(f"(?=({alternation}))")
+            # The regex reports only the longest keyword starting at each
+            # position, so a hit also implies every keyword contained in it
+            self._contained = {
+                word: {other for other in self.keywords if other in word}
+                for word in self.keywords
+            }
+    
+    def find(self, text: str) -> set:
+        """Return the set of keywords found in text"""
+        if self.backend == "ahocorasick":
+            return {word for _, word in self._automaton.iter(text)}
+        if self.backend == "regex":
+            return set().union(*(self._contained[word] for word in set(self._pattern.findall(text))))
+        hits = set()
+        
+        def on_match(keyword_id, start, end, flags, context):
+            hits.add(self.keywords[keyword_id])
+        
+        self._database.scan(text.encode(), match_event_handler=on_match)
+        return hits
+
+_CATEGORY_SCANNER = _KeywordScanner(_CATEGORY_RANK)
+_TAG_SCANNER = _KeywordScanner(_TAG_FOR_KEYWORD)
+
+def _kb_error_response(func_name: str) -> Callable[[Exception], Any]:
+    """Pick the error response builder for a wrapped method by its name"""
+    if func_name.startswith("search"):
+        return lambda e: []
+    if func_name.startswith("get_"):
+        return lambda e: None
+    if func_name.startswith("index_") or func_name.startswith("process_"):
+        return lambda e: {
+            "success": False,
+            "error": str(e),
+            "error_type": type(e).__name__
+        }
+    # For update/delete operations
+    return lambda e: {
+        "success": False,
+        "error": str(e)
+    }
+
 def handle_kb_errors(func):
     """
     Decorator for handling knowledge base service errors
@@ -91,40 +526,28 @@ def handle_kb_errors(func):
     Returns:
         Wrapped function with error handling
     """
+    # Resolved once per decorated function rather than on every error
+    func_name = func.__name__
+    error_response = _kb_error_response(func_name)
+    
     @functools.wraps(func)
     async def wrapper(*args, **kwargs):
         try:
             return await func(*args, **kwargs)
         except Exception as e:
-            # Get the function name for better error context
-            func_name = func.__name__
-            
             # Log the error with detailed context
-            logger.error(f"Knowledge base error in {func_name}: {str(e)}", 
-                         extra={
-                             "args": args[1:],  # Skip self
-                             "kwargs": kwargs,
-                             "error_type": type(e).__name__
-                         },
-                         exc_info=True)
+            if logger.isEnabledFor(logging.ERROR):
+                logger.error(f"Knowledge base error in {func_name}: {str(e)}", 
+                             extra={
+                                 # "args" is reserved by LogRecord
+                                 "call_args": args[1:],  # Skip self
+                                 "call_kwargs": kwargs,
+                                 "error_type": type(e).__name__
+                             },
+                             exc_info=True)
             
             # Return a proper error response instead of raising
-            if func_name.startswith("search"):
-                return []
-            elif func_name.startswith("get_"):
-                return None
-            elif func_name.startswith("index_") or func_name.startswith("process_"):
-                return {
-                    "success": False,
-                    "error": str(e),
-                    "error_type": type(e).__name__
-                }
-            else:
-                # For update/delete operations
-                return {
-                    "success": False,
-                    "error": str(e)
-                }
+            return error_response(e)
     
     return wrapper
 
@@ -154,7 +577,8 @@ class KnowledgeDocument:
     """Knowledge base document"""
     id: str
     title: str
-    content: str
+    # Held in memory only until indexed; afterwards read from processed/
+    content: Optional[str]
     document_type: DocumentType
     file_path: Optional[str] = None
     file_type: Optional[str] = None
@@ -167,6 +591,146 @@ class KnowledgeDocument:
     status: ProcessingStatus = ProcessingStatus.PENDING
     chunk_count: int = 0
     source_hash: Optional[str] = None
+    
+    def __post_init__(self):
+        self.refresh_tag_set()
+        # Fields merged into search results; built on first use, reset on update
+        self._search_projection: Optional[Dict[str, Any]] = None
+    
+    def refresh_tag_set(self):
+        """Recompute the tag set used for membership tests (call after changing tags)"""
+        self._tag_set = frozenset(self.tags or ())
+
+# Decodes stored rows into KnowledgeDocument, parsing datetimes and enums in C
+_DOCUMENT_DECODER = msgspec.json.Decoder(KnowledgeDocument) if MSGSPEC_AVAILABLE else None
+
+# list_documents selects the page from the candidate set with a bounded
+# heap when the date range holds this many times more documents than it
+_HEAP_SELECT_RATIO = 8
+
+# Caches at least this large put a random-projection LSH index in front of
+# the exact cosine scan; below it one matrix-vector product is cheaper
+_QUERY_CACHE_LSH_MIN_SIZE = 4096
+# LSH tables and sign bits per table. For cosine 0.95 (about 18 degrees) a
+# bit flips with p ~= 0.1; probing each table's bucket plus its 1-bit
+# neighbours finds such a match in at least one of 6 tables > 99.8% of the time
+_QUERY_CACHE_LSH_TABLES = 6
+_QUERY_CACHE_LSH_BITS = 12
+
+class _SemanticQueryCache:
+    """
+    LRU cache of search results keyed by query embedding
+    
+    Normalized embeddings live in a preallocated matrix, so a lookup is one
+    matrix-vector product. A cached query is reused when its cosine
+    similarity to the new one reaches the threshold and it was run with the
+    same filters, limit and threshold (its namespace).
+    
+    Large caches also index the embeddings with signed random projections,
+    so a lookup only scores the few entries sharing (or nearly sharing) a
+    bucket with the query. This is approximate: a qualifying entry is
+    missed very rarely, which only costs a normal search.
+    """
+    
+    def __init__(self, max_size: int, threshold: float, use_lsh: Optional[bool] = None):
+        self.max_size = max_size
+        self.threshold = threshold
+        self.use_lsh = max_size >= _QUERY_CACHE_LSH_MIN_SIZE if use_lsh is None else use_lsh
+        self._entries: "OrderedDict[int, List[SearchResult]]" = OrderedDict()
+        self._free_slots = list(range(max_size - 1, -1, -1))
+        self._namespace_ids: Dict[Any, int] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._slot_namespace = np.full(max_size, -1, dtype=np.int64)
+        # LSH state: projection planes, one bucket dict per table, and each
+        # slot's bucket keys so evictions can unlink it
+        self._planes: Optional[np.ndarray] = None
+        self._buckets: List[Dict[int, set]] = [{} for _ in range(_QUERY_CACHE_LSH_TABLES)]
+        self._slot_keys = np.zeros((max_size, _QUERY_CACHE_LSH_TABLES), dtype=np.int64)
+        self._bit_weights = 1 << np.arange(_QUERY_CACHE_LSH_BITS, dtype=np.int64)
+    
+    @staticmethod
+    def _normalize(embedding) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+    
+    def _lsh_keys(self, vector: np.ndarray) -> np.ndarray:
+        """Bucket key of the vector in each LSH table"""
+        return ((self._planes @ vector) > 0) @ self._bit_weights
+    
+    def _lsh_candidates(self, vector: np.ndarray) -> np.ndarray:
+        """Slots in the query's buckets or buckets one sign bit away"""
+        candidates = set()
+        for table, key in zip(self._buckets, self._lsh_keys(vector).tolist()):
+            for probe in (key, *(key ^ (1 << bit) for bit in range(_QUERY_CACHE_LSH_BITS))):
+                slots = table.get(probe)
+                if slots:
+                    candidates.update(slots)
+        return np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+    
+    def get(self, namespace, embedding) -> Optional[List[SearchResult]]:
+        """Return cached results for a near-duplicate query, if any"""
+        namespace_id = self._namespace_ids.get(namespace)
+        vector = self._normalize(embedding)
+        if namespace_id is None or vector is None or self._matrix is None or vector.shape[0] != self._matrix.shape[1]:
+            return None
+        if self.use_lsh:
+            slots = self._lsh_candidates(vector)
+            slots = slots[self._slot_namespace[slots] == namespace_id]
+            if not slots.size:
+                return None
+            sims = self._matrix[slots] @ vector
+            best = int(np.argmax(sims))
+            slot = int(slots[best])
+            similarity = sims[best]
+        else:
+            sims = self._matrix @ vector
+            sims[self._slot_namespace != namespace_id] = -np.inf
+            slot = int(np.argmax(sims))
+            similarity = sims[slot]
+        if similarity < self.threshold:
+            return None
+        self._entries.move_to_end(slot)
+        return self._entries[slot]
+    
+    def put(self, namespace, embedding, results: List[SearchResult]):
+        """Cache results for a query, evicting the least recently used entry"""
+        vector = self._normalize(embedding)
+        if vector is None or self.max_size <= 0:
+            return
+        if self._matrix is None or vector.shape[0] != self._matrix.shape[1]:
+            self.clear()
+            self._matrix = np.zeros((self.max_size, vector.shape[0]), dtype=np.float32)
+            if self.use_lsh:
+                rng = np.random.default_rng(0)
+                self._planes = rng.standard_normal(
+                    (_QUERY_CACHE_LSH_TABLES, _QUERY_CACHE_LSH_BITS, vector.shape[0])
+                ).astype(np.float32)
+        if not self._free_slots:
+            evicted, _ = self._entries.popitem(last=False)
+            self._slot_namespace[evicted] = -1
+            if self.use_lsh:
+                for table, key in zip(self._buckets, self._slot_keys[evicted].tolist()):
+                    table[key].discard(evicted)
+            self._free_slots.append(evicted)
+        slot = self._free_slots.pop()
+        self._matrix[slot] = vector
+        self._slot_namespace[slot] = self._namespace_ids.setdefault(namespace, len(self._namespace_ids))
+        if self.use_lsh:
+            keys = self._lsh_keys(vector)
+            self._slot_keys[slot] = keys
+            for table, key in zip(self._buckets, keys.tolist()):
+                table.setdefault(key, set()).add(slot)
+        self._entries[slot] = results
+    
+    def clear(self):
+        """Drop every cached query (the stored documents changed)"""
+        self._entries.clear()
+        self._free_slots = list(range(self.max_size - 1, -1, -1))
+        self._slot_namespace.fill(-1)
+        self._buckets = [{} for _ in range(_QUERY_CACHE_LSH_TABLES)]
+        if self._matrix is not None:
+            self._matrix.fill(0)
 
 @dataclass
 class SearchFilters:
@@ -195,12 +759,53 @@ class KnowledgeBaseService:
         self.storage_path = Path(self.config["storage_path"])
         self.vector_service = vector_service or VectorSearchService()
         
-        # Document metadata storage (in production, use proper database)
-        self.metadata_file = self.storage_path / "metadata.json"
+        # Document metadata storage: one SQLite row per document
+        self.metadata_db_file = self.storage_path / "metadata.db"
+        self.legacy_metadata_file = self.storage_path / "metadata.json"
         self.documents = {}
         
+        # Secondary indexes for list_documents: filter value -> document IDs,
+        # and (created timestamp, -insertion seq, id) keys in ascending order
+        self._idx_type: Dict[str, set] = {}
+        self._idx_tag: Dict[str, set] = {}
+        self._idx_file_type: Dict[str, set] = {}
+        self._multi_chunk: set = set()  # IDs of documents split into several chunks
+        self._by_date: List[Tuple[float, int, str]] = []
+        self._date_keys: Dict[str, Tuple[float, int, str]] = {}
+        self._index_seq = count()
+        
+        # Running aggregates for get_statistics
+        self._cnt_status: Counter = Counter()
+        self._cnt_type: Counter = Counter()
+        self._cnt_file_type: Counter = Counter()
+        self._total_size = 0
+        self._total_chunks = 0
+        self._vector_count: Optional[Tuple[float, int]] = None  # (expires at, count)
+        
+        # Last healthy health_check result and when the round-trip probe last passed
+        self._last_health: Optional[Tuple[float, Dict[str, Any]]] = None  # (expires at, status)
+        self._last_probe = float("-inf")
+        self._health_lock = asyncio.Lock()
+        
+        # Documents changed since the last write, coalescing bursts of changes
+        self._dirty_ids = set()
+        self._metadata_flush_handle: Optional[asyncio.TimerHandle] = None
+        # Metadata is serialized and written off the event loop. A single
+        # worker keeps writes in order, so an older snapshot never lands last.
+        self._metadata_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kb-metadata")
+        
+        # Source hash -> an indexed document with that content, whose vectors
+        # can be copied instead of re-embedding identical content
+        self._hash_to_doc_id: Dict[str, str] = {}
+        
+        # Recent search results, reused for near-duplicate queries
+        self._query_cache = _SemanticQueryCache(
+            self.config["query_cache_size"], self.config["query_cache_threshold"]
+        )
+        
         # Ensure storage directories exist
         self._create_storage_structure()
+        self.db = self._open_metadata_db()
         
         # Load existing metadata
         self._load_metadata()
@@ -212,14 +817,16 @@ class KnowledgeBaseService:
         return {
             "storage_path": storage_path or os.getenv("CATALYST_KB_STORAGE_PATH", "./data/knowledge_base"),
             "max_file_size": int(os.getenv("CATALYST_KB_MAX_FILE_SIZE", str(50 * 1024 * 1024))),  # 50MB
-            "supported_types": [
+            "supported_types": frozenset([
                 "text/plain", "text/markdown", "text/html",
                 "application/pdf", "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
                 "image/jpeg", "image/png", "image/gif", "image/bmp", "image/tiff"
-            ],
+            ]),
             "auto_categorize": os.getenv("CATALYST_KB_AUTO_CATEGORIZE", "true").lower() == "true",
             "auto_tag": os.getenv("CATALYST_KB_AUTO_TAG", "true").lower() == "true",
-            "ocr_enabled": OCR_AVAILABLE and os.getenv("CATALYST_KB_OCR_ENABLED", "true").lower() == "true"
+            "ocr_enabled": OCR_AVAILABLE and os.getenv("CATALYST_KB_OCR_ENABLED", "true").lower() == "true",
+            "query_cache_size": int(os.getenv("CATALYST_KB_QUERY_CACHE_SIZE", "1024")),
+            "query_cache_threshold": float(os.getenv("CATALYST_KB_QUERY_CACHE_THRESHOLD", "0.95"))
         }
     
     def _create_storage_structure(self):
@@ -231,45 +838,156 @@ class KnowledgeBaseService:
         (self.storage_path / "processed").mkdir(exist_ok=True)
         (self.storage_path / "temp").mkdir(exist_ok=True)
     
+    def _open_metadata_db(self) -> sqlite3.Connection:
+        """Open the metadata database in WAL mode and create the schema"""
+        db = sqlite3.connect(self.metadata_db_file, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "id TEXT PRIMARY KEY, data BLOB NOT NULL, status TEXT, "
+            "document_type TEXT, updated_at REAL)"
+        )
+        return db
+    
+    @staticmethod
+    def _document_from_data(doc_data: Dict[str, Any]) -> KnowledgeDocument:
+        """Rebuild a KnowledgeDocument from its deserialized form"""
+        # Convert datetime strings back to datetime objects
+        for field in ['created_at', 'updated_at', 'processed_at']:
+            if doc_data.get(field):
+                doc_data[field] = datetime.fromisoformat(doc_data[field])
+        doc_data['document_type'] = DocumentType(doc_data['document_type'])
+        if doc_data.get('status'):
+            doc_data['status'] = ProcessingStatus(doc_data['status'])
+        return KnowledgeDocument(**doc_data)
+    
+    def _iter_stored_documents(self):
+        """Yield stored documents one row at a time"""
+        for doc_id, data in self.db.execute("SELECT id, data FROM documents"):
+            if _DOCUMENT_DECODER is not None:
+                yield doc_id, _DOCUMENT_DECODER.decode(data)
+            else:
+                yield doc_id, self._document_from_data(orjson.loads(data))
+    
     def _load_metadata(self):
         """Load document metadata from storage"""
         try:
-            if self.metadata_file.exists():
-                with open(self.metadata_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # Convert to KnowledgeDocument objects
-                    for doc_id, doc_data in data.items():
-                        # Convert datetime strings back to datetime objects
-                        for field in ['created_at', 'updated_at', 'processed_at']:
-                            if doc_data.get(field):
-                                doc_data[field] = datetime.fromisoformat(doc_data[field])
-                        
-                        self.documents[doc_id] = KnowledgeDocument(**doc_data)
+            self._import_legacy_metadata()
+            for doc_id, document in self._iter_stored_documents():
+                self.documents[doc_id] = document
+                self._index_document(document)
+                if document.source_hash and document.status == ProcessingStatus.INDEXED:
+                    self._hash_to_doc_id[document.source_hash] = doc_id
                         
-                logger.info(f"Loaded {len(self.documents)} documents from metadata")
+            logger.info(f"Loaded {len(self.documents)} documents from metadata")
         except Exception as e:
             logger.error(f"Error loading metadata: {e}")
             self.documents = {}
+            self._idx_type, self._idx_tag, self._idx_file_type = {}, {}, {}
+            self._multi_chunk = set()
+            self._by_date, self._date_keys = [], {}
+            self._cnt_status, self._cnt_type, self._cnt_file_type = Counter(), Counter(), Counter()
+            self._total_size = self._total_chunks = 0
     
-    def _save_metadata(self):
-        """Save document metadata to storage"""
+    def _import_legacy_metadata(self):
+        """Move documents from an old metadata.json into the database once"""
+        if not self.legacy_metadata_file.exists():
+            return
+        data = orjson.loads(self.legacy_metadata_file.read_bytes())
+        documents = [self._document_from_data(doc_data) for doc_data in data.values()]
+        self._upsert_documents(documents)
+        self.legacy_metadata_file.rename(self.legacy_metadata_file.with_suffix(".json.migrated"))
+        logger.info(f"Migrated {len(documents)} documents from {self.legacy_metadata_file.name}")
+    
+    def _upsert_documents(self, documents: List[KnowledgeDocument]):
+        """Insert or update the rows for the given documents in one transaction"""
+        rows = [
+            (
+                doc.id,
+                # orjson serializes the dataclasses, enums and datetimes natively
+                orjson.dumps(doc, option=orjson.OPT_NAIVE_UTC),
+                doc.status.value,
+                doc.document_type.value,
+                doc.updated_at.timestamp() if doc.updated_at else None,
+            )
+            for doc in documents
+        ]
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO documents (id, data, status, document_type, updated_at) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET data=excluded.data, status=excluded.status, "
+                "document_type=excluded.document_type, updated_at=excluded.updated_at",
+                rows,
+            )
+    
+    def _take_dirty_documents(self) -> Tuple[List[KnowledgeDocument], List[str]]:
+        """Split the pending changes into changed documents and removed IDs"""
+        dirty_ids, self._dirty_ids = self._dirty_ids, set()
+        changed = [self.documents[doc_id] for doc_id in dirty_ids if doc_id in self.documents]
+        removed = [doc_id for doc_id in dirty_ids if doc_id not in self.documents]
+        return changed, removed
+    
+    def _write_metadata(self, changed: List[KnowledgeDocument], removed: List[str]):
+        """Write changed documents to storage, deleting rows for removed ones"""
         try:
-            # Convert to serializable format
-            data = {}
-            for doc_id, doc in self.documents.items():
-                doc_dict = asdict(doc)
-                # Convert datetime objects to strings
-                for field in ['created_at', 'updated_at', 'processed_at']:
-                    if doc_dict.get(field):
-                        doc_dict[field] = doc_dict[field].isoformat()
-                data[doc_id] = doc_dict
-            
-            with open(self.metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            if changed:
+                self._upsert_documents(changed)
+            if removed:
+                with self.db:
+                    self.db.executemany("DELETE FROM documents WHERE id = ?", [(doc_id,) for doc_id in removed])
                 
         except Exception as e:
             logger.error(f"Error saving metadata: {e}")
     
+    def _save_metadata(self):
+        """Write pending metadata changes and wait for them to land"""
+        self._metadata_writer.submit(self._write_metadata, *self._take_dirty_documents()).result()
+    
+    def _flush_in_background(self):
+        """Hand pending metadata changes to the writer thread"""
+        self._metadata_flush_handle = None
+        if self._dirty_ids:
+            self._metadata_writer.submit(self._write_metadata, *self._take_dirty_documents())
+    
+    def _mark_dirty(self, document_id: str):
+        """Schedule a metadata write, coalescing changes made within the flush delay"""
+        self._dirty_ids.add(document_id)
+        self._query_cache.clear()
+        if self._metadata_flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop to defer to; write straight away
+            self.flush_metadata()
+            return
+        self._metadata_flush_handle = loop.call_later(_METADATA_FLUSH_DELAY, self._flush_in_background)
+    
+    def flush_metadata(self):
+        """Write pending metadata changes now (e.g. before shutdown)"""
+        if self._metadata_flush_handle is not None:
+            self._metadata_flush_handle.cancel()
+            self._metadata_flush_handle = None
+        if self._dirty_ids:
+            self._save_metadata()
+        else:
+            # Wait for writes already handed to the writer thread
+            self._metadata_writer.submit(lambda: None).result()
+    
+    async def close(self):
+        """Write pending metadata changes without blocking the event loop, then
+        release storage and the extraction worker processes"""
+        if self._metadata_flush_handle is not None:
+            self._metadata_flush_handle.cancel()
+            self._metadata_flush_handle = None
+        # The writer runs submissions in order, so this also waits for earlier writes
+        await asyncio.wrap_future(self._metadata_writer.submit(self._write_metadata, *self._take_dirty_documents()))
+        self._metadata_writer.shutdown()
+        self.db.close()
+        await asyncio.to_thread(_shutdown_extract_pool)
+    
     async def initialize(self) -> bool:
         """
         Initialize the knowledge base service
@@ -324,8 +1042,9 @@ class KnowledgeBaseService:
                 # Direct content
                 final_content = content
                 file_type = "text/plain"
-                file_size = len(content.encode('utf-8'))
-                source_hash = hashlib.md5(content.encode('utf-8')).hexdigest()
+                content_bytes = content.encode('utf-8')
+                file_size = len(content_bytes)
+                source_hash = _source_hash(content_bytes)
                 stored_file_path = None
                 
             elif file_data:
@@ -333,21 +1052,21 @@ class KnowledgeBaseService:
                 result = await self._process_file_data(file_data, title, doc_id)
                 if not result:
                     return None
-                final_content, file_type, file_size, stored_file_path = result
-                source_hash = hashlib.md5(file_data).hexdigest()
+                final_content, file_type, file_size, stored_file_path, source_hash = result
                 
             elif file_path:
                 # File path provided
                 result = await self._process_file_path(file_path, doc_id)
                 if not result:
                     return None
-                final_content, file_type, file_size, stored_file_path = result
-                with open(file_path, 'rb') as f:
-                    source_hash = hashlib.md5(f.read()).hexdigest()
+                final_content, file_type, file_size, stored_file_path, source_hash = result
             else:
                 logger.error("No content, file_path, or file_data provided")
                 return None
             
+            # Accept plain strings; the indexes and storage rely on the enum
+            document_type = DocumentType(document_type)
+            
             # Auto-categorize if enabled
             if self.config.get("auto_categorize") and document_type == DocumentType.OTHER:
                 document_type = await self._auto_categorize(final_content, title)
@@ -375,8 +1094,11 @@ class KnowledgeBaseService:
             )
             
             # Store document
+            if doc_id in self.documents:
+                self._unindex_document(self.documents[doc_id])
             self.documents[doc_id] = document
-            self._save_metadata()
+            self._index_document(document)
+            self._mark_dirty(doc_id)
             
             # Auto-process if enabled
             if auto_process:
@@ -389,12 +1111,122 @@ class KnowledgeBaseService:
             logger.error(f"Error adding document: {e}")
             return None
     
+    async def add_documents_bulk(self, items: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """
+        Add several documents concurrently
+        
+        Args:
+            items: Keyword arguments for add_document, one dict per document
+            
+        Returns:
+            List[Optional[str]]: Document IDs in input order (None for failures)
+        """
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(self.add_document(**item)) for item in items]
+        return [task.result() for task in tasks]
+    
+    def _find_vector_source(self, document: KnowledgeDocument) -> Optional[str]:
+        """Return an indexed document whose vectors match this document's content"""
+        source_id = self._hash_to_doc_id.get(document.source_hash) if document.source_hash else None
+        source = self.documents.get(source_id) if source_id else None
+        # The side table is only a hint; the source may since have changed
+        if (source is None
+                or source.status != ProcessingStatus.INDEXED
+                or source.source_hash != document.source_hash):
+            return None
+        return source_id
+    
+    def _index_fields(self, document: KnowledgeDocument):
+        """Add a document to the type, tag and file type indexes"""
+        self._idx_type.setdefault(document.document_type.value, set()).add(document.id)
+        for tag in document._tag_set:
+            self._idx_tag.setdefault(tag, set()).add(document.id)
+        if document.file_type:
+            self._idx_file_type.setdefault(document.file_type, set()).add(document.id)
+    
+    def _unindex_fields(self, document: KnowledgeDocument):
+        """Remove a document from the type, tag and file type indexes"""
+        def discard(index: Dict[str, set], value):
+            ids = index.get(value)
+            if ids is not None:
+                ids.discard(document.id)
+                if not ids:
+                    del index[value]
+        
+        discard(self._idx_type, document.document_type.value)
+        for tag in document._tag_set:
+            discard(self._idx_tag, tag)
+        if document.file_type:
+            discard(self._idx_file_type, document.file_type)
+    
+    def _count_stats(self, document: KnowledgeDocument, sign: int):
+        """Add (sign=1) or remove (sign=-1) a document from the statistics aggregates"""
+        self._cnt_status[document.status.value] += sign
+        self._cnt_type[document.document_type.value] += sign
+        if document.file_type:
+            self._cnt_file_type[document.file_type] += sign
+        if document.file_size:
+            self._total_size += sign * document.file_size
+        self._total_chunks += sign * document.chunk_count
+        if document.chunk_count > 1:
+            if sign > 0:
+                self._multi_chunk.add(document.id)
+            else:
+                self._multi_chunk.discard(document.id)
+    
+    def _set_status(self, document: KnowledgeDocument, status: ProcessingStatus, chunk_count: Optional[int] = None):
+        """Change a document's processing status, keeping the aggregates in step"""
+        self._count_stats(document, -1)
+        document.status = status
+        if chunk_count is not None:
+            document.chunk_count = chunk_count
+        self._count_stats(document, 1)
+    
+    def _index_document(self, document: KnowledgeDocument):
+        """Add a document to all list_documents indexes and statistics"""
+        self._count_stats(document, 1)
+        self._index_fields(document)
+        created = document.created_at.timestamp() if document.created_at else float("-inf")
+        # Negated insertion order keeps ties in insertion order when walking newest first
+        key = (created, -next(self._index_seq), document.id)
+        insort(self._by_date, key)
+        self._date_keys[document.id] = key
+    
+    def _unindex_document(self, document: KnowledgeDocument):
+        """Remove a document from all list_documents indexes and statistics"""
+        self._count_stats(document, -1)
+        self._unindex_fields(document)
+        key = self._date_keys.pop(document.id, None)
+        if key is not None:
+            del self._by_date[bisect_left(self._by_date, key)]
+    
+    def _content_path(self, document_id: str) -> Path:
+        """Path of the extracted text of an indexed document"""
+        return self.storage_path / "processed" / f"{document_id}.txt"
+    
+    async def _load_content(self, document: KnowledgeDocument) -> Optional[str]:
+        """Return a document's text, reading it from disk if it was offloaded"""
+        if document.content is not None:
+            return document.content
+        try:
+            async with aiofiles.open(self._content_path(document.id), 'r', encoding='utf-8') as f:
+                return await f.read()
+        except FileNotFoundError:
+            logger.warning(f"Content of document {document.id} not found on disk")
+            return None
+    
+    async def _offload_content(self, document: KnowledgeDocument, content: str):
+        """Write an indexed document's text to disk and drop it from memory"""
+        async with aiofiles.open(self._content_path(document.id), 'w', encoding='utf-8') as f:
+            await f.write(content)
+        document.content = None
+    
     def _generate_document_id(self, title: str, content_ref: str = None) -> str:
         """Generate unique document ID"""
-        base = f"{title}_{content_ref or ''}_{datetime.now(timezone.utc).isoformat()}"
-        return hashlib.md5(base.encode('utf-8')).hexdigest()[:16]
+        base = f"{title}_{content_ref or ''}_{time.time_ns()}"
+        return _source_hash(base.encode('utf-8'))[:16]
     
-    async def _process_file_data(self, file_data: bytes, filename: str, doc_id: str) -> Optional[Tuple[str, str, int, str]]:
+    async def _process_file_data(self, file_data: bytes, filename: str, doc_id: str) -> Optional[Tuple[str, str, int, str, str]]:
         """Process file data and extract content"""
         try:
             # Determine file type
@@ -413,19 +1245,19 @@ class KnowledgeBaseService:
             # Store file
             file_ext = Path(filename).suffix or ".txt"
             stored_path = self.storage_path / "documents" / f"{doc_id}{file_ext}"
-            with open(stored_path, 'wb') as f:
-                f.write(file_data)
+            async with aiofiles.open(stored_path, 'wb') as f:
+                await f.write(file_data)
             
             # Extract content
             content = await self._extract_content_from_file(stored_path, file_type)
             
-            return content, file_type, len(file_data), str(stored_path)
+            return content, file_type, len(file_data), str(stored_path), _source_hash(file_data)
             
         except Exception as e:
             logger.error(f"Error processing file data: {e}")
             return None
     
-    async def _process_file_path(self, file_path: str, doc_id: str) -> Optional[Tuple[str, str, int, str]]:
+    async def _process_file_path(self, file_path: str, doc_id: str) -> Optional[Tuple[str, str, int, str, str]]:
         """Process file from path and extract content"""
         try:
             source_path = Path(file_path)
@@ -451,13 +1283,12 @@ class KnowledgeBaseService:
             file_ext = source_path.suffix or ".txt"
             stored_path = self.storage_path / "documents" / f"{doc_id}{file_ext}"
             
-            with open(source_path, 'rb') as src, open(stored_path, 'wb') as dst:
-                dst.write(src.read())
+            source_hash = await asyncio.to_thread(_copy_and_hash, source_path, stored_path, file_size)
             
             # Extract content
             content = await self._extract_content_from_file(stored_path, file_type)
             
-            return content, file_type, file_size, str(stored_path)
+            return content, file_type, file_size, str(stored_path), source_hash
             
         except Exception as e:
             logger.error(f"Error processing file path: {e}")
@@ -467,16 +1298,13 @@ class KnowledgeBaseService:
         """Extract text content from file based on type"""
         try:
             if file_type == "text/plain" or file_type == "text/markdown":
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    return f.read()
+                async with aiofiles.open(file_path, 'r', encoding='utf-8') as f:
+                    return await f.read()
                     
             elif file_type == "text/html":
-                # Basic HTML text extraction (in production, use BeautifulSoup)
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    html_content = f.read()
-                # Remove HTML tags (basic)
-                text = re.sub(r'<[^>]+>', '', html_content)
-                return text.strip()
+                async with aiofiles.open(file_path, 'r', encoding='utf-8') as f:
+                    html_content = await f.read()
+                return _html_to_text(html_content)
                 
             elif file_type == "application/pdf" and PDF_AVAILABLE:
                 return await self._extract_pdf_content(file_path)
@@ -495,18 +1323,15 @@ class KnowledgeBaseService:
             logger.error(f"Error extracting content from {file_path}: {e}")
             return f"[Error extracting content: {str(e)}]"
     
+    async def _run_extractor(self, extractor: Callable[..., str], file_path: Path, *args) -> str:
+        """Run a synchronous extractor in the extraction process pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_extract_pool(), extractor, str(file_path), *args)
+    
     async def _extract_pdf_content(self, file_path: Path) -> str:
         """Extract text from PDF file"""
         try:
-            content = []
-            with open(file_path, 'rb') as f:
-                pdf_reader = PyPDF2.PdfReader(f)
-                for page in pdf_reader.pages:
-                    text = page.extract_text()
-                    if text.strip():
-                        content.append(text)
-            
-            return '\n\n'.join(content)
+            return await self._run_extractor(_pdf_extract_sync, file_path, bool(self.config.get("ocr_enabled")))
         except Exception as e:
             logger.error(f"Error extracting PDF content: {e}")
             return "[Error extracting PDF content]"
@@ -514,13 +1339,7 @@ class KnowledgeBaseService:
     async def _extract_docx_content(self, file_path: Path) -> str:
         """Extract text from DOCX file"""
         try:
-            doc = DocxDocument(file_path)
-            content = []
-            for paragraph in doc.paragraphs:
-                if paragraph.text.strip():
-                    content.append(paragraph.text)
-            
-            return '\n\n'.join(content)
+            return await self._run_extractor(_docx_extract_sync, file_path)
         except Exception as e:
             logger.error(f"Error extracting DOCX content: {e}")
             return "[Error extracting DOCX content]"
@@ -528,9 +1347,7 @@ class KnowledgeBaseService:
     async def _extract_image_content(self, file_path: Path) -> str:
         """Extract text from image using OCR"""
         try:
-            image = Image.open(file_path)
-            text = pytesseract.image_to_string(image)
-            return text.strip()
+            return await self._run_extractor(_ocr_extract_sync, file_path)
         except Exception as e:
             logger.error(f"Error extracting image content: {e}")
             return "[Error extracting image content]"
@@ -540,46 +1357,19 @@ class KnowledgeBaseService:
         # Simple keyword-based categorization
         text = (title + " " + content).lower()
         
-        if any(word in text for word in ["guide", "how to", "tutorial", "instruction"]):
-            return DocumentType.GUIDANCE
-        elif any(word in text for word in ["reference", "documentation", "spec", "standard"]):
-            return DocumentType.REFERENCE
-        elif any(word in text for word in ["case study", "example", "scenario"]):
-            return DocumentType.CASE_STUDY
-        elif any(word in text for word in ["template", "form", "format"]):
-            return DocumentType.TEMPLATE
-        elif any(word in text for word in ["research", "study", "analysis", "findings"]):
-            return DocumentType.RESEARCH
-        elif any(word in text for word in ["manual", "handbook", "procedures"]):
-            return DocumentType.MANUAL
-        elif any(word in text for word in ["faq", "questions", "q&a"]):
-            return DocumentType.FAQ
-        else:
+        ranks = [_CATEGORY_RANK[word] for word in _CATEGORY_SCANNER.find(text)]
+        if not ranks:
             return DocumentType.OTHER
+        return _CATEGORY_KEYWORDS[min(ranks)][0]
     
     async def _auto_tag(self, content: str, title: str) -> List[str]:
         """Auto-generate tags for document"""
         # Simple keyword extraction (in production, use NLP)
         text = (title + " " + content).lower()
         
-        # Common relationship/therapy keywords
-        therapy_keywords = [
-            "communication", "relationship", "therapy", "counseling", "conflict",
-            "emotional", "intimacy", "trust", "attachment", "boundaries",
-            "empathy", "listening", "validation", "support", "growth"
-        ]
-        
-        tags = [keyword for keyword in therapy_keywords if keyword in text]
-        
-        # Add document type-based tags
-        if "guide" in text or "tutorial" in text:
-            tags.append("guide")
-        if "example" in text or "case" in text:
-            tags.append("example")
-        if "research" in text or "study" in text:
-            tags.append("research")
-        
-        return list(set(tags))  # Remove duplicates
+        # Tags follow keyword declaration order, without duplicates
+        found = _TAG_SCANNER.find(text)
+        return list(dict.fromkeys(tag for word, tag in _TAG_FOR_KEYWORD.items() if word in found))
     
     @handle_kb_errors
     async def process_document(self, document_id: str) -> ProcessingResult:
@@ -592,7 +1382,8 @@ class KnowledgeBaseService:
         Returns:
             ProcessingResult: Processing results
         """
-        start_time = datetime.now(timezone.utc)
+        # Durations come from the monotonic counter; no datetime needed
+        start_time = time.perf_counter()
         errors = []
         
         try:
@@ -607,12 +1398,18 @@ class KnowledgeBaseService:
                     metadata={}
                 )
             
+            # Look for reusable vectors before this document stops counting as indexed
+            vector_source_id = self._find_vector_source(document)
+            
             # Update status
-            document.status = ProcessingStatus.PROCESSING
-            self._save_metadata()
+            self._set_status(document, ProcessingStatus.PROCESSING)
+            self._mark_dirty(document_id)
             
             # Chunk document if necessary
-            chunks = self._chunk_document(document.content)
+            content = await self._load_content(document)
+            if content is None:
+                raise FileNotFoundError(f"No content stored for document {document_id}")
+            chunks = self._chunk_document(content)
             
             # Prepare metadata for indexing
             base_metadata = {
@@ -625,26 +1422,35 @@ class KnowledgeBaseService:
                 **document.metadata
             }
             
-            # Index in vector database
-            success = await self.vector_service.index_document(
-                document_id=document_id,
-                content=document.content,
-                metadata=base_metadata,
-                chunk_content=len(chunks) > 1
-            )
+            # Reuse vectors of identical indexed content, else index the
+            # chunks in one batched call
+            success = False
+            if vector_source_id:
+                success = await self.vector_service.clone_vectors(vector_source_id, document_id, base_metadata)
+                if success:
+                    logger.info(f"Reused vectors of {vector_source_id} for document {document_id}")
+            if not success:
+                success = await self.vector_service.index_chunks(
+                    document_id=document_id,
+                    chunks=chunks,
+                    metadata=base_metadata
+                )
             
             if success:
                 # Update document status
-                document.status = ProcessingStatus.INDEXED
+                self._set_status(document, ProcessingStatus.INDEXED, chunk_count=len(chunks))
                 document.processed_at = datetime.now(timezone.utc)
-                document.chunk_count = len(chunks)
+                if document.source_hash:
+                    self._hash_to_doc_id[document.source_hash] = document_id
+                # The text now lives in the vector store and on disk
+                await self._offload_content(document, content)
             else:
-                document.status = ProcessingStatus.FAILED
+                self._set_status(document, ProcessingStatus.FAILED)
                 errors.append("Failed to index in vector database")
             
-            self._save_metadata()
+            self._mark_dirty(document_id)
             
-            processing_time = (datetime.now(timezone.utc) - start_time).total_seconds()
+            processing_time = time.perf_counter() - start_time
             
             result = ProcessingResult(
                 document_id=document_id,
@@ -663,10 +1469,10 @@ class KnowledgeBaseService:
             
             # Update status on error
             if document_id in self.documents:
-                self.documents[document_id].status = ProcessingStatus.FAILED
-                self._save_metadata()
+                self._set_status(self.documents[document_id], ProcessingStatus.FAILED)
+                self._mark_dirty(document_id)
             
-            processing_time = (datetime.now(timezone.utc) - start_time).total_seconds()
+            processing_time = time.perf_counter() - start_time
             return ProcessingResult(
                 document_id=document_id,
                 success=False,
@@ -677,9 +1483,10 @@ class KnowledgeBaseService:
             )
     
     def _chunk_document(self, content: str) -> List[DocumentChunk]:
-        """Chunk document content"""
+        """Chunk document content into overlapping chunks of at most chunk_size"""
         # Use vector service chunking configuration
         chunk_size = self.vector_service.config.get("chunk_size", 1000)
+        chunk_overlap = min(self.vector_service.config.get("chunk_overlap", 200), chunk_size // 2)
         
         if len(content) <= chunk_size:
             return [DocumentChunk(
@@ -693,43 +1500,28 @@ class KnowledgeBaseService:
             )]
         
         chunks = []
-        # Simple sentence-boundary chunking
-        sentences = re.split(r'[.!?]+', content)
-        current_chunk = ""
-        chunk_index = 0
-        start_char = 0
         
-        for sentence in sentences:
-            if len(current_chunk) + len(sentence) > chunk_size and current_chunk:
-                # Save current chunk
-                end_char = start_char + len(current_chunk)
+        def add_chunk(start_char: int, end_char: int):
+            text = content[start_char:end_char].strip()
+            if text:
                 chunks.append(DocumentChunk(
-                    chunk_id=str(chunk_index),
-                    content=current_chunk.strip(),
-                    chunk_index=chunk_index,
+                    chunk_id=str(len(chunks)),
+                    content=text,
+                    chunk_index=len(chunks),
                     total_chunks=0,  # Will be updated later
                     start_char=start_char,
                     end_char=end_char,
                     metadata={}
                 ))
-                
-                start_char = end_char
-                current_chunk = sentence
-                chunk_index += 1
-            else:
-                current_chunk += sentence
         
-        # Add final chunk
-        if current_chunk.strip():
-            chunks.append(DocumentChunk(
-                chunk_id=str(chunk_index),
-                content=current_chunk.strip(),
-                chunk_index=chunk_index,
-                total_chunks=0,
-                start_char=start_char,
-                end_char=start_char + len(current_chunk),
-                metadata={}
-            ))
+        # Simple sentence-boundary chunking, compiled with Numba when
+        # available, leaving room in each chunk for the overlap
+        if NUMBA_AVAILABLE:
+            bounds = _chunk_bounds_jit(_code_points(content), chunk_size - chunk_overlap).tolist()
+        else:
+            bounds = _chunk_bounds(content, chunk_size - chunk_overlap)
+        for start_char, end_char in _window_bounds(content, bounds, chunk_size, chunk_overlap):
+            add_chunk(start_char, end_char)
         
         # Update total_chunks for all chunks
         for chunk in chunks:
@@ -766,12 +1558,20 @@ class KnowledgeBaseService:
                     # For now, simple tag matching (in production, use proper array matching)
                     vector_filters["tags"] = {"$in": filters.tags}
             
+            # Serve near-duplicate queries with the same parameters from cache
+            query_embedding = await self.vector_service.generate_embedding(query)
+            namespace = (repr(sorted(vector_filters.items())), limit, min_similarity)
+            cached = self._query_cache.get(namespace, query_embedding)
+            if cached is not None:
+                return list(cached)
+            
             # Search vector database
             results = await self.vector_service.search(
                 query=query,
                 limit=limit,
                 min_similarity=min_similarity,
-                filters=vector_filters
+                filters=vector_filters,
+                query_embedding=query_embedding
             )
             
             # Enhance results with document metadata
@@ -788,15 +1588,137 @@ class KnowledgeBaseService:
                 
                 enhanced_results.append(result)
             
-            return enhanced_results
+            self._query_cache.put(namespace, query_embedding, enhanced_results)
+            return list(enhanced_results)
             
         except Exception as e:
             logger.error(f"Error searching knowledge base: {e}")
             return []
     
     async def get_document(self, document_id: str) -> Optional[KnowledgeDocument]:
-        """Get document by ID"""
-        return self.documents.get(document_id)
+        """Get document by ID, with its content loaded"""
+        document = self.documents.get(document_id)
+        if document is None or document.content is not None:
+            return document
+        return dataclass_replace(document, content=await self._load_content(document))
+    
+    def _resolve_filters(self, filters: Optional[SearchFilters]) -> Tuple[Optional[set], Optional[set], int, int]:
+        """
+        Resolve filters with the secondary indexes
+        
+        Returns:
+            Tuple: (IDs to keep or None for all, IDs to drop or None, and the
+            [lo, hi) range of the created-at index to walk)
+        """
+        candidates: Optional[set] = None
+        exclude: Optional[set] = None
+        lo, hi = 0, len(self._by_date)
+        
+        if filters:
+            for values, index in ((filters.document_types, self._idx_type),
+                                  (filters.file_types, self._idx_file_type)):
+                if values:
+                    matching = set().union(*(index.get(value, ()) for value in values))
+                    candidates = matching if candidates is None else candidates & matching
+            
+            if filters.tags:
+                postings = [self._idx_tag.get(tag, ()) for tag in filters.tags]
+                if candidates is not None and len(candidates) < sum(map(len, postings)):
+                    # Fewer candidates than tag postings: test each candidate's tag set
+                    filter_tags = frozenset(filters.tags)
+                    candidates = {doc_id for doc_id in candidates
+                                  if not filter_tags.isdisjoint(self.documents[doc_id]._tag_set)}
+                else:
+                    matching = set().union(*postings)
+                    candidates = matching if candidates is None else candidates & matching
+            
+            if filters.date_from or filters.date_to:
+                # Documents without a creation date never match a date range
+                lo = bisect_right(self._by_date, (float("-inf"), float("inf")))
+            
+            if filters.date_from:
+                lo = bisect_left(self._by_date, (filters.date_from.timestamp(),))
+            
+            if filters.date_to:
+                hi = bisect_right(self._by_date, (filters.date_to.timestamp(), float("inf")))
+            
+            if filters.has_chunks:
+                candidates = self._multi_chunk if candidates is None else candidates & self._multi_chunk
+            elif filters.has_chunks is not None:
+                if candidates is None:
+                    exclude = self._multi_chunk
+                else:
+                    candidates = candidates - self._multi_chunk
+        
+        return candidates, exclude, lo, hi
+    
+    def _iter_filtered(self, filters: Optional[SearchFilters] = None,
+                       max_results: Optional[int] = None) -> Iterator[KnowledgeDocument]:
+        """Yield the documents matching the filters, newest first (at least max_results of them, if given)"""
+        candidates, exclude, lo, hi = self._resolve_filters(filters)
+        
+        if (candidates is not None and max_results is not None
+                and len(candidates) * _HEAP_SELECT_RATIO < hi - lo):
+            # Few candidates spread over a wide date range: select the newest
+            # with a bounded heap instead of walking the whole range
+            if max_results <= 0 or lo >= hi:
+                return iter(())
+            first, last = self._by_date[lo], self._by_date[hi - 1]
+            keys = (key for key in map(self._date_keys.__getitem__, candidates) if first <= key <= last)
+            return map(self.documents.__getitem__, map(itemgetter(2), heapq.nlargest(max_results, keys)))
+        
+        # One pass over the date range with the ID filter chained as C-level
+        # iterators, so no Python code runs per document
+        total = len(self._by_date)
+        doc_ids = map(itemgetter(2), islice(reversed(self._by_date), total - hi, total - lo))
+        if candidates is not None:
+            doc_ids = filter(candidates.__contains__, doc_ids)
+        elif exclude is not None:
+            doc_ids = filterfalse(exclude.__contains__, doc_ids)
+        return map(self.documents.__getitem__, doc_ids)
+    
+    def _count_filtered(self, filters: Optional[SearchFilters] = None) -> int:
+        """Number of documents matching the filters, counted from the index sets"""
+        candidates, exclude, lo, hi = self._resolve_filters(filters)
+        if lo >= hi:
+            return 0
+        
+        def in_range(doc_ids: set) -> int:
+            if lo == 0 and hi == len(self._by_date):
+                return len(doc_ids)
+            if len(doc_ids) < hi - lo:
+                first, last = self._by_date[lo], self._by_date[hi - 1]
+                return sum(1 for key in map(self._date_keys.__getitem__, doc_ids) if first <= key <= last)
+            return sum(map(doc_ids.__contains__, map(itemgetter(2), islice(self._by_date, lo, hi))))
+        
+        if candidates is not None:
+            return in_range(candidates)
+        if exclude is not None:
+            return hi - lo - in_range(exclude)
+        return hi - lo
+    
+    async def list_documents_with_total(self,
+                                        filters: SearchFilters = None,
+                                        limit: int = 100,
+                                        offset: int = 0) -> Tuple[int, List[KnowledgeDocument]]:
+        """
+        List a page of documents together with the number of all matching documents
+        
+        Args:
+            filters: Optional filters
+            limit: Page size
+            offset: Matching documents to skip
+            
+        Returns:
+            Tuple[int, List[KnowledgeDocument]]: (total matches, page)
+        """
+        try:
+            # The total comes from set sizes, so the page walk can still stop early
+            total = self._count_filtered(filters)
+        except Exception as e:
+            logger.error(f"Error counting documents: {e}")
+            return 0, []
+        return total, await self.list_documents(filters, limit, offset)
     
     async def list_documents(self, 
                            filters: SearchFilters = None,
@@ -804,36 +1726,11 @@ class KnowledgeBaseService:
                            offset: int = 0) -> List[KnowledgeDocument]:
         """List documents with optional filters"""
         try:
-            documents = list(self.documents.values())
-            
-            # Apply filters
-            if filters:
-                if filters.document_types:
-                    documents = [d for d in documents if d.document_type.value in filters.document_types]
-                
-                if filters.tags:
-                    documents = [d for d in documents if any(tag in d.tags for tag in filters.tags)]
-                
-                if filters.date_from:
-                    documents = [d for d in documents if d.created_at and d.created_at >= filters.date_from]
-                
-                if filters.date_to:
-                    documents = [d for d in documents if d.created_at and d.created_at <= filters.date_to]
-                
-                if filters.file_types:
-                    documents = [d for d in documents if d.file_type in filters.file_types]
-                
-                if filters.has_chunks is not None:
-                    if filters.has_chunks:
-                        documents = [d for d in documents if d.chunk_count > 1]
-                    else:
-                        documents = [d for d in documents if d.chunk_count <= 1]
-            
-            # Sort by created_at (newest first)
-            documents.sort(key=lambda x: x.created_at or datetime.min, reverse=True)
-            
-            # Apply pagination
-            return documents[offset:offset + limit]
+            if limit <= 0:
+                return []
+            # The iterator is lazy: stop once the page is full
+            offset = max(offset, 0)
+            return list(islice(self._iter_filtered(filters, offset + limit), offset, offset + limit))
             
         except Exception as e:
             logger.error(f"Error listing documents: {e}")
@@ -860,18 +1757,25 @@ class KnowledgeBaseService:
                 document.title = title
             
             if content is not None:
-                if content != document.content:
+                if content != await self._load_content(document):
                     document.content = content
+                    document.source_hash = _source_hash(content.encode('utf-8'))
                     content_changed = True
             
+            self._count_stats(document, -1)
+            self._unindex_fields(document)
             if document_type is not None:
-                document.document_type = document_type
+                document.document_type = DocumentType(document_type)
             
             if tags is not None:
                 document.tags = tags
+                document.refresh_tag_set()
+            self._index_fields(document)
+            self._count_stats(document, 1)
             
             if metadata is not None:
                 document.metadata.update(metadata)
+            document._search_projection = None
             
             document.updated_at = datetime.now(timezone.utc)
             
@@ -879,7 +1783,7 @@ class KnowledgeBaseService:
             if content_changed:
                 await self.process_document(document_id)
             
-            self._save_metadata()
+            self._mark_dirty(document_id)
             return True
             
         except Exception as e:
@@ -899,10 +1803,12 @@ class KnowledgeBaseService:
             # Delete stored file if exists
             if document.file_path and Path(document.file_path).exists():
                 Path(document.file_path).unlink()
+            self._content_path(document_id).unlink(missing_ok=True)
             
             # Remove from metadata
+            self._unindex_document(document)
             del self.documents[document_id]
-            self._save_metadata()
+            self._mark_dirty(document_id)
             
             logger.info(f"Deleted document: {document_id}")
             return True
@@ -913,101 +1819,118 @@ class KnowledgeBaseService:
     
     async def get_statistics(self) -> Dict[str, Any]:
         """Get knowledge base statistics"""
-        try:
-            docs = list(self.documents.values())
-            
-            # Basic counts
-            total_docs = len(docs)
-            by_status = {}
-            by_type = {}
-            by_file_type = {}
-            
-            total_size = 0
-            total_chunks = 0
+        total_docs = len(self.documents)
+        by_status = {status: n for status, n in self._cnt_status.items() if n}
+        
+        return {
+            "total_documents": total_docs,
+            "total_size_bytes": self._total_size,
+            "total_chunks": self._total_chunks,
+            "vector_count": await self._get_vector_count(),
+            "distribution": {
+                "by_status": by_status,
+                "by_type": {doc_type: n for doc_type, n in self._cnt_type.items() if n},
+                "by_file_type": {file_type: n for file_type, n in self._cnt_file_type.items() if n}
+            },
+            "avg_chunks_per_doc": self._total_chunks / max(total_docs, 1),
+            "indexed_percentage": (by_status.get("indexed", 0) / max(total_docs, 1)) * 100
+        }
+    
+    async def _get_vector_count(self) -> int:
+        """Vector database item count, cached briefly"""
+        now = time.monotonic()
+        if self._vector_count is None or self._vector_count[0] <= now:
+            try:
+                vector_count = await self.vector_service.get_document_count()
+            except Exception as e:
+                # Report the last known count; retry on the next call
+                logger.error(f"Error getting vector count: {e}")
+                return self._vector_count[1] if self._vector_count else 0
+            self._vector_count = (now + _VECTOR_COUNT_TTL, vector_count)
+        return self._vector_count[1]
+    
+    async def health_check(self) -> Dict[str, Any]:
+        """Check service health"""
+        async with self._health_lock:
+            # Orchestrators ping often; reuse a recent healthy result
+            if self._last_health is not None and self._last_health[0] > time.monotonic():
+                return {**self._last_health[1], "document_count": len(self.documents)}
+            
+            status = {
+                "service": "knowledge_base",
+                "status": "healthy",
+                "storage_path": str(self.storage_path),
+                "document_count": len(self.documents),
+                "vector_service": {},
+                "errors": []
+            }
             
-            for doc in docs:
-                # Status distribution (handle both enum and string)
-                status = doc.status.value if hasattr(doc.status, 'value') else str(doc.status)
-                by_status[status] = by_status.get(status, 0) + 1
-                
-                # Type distribution (handle both enum and string)
-                doc_type = doc.document_type.value if hasattr(doc.document_type, 'value') else str(doc.document_type)
-                by_type[doc_type] = by_type.get(doc_type, 0) + 1
+            try:
+                # Check storage path
+                if not self.storage_path.exists():
+                    status["errors"].append("Storage path does not exist")
                 
-                # File type distribution
-                if doc.file_type:
-                    by_file_type[doc.file_type] = by_file_type.get(doc.file_type, 0) + 1
+                # Check vector service
+                status["vector_service"] = await self.vector_service.health_check()
+                if status["vector_service"]["status"] != "healthy":
+                    status["errors"].append("Vector service unhealthy")
                 
-                # Size and chunks
-                if doc.file_size:
-                    total_size += doc.file_size
+                # Check if we can process documents (embeds, upserts and deletes
+                # vectors, so only once in a while and while otherwise healthy)
+                if not status["errors"] and time.monotonic() - self._last_probe >= _HEALTH_PROBE_INTERVAL:
+                    test_doc_id = await self.add_document(
+                        title="Health Check Test",
+                        content="This is a test document for health checking.",
+                        auto_process=True
+                    )
+                    
+                    if test_doc_id:
+                        # Clean up test document
+                        await self.delete_document(test_doc_id)
+                        self._last_probe = time.monotonic()
+                    else:
+                        status["errors"].append("Failed to add test document")
                 
-                total_chunks += doc.chunk_count
-            
-            # Vector database stats
-            vector_count = await self.vector_service.get_document_count()
-            
-            return {
-                "total_documents": total_docs,
-                "total_size_bytes": total_size,
-                "total_chunks": total_chunks,
-                "vector_count": vector_count,
-                "distribution": {
-                    "by_status": by_status,
-                    "by_type": by_type,
-                    "by_file_type": by_file_type
-                },
-                "avg_chunks_per_doc": total_chunks / max(total_docs, 1),
-                "indexed_percentage": (by_status.get("indexed", 0) / max(total_docs, 1)) * 100
-            }
-            
-        except Exception as e:
-            logger.error(f"Error getting statistics: {e}")
-            return {}
-    
-    async def health_check(self) -> Dict[str, Any]:
-        """Check service health"""
-        status = {
-            "service": "knowledge_base",
-            "status": "healthy",
-            "storage_path": str(self.storage_path),
-            "document_count": len(self.documents),
-            "vector_service": {},
-            "errors": []
-        }
-        
-        try:
-            # Check storage path
-            if not self.storage_path.exists():
-                status["errors"].append("Storage path does not exist")
-            
-            # Check vector service
-            status["vector_service"] = await self.vector_service.health_check()
-            if status["vector_service"]["status"] != "healthy":
-                status["errors"].append("Vector service unhealthy")
-            
-            # Check if we can process documents
-            test_doc_id = await self.add_document(
-                title="Health Check Test",
-                content="This is a test document for health checking.",
-                auto_process=True
-            )
+            except Exception as e:
+                status["status"] = "unhealthy"
+                status["errors"].append(str(e))
             
-            if test_doc_id:
-                # Clean up test document
-                await self.delete_document(test_doc_id)
+            if status["errors"]:
+                status["status"] = "unhealthy"
+                self._last_health = None
             else:
-                status["errors"].append("Failed to add test document")
+                self._last_health = (time.monotonic() + _HEALTH_CHECK_TTL, dict(status))
             
-        except Exception as e:
-            status["status"] = "unhealthy"
-            status["errors"].append(str(e))
-        
-        if status["errors"]:
-            status["status"] = "unhealthy"
-        
-        return status
+            return status
 
+    async def get_documents_bulk(self, document_ids) -> Dict[str, KnowledgeDocument]:
+        """
+        Look up several documents at once, without loading their content
+        
+        Args:
+            document_ids: Document IDs to fetch
+            
+        Returns:
+            Dict[str, KnowledgeDocument]: Found documents by ID (missing IDs are omitted)
+        """
+        documents = self.documents
+        return {doc_id: documents[doc_id] for doc_id in document_ids if doc_id in documents}
+    
+    @staticmethod
+    def _result_projection(document: KnowledgeDocument) -> Dict[str, Any]:
+        """Document fields merged into the metadata of its search results"""
+        if document._search_projection is None:
+            document._search_projection = {
+                "title": document.title,
+                "filename": Path(document.file_path).name if document.file_path else None,
+                "content_type": document.file_type,
+                "document_type": document.document_type.value,
+                "category": (document.metadata or {}).get("category"),
+                "tags": document.tags or [],
+                "created_at": document.created_at.isoformat() if document.created_at else None,
+            }
+        return document._search_projection
+    
     async def enrich_search_results(self, results: List[SearchResult]) -> List[SearchResult]:
         """
         Enrich search results with document metadata
@@ -1018,94 +1941,24 @@ class KnowledgeBaseService:
         Returns:
             List[SearchResult]: Enriched search results
         """
-        enriched_results = []
+        # Chunk results carry their parent document's ID in metadata
+        parent_ids = [result.metadata.get("document_id", result.document_id) for result in results]
+        documents = await self.get_documents_bulk(set(parent_ids))
+        projections = {doc_id: self._result_projection(document) for doc_id, document in documents.items()}
         
-        for result in results:
-            try:
-                # Get document metadata
-                document = await self.get_document(result.document_id)
-                
-                if document:
-                    # Enhance the metadata with document information
-                    enriched_metadata = {
-                        **result.metadata,
-                        "title": document.get("title"),
-                        "filename": document.get("filename"),
-                        "content_type": document.get("content_type"),
-                        "document_type": document.get("document_type"),
-                        "category": document.get("category"),
-                        "tags": document.get("tags", []),
-                        "created_at": document.get("created_at"),
-                    }
-                    
-                    # Create enriched result
-                    enriched_result = SearchResult(
-                        document_id=result.document_id,
-                        content=result.content,
-                        metadata=enriched_metadata,
-                        similarity_score=result.similarity_score,
-                        chunk_index=result.chunk_index,
-                        total_chunks=result.total_chunks
-                    )
-                    
-                    enriched_results.append(enriched_result)
-                else:
-                    # If document not found, keep original result
-                    enriched_results.append(result)
-                    
-            except Exception as e:
-                logger.error(f"Error enriching search result for document {result.document_id}: {str(e)}")
-                # Keep original result in case of error
-                enriched_results.append(result)
-        
-        return enriched_results
+        # Results whose document is not found are kept as they are
+        return [
+            SearchResult(
+                document_id=result.document_id,
+                content=result.content,
+                metadata={**result.metadata, **projections[doc_id]},
+                similarity_score=result.similarity_score,
+                chunk_index=result.chunk_index,
+                total_chunks=result.total_chunks
+            ) if doc_id in projections else result
+            for result, doc_id in zip(results, parent_ids)
+        ]
 
-def handle_kb_errors(func):
-    """
-    Decorator for handling knowledge base service errors
-    
-    Args:
-        func: The async function to wrap
-        
-    Returns:
-        Wrapped function with error handling
-    """
-    @functools.wraps(func)
-    async def wrapper(*args, **kwargs):
-        try:
-            return await func(*args, **kwargs)
-        except Exception as e:
-            # Get the function name for better error context
-            func_name = func.__name__
-            
-            # Log the error with detailed context
-            logger.error(f"Knowledge base error in {func_name}: {str(e)}", 
-                         extra={
-                             "args": args[1:],  # Skip self
-                             "kwargs": kwargs,
-                             "error_type": type(e).__name__
-                         },
-                         exc_info=True)
-            
-            # Return a proper error response instead of raising
-            if func_name.startswith("search"):
-                return []
-            elif func_name.startswith("get_"):
-                return None
-            elif func_name.startswith("index_") or func_name.startswith("process_"):
-                return {
-                    "success": False,
-                    "error": str(e),
-                    "error_type": type(e).__name__
-                }
-            else:
-                # For update/delete operations
-                return {
-                    "success": False,
-                    "error": str(e)
-                }
-    
-    return wrapper
 
 # Convenience function
 def create_knowledge_base_service(**kwargs) -> KnowledgeBaseService:
@@ -1,7 +1,7 @@
 """Knowledge Base Service for Catalyst"""
 
 import logging
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Set, Tuple
 from dataclasses import dataclass
 from datetime import datetime, timezone
 import uuid
@@ -11,6 +11,10 @@ import asyncio
 
 logger = logging.getLogger(__name__)
 
+def _trigrams(text: str) -> Set[str]:
+    """Distinct character trigrams of a string"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
 class KnowledgeEntry(BaseModel):
     """Knowledge base entry data structure."""
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -31,25 +35,27 @@ class KnowledgeBaseService:
     def __init__(self) -> None:
         """Initialize the knowledge base service."""
         self.entries: Dict[str, KnowledgeEntry] = {}
-        self.categories: Dict[str, List[str]] = {}
-        self.tags: Dict[str, List[str]] = {}
+        self.categories: Dict[str, Set[str]] = {}
+        self.tags: Dict[str, Set[str]] = {}
+        self._active: Set[str] = set()
+        
+        # Substring search index: lowercased (title, content) per entry and
+        # character trigram -> IDs of entries containing it
+        self._search_text: Dict[str, Tuple[str, str]] = {}
+        self._trigram_idx: Dict[str, Set[str]] = {}
+        self._entry_order: Dict[str, int] = {}
         logger.info("Knowledge Base Service initialized")
     
     async def add_entry(self, entry: KnowledgeEntry) -> str:
         """Add a new knowledge entry."""
         try:
+            previous = self.entries.get(entry.id)
+            if previous is not None:
+                self._unindex_entry(previous)
             self.entries[entry.id] = entry
-            
-            # Update categories index
-            if entry.category not in self.categories:
-                self.categories[entry.category] = []
-            self.categories[entry.category].append(entry.id)
-            
-            # Update tags index
-            for tag in entry.tags:
-                if tag not in self.tags:
-                    self.tags[tag] = []
-                self.tags[tag].append(entry.id)
+            self._entry_order.setdefault(entry.id, len(self._entry_order))
+            self._index_text(entry)
+            self._index_entry(entry)
             
             logger.info(f"Added knowledge entry: {entry.id}")
             return entry.id
@@ -58,6 +64,45 @@ class KnowledgeBaseService:
             logger.error(f"Error adding knowledge entry: {e}")
             raise
     
+    def _index_entry(self, entry: KnowledgeEntry) -> None:
+        """Add an entry to the category, tag and active indexes"""
+        self.categories.setdefault(entry.category, set()).add(entry.id)
+        for tag in entry.tags:
+            self.tags.setdefault(tag, set()).add(entry.id)
+        if entry.is_active:
+            self._active.add(entry.id)
+    
+    def _unindex_entry(self, entry: KnowledgeEntry) -> None:
+        """Remove an entry from the category, tag and active indexes"""
+        for index, values in ((self.categories, (entry.category,)), (self.tags, entry.tags)):
+            for value in values:
+                ids = index.get(value)
+                if ids is not None:
+                    ids.discard(entry.id)
+                    if not ids:
+                        del index[value]
+        self._active.discard(entry.id)
+    
+    def _index_text(self, entry: KnowledgeEntry) -> None:
+        """(Re)index an entry's title and content for substring search"""
+        self._unindex_text(entry.id)
+        title_lower, content_lower = entry.title.lower(), entry.content.lower()
+        self._search_text[entry.id] = (title_lower, content_lower)
+        for gram in _trigrams(title_lower) | _trigrams(content_lower):
+            self._trigram_idx.setdefault(gram, set()).add(entry.id)
+    
+    def _unindex_text(self, entry_id: str) -> None:
+        """Remove an entry from the substring search index"""
+        text = self._search_text.pop(entry_id, None)
+        if text is None:
+            return
+        for gram in _trigrams(text[0]) | _trigrams(text[1]):
+            ids = self._trigram_idx.get(gram)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del self._trigram_idx[gram]
+    
     async def get_entry(self, entry_id: str) -> Optional[KnowledgeEntry]:
         """Get a knowledge entry by ID."""
         return self.entries.get(entry_id)
@@ -70,28 +115,30 @@ class KnowledgeBaseService:
     ) -> List[KnowledgeEntry]:
         """Search knowledge entries."""
         try:
-            # Simple text search in title and content
+            # Substring search in title and content
             results = []
             query_lower = query.lower()
             
-            for entry in self.entries.values():
-                if not entry.is_active:
-                    continue
-                    
-                # Check category filter
-                if category and entry.category != category:
-                    continue
-                    
-                # Check tags filter
-                if tags and not any(tag in entry.tags for tag in tags):
-                    continue
-                    
+            # Narrow to active entries passing the filters, as ID sets
+            id_sets = [self._active]
+            if category:
+                id_sets.append(self.categories.get(category, set()))
+            if tags:
+                id_sets.append(set().union(*(self.tags.get(tag, ()) for tag in tags)))
+            if len(query_lower) >= 3:
+                # Only entries containing every trigram of the query can match
+                postings = [self._trigram_idx.get(gram) for gram in _trigrams(query_lower)]
+                if not all(postings):
+                    return results
+                id_sets.extend(postings)
+            id_sets.sort(key=len)
+            entry_ids = id_sets[0].intersection(*id_sets[1:])
+            
+            for entry_id in sorted(entry_ids, key=self._entry_order.__getitem__):
                 # Check if query matches title or content
-                if (
-                    query_lower in entry.title.lower() or 
-                    query_lower in entry.content.lower()
-                ):
-                    results.append(entry)
+                title_lower, content_lower = self._search_text[entry_id]
+                if query_lower in title_lower or query_lower in content_lower:
+                    results.append(self.entries[entry_id])
                     
             return results
             
@@ -121,9 +168,14 @@ class KnowledgeBaseService:
                 return False
             
             # Update the entry with provided updates
+            self._unindex_entry(entry)
             for key, value in updates.items():
                 if hasattr(entry, key):
                     setattr(entry, key, value)
+            self._index_entry(entry)
+            
+            if "title" in updates or "content" in updates:
+                self._index_text(entry)
             
             entry.updated_at = datetime.now(timezone.utc)
             
@@ -140,6 +192,7 @@ class KnowledgeBaseService:
             entry = self.entries.get(entry_id)
             if entry:
                 entry.is_active = False
+                self._active.discard(entry_id)
                 entry.updated_at = datetime.now(timezone.utc)
                 logger.info(f"Deleted knowledge entry: {entry_id}")
                 return True
@@ -153,15 +206,16 @@ class KnowledgeBaseService:
         self, category: str
     ) -> List[KnowledgeEntry]:
         """Get all entries in a specific category."""
-        entry_ids = self.categories.get(category, [])
-        return [self.entries[entry_id] for entry_id in entry_ids 
-                if entry_id in self.entries and self.entries[entry_id].is_active]
+        return self._active_entries(self.categories.get(category, set()))
     
     async def get_entries_by_tag(self, tag: str) -> List[KnowledgeEntry]:
         """Get all entries with a specific tag."""
-        entry_ids = self.tags.get(tag, [])
-        return [self.entries[entry_id] for entry_id in entry_ids 
-                if entry_id in self.entries and self.entries[entry_id].is_active]
+        return self._active_entries(self.tags.get(tag, set()))
+    
+    def _active_entries(self, entry_ids: Set[str]) -> List[KnowledgeEntry]:
+        """Active entries among the given IDs, in insertion order"""
+        active_ids = entry_ids & self._active
+        return [self.entries[entry_id] for entry_id in sorted(active_ids, key=self._entry_order.__getitem__)]
 
 
 # Global instance
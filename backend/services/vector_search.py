@@ -54,6 +54,10 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Stored metadata describing the item's own text rather than its document;
+# clone_vectors carries these over from the source items
+_CHUNK_METADATA_KEYS = ("chunk_index", "total_chunks", "is_chunk", "content_length")
+
 class VectorProvider(str, Enum):
     """Supported vector database providers"""
     CHROMADB = "chromadb"
@@ -283,6 +287,45 @@ class VectorSearchService:
             logger.error(f"Error generating embedding: {e}")
             return self._generate_simple_embedding(text)
     
+    async def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings for several texts in one batched call
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            List[List[float]]: One vector embedding per text, in order
+        """
+        dimension = self.config.get("embedding_dimension", 384)
+        embeddings = [None if text.strip() else [0.0] * dimension for text in texts]
+        pending = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if not pending:
+            return embeddings
+        
+        batch = [texts[i] for i in pending]
+        try:
+            if self.embedding_provider == EmbeddingProvider.SENTENCE_TRANSFORMERS and self.embedder:
+                vectors = self.embedder.encode(batch, batch_size=len(batch), convert_to_numpy=True).tolist()
+                
+            elif self.embedding_provider == EmbeddingProvider.OPENAI:
+                response = await openai.Embedding.acreate(
+                    input=batch,
+                    model="text-embedding-ada-002"
+                )
+                vectors = [item['embedding'] for item in sorted(response['data'], key=lambda item: item['index'])]
+                
+            else:
+                vectors = [self._generate_simple_embedding(text) for text in batch]
+                
+        except Exception as e:
+            logger.error(f"Error generating batch embeddings: {e}")
+            vectors = [self._generate_simple_embedding(text) for text in batch]
+        
+        for i, vector in zip(pending, vectors):
+            embeddings[i] = vector
+        return embeddings
+    
     async def _generate_openai_embedding(self, text: str) -> List[float]:
         """Generate OpenAI embedding"""
         try:
@@ -369,31 +412,166 @@ class VectorSearchService:
             logger.error(f"Error indexing document {document_id}: {e}")
             return False
     
+    async def index_chunks(self,
+                           document_id: str,
+                           chunks: List[Any],
+                           metadata: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Index a document that the caller has already chunked
+        
+        All chunks are embedded in one batched call and written in one
+        bulk upsert. Chunk IDs and metadata match index_document.
+        
+        Args:
+            document_id: Unique document identifier
+            chunks: Chunks with content, chunk_index and total_chunks attributes
+            metadata: Metadata shared by every chunk
+            
+        Returns:
+            bool: True if indexing successful
+        """
+        try:
+            if not any(chunk.content.strip() for chunk in chunks):
+                logger.warning(f"Empty content for document {document_id}")
+                return False
+            
+            metadata = dict(metadata or {})
+            metadata.update({
+                "document_id": document_id,
+                "indexed_at": datetime.now(timezone.utc).isoformat(),
+                "content_length": chunks[-1].end_char
+            })
+            
+            if len(chunks) == 1:
+                item_ids = [document_id]
+                metadatas = [metadata]
+            else:
+                item_ids = [f"{document_id}_chunk_{chunk.chunk_index}" for chunk in chunks]
+                metadatas = [
+                    {
+                        **metadata,
+                        "chunk_index": chunk.chunk_index,
+                        "total_chunks": chunk.total_chunks,
+                        "is_chunk": True
+                    }
+                    for chunk in chunks
+                ]
+            
+            contents = [chunk.content for chunk in chunks]
+            embeddings = await self.generate_embeddings(contents)
+            self._upsert_items(item_ids, contents, metadatas, embeddings)
+            
+            logger.info(f"Successfully indexed document: {document_id} ({len(chunks)} chunks)")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error indexing document {document_id}: {e}")
+            return False
+    
+    async def clone_vectors(self,
+                            source_document_id: str,
+                            target_document_id: str,
+                            metadata: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Copy the stored vectors of one document to another without re-embedding
+        
+        Cloning a document onto itself refreshes its metadata in place.
+        
+        Args:
+            source_document_id: Document whose vectors are copied
+            target_document_id: Document that receives them
+            metadata: Document metadata for the target; only chunk-level
+                keys are taken from the source items
+            
+        Returns:
+            bool: True if vectors were copied; False if the caller should re-embed
+        """
+        try:
+            items = self._get_document_items(source_document_id)
+            if not items:
+                return False
+            
+            if target_document_id != source_document_id:
+                await self.delete_document(target_document_id)
+            
+            overrides = {
+                **(metadata or {}),
+                "document_id": target_document_id,
+                "indexed_at": datetime.now(timezone.utc).isoformat()
+            }
+            chunk_prefix = f"{source_document_id}_chunk_"
+            item_ids, contents, metadatas, embeddings = [], [], [], []
+            for item_id, content, item_metadata, embedding in items:
+                if item_id.startswith(chunk_prefix):
+                    item_id = f"{target_document_id}_chunk_{item_id[len(chunk_prefix):]}"
+                else:
+                    item_id = target_document_id
+                item_ids.append(item_id)
+                contents.append(content)
+                chunk_metadata = {key: item_metadata[key] for key in _CHUNK_METADATA_KEYS if key in item_metadata}
+                metadatas.append({**overrides, **chunk_metadata})
+                embeddings.append(embedding)
+            
+            self._upsert_items(item_ids, contents, metadatas, embeddings)
+            logger.info(f"Cloned {len(item_ids)} vectors from {source_document_id} to {target_document_id}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error cloning vectors from {source_document_id}: {e}")
+            return False
+    
+    def _get_document_items(self, document_id: str) -> List[Tuple[str, str, Dict[str, Any], List[float]]]:
+        """Return (item_id, content, metadata, embedding) for each stored item of a document"""
+        if self.vector_provider == VectorProvider.CHROMADB and self.collection:
+            results = self.collection.get(
+                where={"document_id": document_id},
+                include=["documents", "metadatas", "embeddings"]
+            )
+            return list(zip(results['ids'], results['documents'], results['metadatas'], results['embeddings']))
+            
+        elif self.vector_provider == VectorProvider.PINECONE and self.vector_db:
+            # Pinecone cannot list vectors by metadata filter; re-embed instead
+            return []
+            
+        else:  # Memory storage
+            return [
+                (item_id, item["content"], item["metadata"], item["embedding"])
+                for item_id, item in self.memory_store.items()
+                if item["metadata"].get("document_id") == document_id
+            ]
+    
     async def _index_single_item(self, item_id: str, content: str, metadata: Dict[str, Any]):
         """Index a single item (document or chunk)"""
         # Generate embedding
         embedding = await self.generate_embedding(content)
-        
-        # Store in vector database
+        self._upsert_items([item_id], [content], [metadata], [embedding])
+    
+    def _upsert_items(self,
+                      item_ids: List[str],
+                      contents: List[str],
+                      metadatas: List[Dict[str, Any]],
+                      embeddings: List[List[float]]):
+        """Store items in the vector database in one bulk upsert"""
         if self.vector_provider == VectorProvider.CHROMADB and self.collection:
             self.collection.upsert(
-                ids=[item_id],
-                documents=[content],
-                metadatas=[metadata],
-                embeddings=[embedding]
+                ids=item_ids,
+                documents=contents,
+                metadatas=metadatas,
+                embeddings=embeddings
             )
             
         elif self.vector_provider == VectorProvider.PINECONE and self.vector_db:
             self.vector_db.upsert(
-                vectors=[(item_id, embedding, metadata)]
+                vectors=list(zip(item_ids, embeddings, metadatas))
             )
             
         else:  # Memory storage
-            self.memory_store[item_id] = {
-                "content": content,
-                "metadata": metadata,
-                "embedding": embedding
-            }
+            for item_id, content, metadata, embedding in zip(item_ids, contents, metadatas, embeddings):
+                self.memory_store[item_id] = {
+                    "content": content,
+                    "metadata": metadata,
+                    "embedding": embedding
+                }
     
     def _chunk_text(self, text: str) -> List[str]:
         """
@@ -438,7 +616,8 @@ class VectorSearchService:
                     query: str, 
                     limit: Optional[int] = None,
                     min_similarity: Optional[float] = None,
-                    filters: Optional[Dict[str, Any]] = None) -> List[SearchResult]:
+                    filters: Optional[Dict[str, Any]] = None,
+                    query_embedding: Optional[List[float]] = None) -> List[SearchResult]:
         """
         Search for similar documents
         
@@ -447,6 +626,7 @@ class VectorSearchService:
             limit: Maximum number of results
             min_similarity: Minimum similarity threshold
             filters: Metadata filters
+            query_embedding: Precomputed embedding of the query, if available
             
         Returns:
             List[SearchResult]: Search results
@@ -460,7 +640,8 @@ class VectorSearchService:
             filters = filters or {}
             
             # Generate query embedding
-            query_embedding = await self.generate_embedding(query)
+            if query_embedding is None:
+                query_embedding = await self.generate_embedding(query)
             
             # Search in vector database
             if self.vector_provider == VectorProvider.CHROMADB and self.collection:
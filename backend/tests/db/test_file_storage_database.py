@@ -0,0 +1,408 @@
+"""
+Tests for the in-memory FileStorageDatabase service
+"""
+import pytest
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# Add backend to path
+backend_path = Path(__file__).parent.parent.parent
+if str(backend_path) not in sys.path:
+    sys.path.insert(0, str(backend_path))
+
+from services.file_storage_database import FileStorageDatabase, FileMetadata, FileType
+
+
+def make_metadata(file_id: str, **overrides) -> FileMetadata:
+    """Build a FileMetadata with sensible defaults"""
+    values = dict(
+        id=file_id,
+        filename=f"{file_id}.txt",
+        original_filename=f"{file_id}.txt",
+        file_type=FileType.TEXT,
+        mime_type="text/plain",
+        size_bytes=100,
+        checksum_md5=f"md5-{file_id}",
+        checksum_sha256=f"sha256-{file_id}",
+        storage_path=f"/tmp/{file_id}.txt",
+        uploaded_by="user-1",
+        created_at=datetime.now(timezone.utc),
+    )
+    values.update(overrides)
+    return FileMetadata(**values)
+
+
+@pytest.fixture
+def db():
+    return FileStorageDatabase()
+
+
+class TestFileStorageDatabaseSearch:
+    @pytest.mark.asyncio
+    async def test_search_matches_text_fields(self, db):
+        """Query matches filename, extracted text and description"""
+        await db.save_file_metadata(make_metadata("a", original_filename="Quarterly Report.pdf"))
+        await db.save_file_metadata(make_metadata("b", extracted_text="Notes about the budget"))
+        await db.save_file_metadata(make_metadata("c", description="Budget planning"))
+        await db.save_file_metadata(make_metadata("d"))
+
+        assert {f.id for f in await db.search_files(query="report")} == {"a"}
+        assert {f.id for f in await db.search_files(query="Budget")} == {"b", "c"}
+
+    @pytest.mark.asyncio
+    async def test_search_combines_query_and_filters(self, db):
+        """Text query is combined with user and file type filters"""
+        await db.save_file_metadata(make_metadata("a", description="budget", uploaded_by="user-1"))
+        await db.save_file_metadata(make_metadata("b", description="budget", uploaded_by="user-2"))
+        await db.save_file_metadata(make_metadata("c", description="budget", file_type=FileType.IMAGE))
+
+        results = await db.search_files(query="budget", user_id="user-1", file_type=FileType.TEXT)
+        assert [f.id for f in results] == ["a"]
+
+    @pytest.mark.asyncio
+    async def test_search_query_applies_within_small_owner_bucket(self, db):
+        """Text query still filters when the owner has fewer files than hits"""
+        await db.save_file_metadata(make_metadata("a", description="budget"))
+        await db.save_file_metadata(make_metadata("b", description="holiday"))
+        for file_id in ("c", "d", "e"):
+            await db.save_file_metadata(make_metadata(file_id, description="budget", uploaded_by="user-2"))
+
+        results = await db.search_files(query="budget", user_id="user-1")
+        assert [f.id for f in results] == ["a"]
+
+    @pytest.mark.asyncio
+    async def test_search_intersects_filter_indexes(self, db):
+        """User, project and type filters combine and follow type changes"""
+        await db.save_file_metadata(make_metadata("a", project_id="p1"))
+        await db.save_file_metadata(make_metadata("b", project_id="p1", file_type=FileType.IMAGE))
+        await db.save_file_metadata(make_metadata("c", project_id="p2", file_type=FileType.IMAGE))
+        await db.save_file_metadata(make_metadata("d", project_id="p1", uploaded_by="user-2"))
+
+        assert {f.id for f in await db.search_files(file_type=FileType.IMAGE)} == {"b", "c"}
+        assert [f.id for f in await db.search_files(user_id="user-1", project_id="p1", file_type=FileType.TEXT)] == ["a"]
+        assert await db.search_files(user_id="nobody", file_type=FileType.TEXT) == []
+
+        await db.update_file_metadata("a", {"file_type": FileType.IMAGE})
+        assert {f.id for f in await db.search_files(project_id="p1", file_type=FileType.IMAGE)} == {"a", "b"}
+
+    @pytest.mark.asyncio
+    async def test_search_reflects_updates_and_deletes(self, db):
+        """Updated and deleted files are reflected in search results"""
+        await db.save_file_metadata(make_metadata("a", description="draft"))
+        await db.update_file_metadata("a", {"description": "final"})
+        assert await db.search_files(query="draft") == []
+        assert [f.id for f in await db.search_files(query="final")] == ["a"]
+
+        await db.delete_file_metadata("a")
+        assert await db.search_files(query="final") == []
+
+
+    @pytest.mark.asyncio
+    async def test_search_matches_partial_words_and_literal_syntax(self, db):
+        """Queries are plain substrings: partial words match and query syntax is not interpreted"""
+        await db.save_file_metadata(make_metadata("a", original_filename="Budget-Plan*.xlsx"))
+        await db.save_file_metadata(make_metadata("b", description="budget and x"))
+        await db.save_file_metadata(make_metadata("c", description="holiday"))
+
+        assert {f.id for f in await db.search_files(query="budg")} == {"a", "b"}
+        assert [f.id for f in await db.search_files(query="plan*")] == ["a"]
+        assert [f.id for f in await db.search_files(query="-plan")] == ["a"]
+        assert [f.id for f in await db.search_files(query="lida")] == ["c"]
+        assert [f.id for f in await db.search_files(query="budget AND x")] == ["b"]
+        assert await db.search_files(query="budget AND qqq") == []
+        assert [f.id for f in await db.search_files(query="oli")] == ["c"]
+        assert await db.search_files(query="budgets") == []
+
+
+class TestFileStorageDatabaseExpiry:
+    @pytest.mark.asyncio
+    async def test_expiring_files_ordered_and_limited(self, db):
+        """Expiring files come back soonest first and honour the limit"""
+        now = datetime.now(timezone.utc)
+        await db.save_file_metadata(make_metadata("late", expires_at=now + timedelta(days=5)))
+        await db.save_file_metadata(make_metadata("soon", expires_at=now + timedelta(days=1)))
+        await db.save_file_metadata(make_metadata("mid", expires_at=now + timedelta(days=3)))
+        await db.save_file_metadata(make_metadata("never"))
+        await db.save_file_metadata(make_metadata("far", expires_at=now + timedelta(days=30)))
+
+        assert [f.id for f in await db.get_expiring_files(days_ahead=7)] == ["soon", "mid", "late"]
+        assert [f.id for f in await db.get_expiring_files(days_ahead=7, limit=2)] == ["soon", "mid"]
+
+
+class TestFileStorageDatabaseChecksums:
+    @pytest.mark.asyncio
+    async def test_duplicates_found_by_checksum(self, db):
+        """Files sharing a checksum are grouped together"""
+        await db.save_file_metadata(make_metadata("a", checksum_md5="same", checksum_sha256="sha-same"))
+        await db.save_file_metadata(make_metadata("b", checksum_md5="same", checksum_sha256="sha-same"))
+        await db.save_file_metadata(make_metadata("c"))
+
+        assert {f.id for f in await db.get_files_by_checksum("same")} == {"a", "b"}
+        assert {f.id for f in await db.get_files_by_sha256("sha-same")} == {"a", "b"}
+        assert await db.get_files_by_checksum("missing") == []
+
+    @pytest.mark.asyncio
+    async def test_checksum_index_follows_updates_and_deletes(self, db):
+        """Changing or deleting a file moves it out of its old bucket"""
+        await db.save_file_metadata(make_metadata("a", checksum_md5="old"))
+        await db.save_file_metadata(make_metadata("b", checksum_md5="old"))
+        await db.update_file_metadata("a", {"checksum_md5": "new"})
+        await db.delete_file_metadata("b")
+
+        assert await db.get_files_by_checksum("old") == []
+        assert [f.id for f in await db.get_files_by_checksum("new")] == ["a"]
+
+
+class TestFileStorageDatabaseMultiTermSearch:
+    @pytest.mark.asyncio
+    async def test_multi_term_query_matches_all_terms(self, db):
+        """Every whitespace-separated term must occur, in any order and field"""
+        await db.save_file_metadata(make_metadata("a", original_filename="Quarterly Report.pdf"))
+        await db.save_file_metadata(make_metadata("b", description="annual report"))
+        await db.save_file_metadata(make_metadata("c", description="report", extracted_text="Q3 quarterly"))
+        await db.save_file_metadata(make_metadata("d", description="holiday photos"))
+
+        results = await db.search_files(query="quarterly report")
+        assert {f.id for f in results} == {"a", "c"}
+        assert [f.id for f in await db.search_files(query="REPORT annual report")] == ["b"]
+
+
+class TestFileStorageDatabaseUpdate:
+    @pytest.mark.asyncio
+    async def test_update_ignores_unknown_fields(self, db):
+        """Only declared metadata fields are assigned"""
+        await db.save_file_metadata(make_metadata("a"))
+        updated = await db.update_file_metadata("a", {"description": "new", "bogus": 1})
+
+        assert updated.description == "new"
+        assert not hasattr(updated, "bogus")
+
+
+class TestFileStorageDatabaseBatch:
+    @pytest.mark.asyncio
+    async def test_save_and_delete_many(self, db):
+        """Batch APIs store and remove several entries at once"""
+        await db.save_many([make_metadata("a"), make_metadata("b"), make_metadata("c")])
+        assert {f.id for f in await db.list_files_by_user("user-1")} == {"a", "b", "c"}
+
+        assert await db.delete_many(["a", "b", "missing"]) == 2
+        assert [f.id for f in await db.list_files_by_user("user-1")] == ["c"]
+
+    @pytest.mark.asyncio
+    async def test_sql_backend_mirrors_writes(self, tmp_path):
+        """Writes are upserted to and deleted from the SQL backend"""
+        pytest.importorskip("aiosqlite")
+        from sqlalchemy import select
+        from services.file_storage_database import SQLFileMetadataBackend, file_metadata_table
+
+        backend = SQLFileMetadataBackend(f"sqlite+aiosqlite:///{tmp_path / 'files.db'}")
+        db = FileStorageDatabase(backend=backend)
+        try:
+            await db.save_many([make_metadata("a"), make_metadata("b")])
+            await db.update_file_metadata("a", {"description": "updated"})
+            await db.delete_file_metadata("b")
+
+            async with backend.engine.connect() as conn:
+                rows = (await conn.execute(select(file_metadata_table))).mappings().all()
+            assert [(row["id"], row["description"], row["file_type"]) for row in rows] == [
+                ("a", "updated", "text")
+            ]
+        finally:
+            await backend.close()
+
+    @pytest.mark.asyncio
+    async def test_sql_backend_loaded_on_startup(self, tmp_path):
+        """A new database serves the metadata already stored in the backend"""
+        pytest.importorskip("aiosqlite")
+        from services.file_storage_database import SQLFileMetadataBackend
+
+        url = f"sqlite+aiosqlite:///{tmp_path / 'files.db'}"
+        backend = SQLFileMetadataBackend(url)
+        try:
+            await FileStorageDatabase(backend=backend).save_file_metadata(
+                make_metadata("a", description="Budget plan")
+            )
+        finally:
+            await backend.close()
+
+        backend = SQLFileMetadataBackend(url)
+        try:
+            db = FileStorageDatabase(backend=backend)
+            loaded = await db.get_file_metadata("a")
+            assert loaded.file_type is FileType.TEXT
+            assert loaded.created_at.tzinfo is not None
+            assert [f.id for f in await db.list_files_by_user("user-1")] == ["a"]
+            assert [f.id for f in await db.search_files("budget")] == ["a"]
+        finally:
+            await backend.close()
+
+    @pytest.mark.asyncio
+    async def test_sql_backend_search_filters_orders_and_pages(self, tmp_path):
+        """search_files resolves filters, ordering and the page in SQL"""
+        pytest.importorskip("aiosqlite")
+        from services.file_storage_database import SQLFileMetadataBackend
+
+        backend = SQLFileMetadataBackend(f"sqlite+aiosqlite:///{tmp_path / 'files.db'}")
+        db = FileStorageDatabase(backend=backend)
+        now = datetime.now(timezone.utc)
+        try:
+            await db.save_many([
+                make_metadata("old", description="Budget 100%", created_at=now - timedelta(days=2)),
+                make_metadata("new", extracted_text="the BUDGET", created_at=now),
+                make_metadata("mid", description="budget", created_at=now - timedelta(days=1)),
+                make_metadata("other", description="budget", uploaded_by="user-2"),
+                make_metadata("doc", description="budget", file_type=FileType.DOCUMENT),
+            ])
+
+            results = await db.search_files("budget", file_type=FileType.TEXT, user_id="user-1")
+            assert [f.id for f in results] == ["new", "mid", "old"]
+            page = await db.search_files("budget", file_type=FileType.TEXT, user_id="user-1",
+                                         limit=1, offset=1)
+            assert [f.id for f in page] == ["mid"]
+            assert [f.id for f in await db.search_files("100%")] == ["old"]
+            assert [f.id for f in await db.search_files("100% budget")] == ["old"]
+            assert await db.search_files("budget qqq") == []
+        finally:
+            await backend.close()
+
+    @pytest.mark.asyncio
+    async def test_sql_backend_persists_access_times(self, tmp_path):
+        """Read access times are written to the backend in one batch and survive a restart"""
+        pytest.importorskip("aiosqlite")
+        from services.file_storage_database import SQLFileMetadataBackend
+
+        url = f"sqlite+aiosqlite:///{tmp_path / 'files.db'}"
+        backend = SQLFileMetadataBackend(url)
+        db = FileStorageDatabase(backend=backend)
+        await db.save_many([make_metadata("a"), make_metadata("b")])
+        calls = []
+        update_access_times = backend.update_access_times
+
+        async def record(access_times):
+            calls.append(dict(access_times))
+            await update_access_times(access_times)
+
+        backend.update_access_times = record
+        first = await db.get_file_metadata("a")
+        second = await db.get_file_metadata("b")
+        await db.close()
+
+        assert calls == [{"a": first.last_accessed_at, "b": second.last_accessed_at}]
+        backend = SQLFileMetadataBackend(url)
+        try:
+            reloaded = FileStorageDatabase(backend=backend)
+            stored = {f.id: f for f in await reloaded.list_files_by_user("user-1")}
+            assert stored["a"].last_accessed_at == first.last_accessed_at
+            assert stored["b"].last_accessed_at == second.last_accessed_at
+        finally:
+            await backend.close()
+
+    @pytest.mark.asyncio
+    async def test_failed_backend_write_leaves_memory_unchanged(self, tmp_path):
+        """Memory only changes once the backend has accepted the write"""
+        pytest.importorskip("aiosqlite")
+        from services.file_storage_database import SQLFileMetadataBackend
+
+        backend = SQLFileMetadataBackend(f"sqlite+aiosqlite:///{tmp_path / 'files.db'}")
+        db = FileStorageDatabase(backend=backend)
+        try:
+            await db.save_file_metadata(make_metadata("a", description="before"))
+
+            async def fail(*args, **kwargs):
+                raise RuntimeError("database unavailable")
+
+            backend.upsert_many = fail
+            backend.delete_many = fail
+            with pytest.raises(RuntimeError):
+                await db.save_file_metadata(make_metadata("b"))
+            with pytest.raises(RuntimeError):
+                await db.update_file_metadata("a", {"description": "after"})
+            with pytest.raises(RuntimeError):
+                await db.delete_file_metadata("a")
+
+            assert await db.get_file_metadata("b") is None
+            stored = await db.get_file_metadata("a")
+            assert stored.description == "before"
+        finally:
+            await backend.close()
+
+
+class TestFileStorageDatabaseReadCache:
+    @pytest.mark.asyncio
+    async def test_repeated_reads_hit_cache(self, db):
+        """A cached read keeps the access time from the first read"""
+        await db.save_file_metadata(make_metadata("a"))
+        first = await db.get_file_metadata("a")
+        accessed_at = first.last_accessed_at
+        second = await db.get_file_metadata("a")
+
+        assert second is first
+        assert second.last_accessed_at == accessed_at
+
+    @pytest.mark.asyncio
+    async def test_cache_invalidated_on_write(self, db):
+        """Saving or deleting a file drops its cached read"""
+        await db.save_file_metadata(make_metadata("a"))
+        await db.get_file_metadata("a")
+        replacement = make_metadata("a", description="replaced")
+        await db.save_file_metadata(replacement)
+        assert await db.get_file_metadata("a") is replacement
+
+        await db.delete_file_metadata("a")
+        assert await db.get_file_metadata("a") is None
+
+
+class TestFileStorageDatabaseOrdering:
+    @pytest.mark.asyncio
+    async def test_files_without_created_at_sort_last(self, db):
+        """Listing is newest first with undated files at the end"""
+        now = datetime.now(timezone.utc)
+        await db.save_file_metadata(make_metadata("undated", created_at=None))
+        await db.save_file_metadata(make_metadata("old", created_at=now - timedelta(days=2)))
+        await db.save_file_metadata(make_metadata("new", created_at=now))
+
+        assert [f.id for f in await db.list_files_by_user("user-1")] == ["new", "old", "undated"]
+        assert [f.id for f in await db.search_files(user_id="user-1")] == ["new", "old", "undated"]
+
+
+class TestFileStorageDatabaseInPlaceUpdate:
+    @pytest.mark.asyncio
+    async def test_update_stamps_updated_at(self, db):
+        """Updating mutates the stored object and stamps updated_at"""
+        stored = await db.save_file_metadata(make_metadata("a", updated_at=None))
+        updated = await db.update_file_metadata("a", {"processing_error": "boom"})
+
+        assert updated is stored
+        assert updated.processing_error == "boom"
+        assert updated.updated_at is not None
+
+
+class TestFileStorageDatabaseOwnerIndex:
+    @pytest.mark.asyncio
+    async def test_listing_pages_and_follows_owner_changes(self, db):
+        """Owner listings page newest first and track reassigned files"""
+        now = datetime.now(timezone.utc)
+        await db.save_many([
+            make_metadata(f"f{i}", created_at=now - timedelta(minutes=i), project_id="p1")
+            for i in range(10)
+        ])
+        page = await db.list_files_by_user("user-1", limit=2, offset=1)
+        assert [f.id for f in page] == ["f1", "f2"]
+
+        await db.update_file_metadata("f0", {"uploaded_by": "user-2", "project_id": None})
+        assert [f.id for f in await db.list_files_by_user("user-2")] == ["f0"]
+        assert "f0" not in {f.id for f in await db.list_files_by_project("p1")}
+
+
+class TestFileStorageDatabaseOffload:
+    @pytest.mark.asyncio
+    async def test_large_queries_run_in_worker_thread(self, db, monkeypatch):
+        """Results are the same when CPU-bound work is offloaded"""
+        import services.file_storage_database as module
+        monkeypatch.setattr(module, "_OFFLOAD_THRESHOLD", 1)
+        await db.save_many([make_metadata(f"f{i}", description="budget") for i in range(3)])
+
+        assert len(await db.search_files(query="budget")) == 3
+        assert len(await db.list_files_by_user("user-1")) == 3
+        assert (await db.get_statistics())["total_files"] == 3
@@ -0,0 +1,481 @@
+"""
+Tests for EnhancedLLMRouter provider clients
+"""
+import asyncio
+import pytest
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import httpx
+from cachetools import TTLCache
+
+# Add backend to path
+backend_path = Path(__file__).parent.parent.parent
+if str(backend_path) not in sys.path:
+    sys.path.insert(0, str(backend_path))
+
+from services.enhanced_llm_router import (
+    AIProviderType, AIResponse, AnthropicClient, EnhancedLLMRouter, GroqClient, HuggingFaceClient, OllamaClient,
+    OpenAIClient, OpenRouterClient, ProviderConfig, TokenBucket
+)
+
+
+def make_config(provider_type, **overrides):
+    fields = dict(provider_type=provider_type, name=provider_type, base_url="https://api.example.com/v1",
+                  api_key="test-key", default_model="test-model")
+    fields.update(overrides)
+    return ProviderConfig(**fields)
+
+
+class StubClient:
+    """Provider client answering every request with a numbered reply"""
+
+    def __init__(self, provider_type, priority=1):
+        self.config = make_config(provider_type, priority=priority)
+        self.calls = 0
+
+    async def generate_response(self, request):
+        self.calls += 1
+        return AIResponse(
+            content=f"reply {self.calls}", model="test-model", provider=self.config.provider_type,
+            usage={"total_tokens": 5}, cost=0.01, latency=0.02,
+            timestamp=datetime.now(timezone.utc), response_time_ms=20.0,
+        )
+
+    async def aclose(self):
+        pass
+
+
+@pytest.fixture
+def router(monkeypatch):
+    """Router without environment-configured providers; tests register stubs"""
+    monkeypatch.setattr(EnhancedLLMRouter, "_initialize_providers", lambda self: None)
+    return EnhancedLLMRouter()
+
+
+def register(router, client):
+    router.add_client(client)
+    return client
+
+
+def openai_completion(content="Hi there", prompt_tokens=12, completion_tokens=3):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason="stop")],
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                              total_tokens=prompt_tokens + completion_tokens),
+        model="test-model",
+    )
+
+
+class TestAsyncClients:
+    @pytest.mark.asyncio
+    async def test_openai_awaits_native_async_client(self, monkeypatch):
+        """OpenAI requests are awaited on the async SDK client, not a worker thread"""
+        client = OpenAIClient(make_config(AIProviderType.OPENAI))
+        create = AsyncMock(return_value=openai_completion())
+        monkeypatch.setattr(client.client.chat.completions, "create", create)
+
+        response = await client.generate_response({"messages": [{"role": "user", "content": "Hello"}]})
+
+        assert response.content == "Hi there"
+        assert response.usage["total_tokens"] == 15
+        create.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("client_class, provider_type", [
+        (OpenRouterClient, AIProviderType.OPENROUTER),
+        (GroqClient, AIProviderType.GROQ),
+    ])
+    async def test_openai_compatible_response_is_complete(self, monkeypatch, client_class, provider_type):
+        """OpenAI-compatible providers return a response with latency and timestamp set"""
+        client = client_class(make_config(provider_type))
+        monkeypatch.setattr(client.client.chat.completions, "create", AsyncMock(return_value=openai_completion()))
+
+        before = datetime.now(timezone.utc)
+        response = await client.generate_response({"messages": [{"role": "user", "content": "Hello"}]})
+
+        assert response.content == "Hi there"
+        assert response.provider == provider_type
+        assert response.metadata["finish_reason"] == "stop"
+        assert response.latency == pytest.approx(response.response_time_ms / 1000)
+        assert response.timestamp >= before
+
+    def test_sdk_clients_are_async(self):
+        """Provider clients are built on the SDKs' async clients"""
+        assert OpenAIClient(make_config(AIProviderType.OPENAI)).client.__class__.__name__ == "AsyncOpenAI"
+        assert AnthropicClient(make_config(AIProviderType.ANTHROPIC)).client.__class__.__name__ == "AsyncAnthropic"
+
+
+class TestRateLimiting:
+    @pytest.mark.asyncio
+    async def test_token_bucket_queues_callers_past_the_burst(self, monkeypatch):
+        """Callers within the burst go straight through; later ones each wait for their own token"""
+        waits = []
+
+        async def record_sleep(seconds):
+            waits.append(seconds)
+
+        monkeypatch.setattr("services.enhanced_llm_router.asyncio.sleep", record_sleep)
+        bucket = TokenBucket(rate=10.0, capacity=2.0)
+        for _ in range(4):
+            await bucket.acquire()
+
+        assert waits == [pytest.approx(0.1, abs=0.01), pytest.approx(0.2, abs=0.01)]
+
+    @pytest.mark.asyncio
+    async def test_requests_update_rate_limit_state(self, monkeypatch):
+        """Each request takes a token and records its time"""
+        client = OpenAIClient(make_config(AIProviderType.OPENAI, rate_limit_rpm=600))
+        monkeypatch.setattr(client.client.chat.completions, "create", AsyncMock(return_value=openai_completion()))
+
+        for _ in range(3):
+            await client.generate_response({"messages": [{"role": "user", "content": "Hello"}]})
+
+        assert client._request_count == 3
+        assert client._last_request_time > 0
+
+
+class TestHttpClients:
+    @pytest.mark.asyncio
+    async def test_huggingface_parses_generated_text(self):
+        """Hugging Face responses are decoded from the JSON body"""
+        client = HuggingFaceClient(make_config(AIProviderType.HUGGINGFACE))
+        prompt = "User: Hello\n"
+
+        def handler(request):
+            return httpx.Response(200, json=[{"generated_text": prompt + "Hi there"}])
+
+        await client.client.aclose()
+        client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        response = await client.generate_response({"messages": [{"role": "user", "content": "Hello"}]})
+
+        assert response.content == "Hi there"
+        assert response.usage["completion_tokens"] == 2
+        await client.aclose()
+
+
+async def aiter(items):
+    for item in items:
+        yield item
+
+
+class FakeAnthropicStream:
+    """Stand-in for the Anthropic SDK's message stream context manager"""
+
+    def __init__(self, texts, final_message):
+        self.text_stream = aiter(texts)
+        self.final_message = final_message
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def get_final_message(self):
+        return self.final_message
+
+
+class TestStreaming:
+    @pytest.mark.asyncio
+    async def test_openai_stream_records_first_token_latency(self, monkeypatch):
+        """Streamed OpenAI responses are assembled from deltas and report TTFT and usage"""
+        client = OpenAIClient(make_config(AIProviderType.OPENAI))
+        chunks = [
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None)
+            for text in ("Hi", " there")
+        ]
+        chunks.append(SimpleNamespace(choices=[], usage=openai_completion().usage))
+        create = AsyncMock(return_value=aiter(chunks))
+        monkeypatch.setattr(client.client.chat.completions, "create", create)
+
+        response = await client.generate_response({"messages": [{"role": "user", "content": "Hello"}], "stream": True})
+
+        assert response.content == "Hi there"
+        assert response.usage["total_tokens"] == 15
+        assert 0 <= response.metadata["ttft_ms"] <= response.response_time_ms
+        assert create.await_args.kwargs["stream"] is True
+
+    @pytest.mark.asyncio
+    async def test_anthropic_stream_uses_final_message(self):
+        """Streamed Anthropic responses report TTFT alongside the final message's usage"""
+        client = AnthropicClient(make_config(AIProviderType.ANTHROPIC))
+        final = SimpleNamespace(
+            content=[SimpleNamespace(text="Hi there")], stop_reason="end_turn", stop_sequence=None,
+            usage=SimpleNamespace(input_tokens=12, output_tokens=3),
+        )
+        client.client = SimpleNamespace(messages=SimpleNamespace(
+            stream=lambda **params: FakeAnthropicStream(["Hi", " there"], final)
+        ))
+
+        response = await client.generate_response({"messages": [{"role": "user", "content": "Hello"}], "stream": True})
+
+        assert response.content == "Hi there"
+        assert response.usage["total_tokens"] == 15
+        assert response.metadata["ttft_ms"] >= 0
+
+    @pytest.mark.asyncio
+    async def test_usage_metrics_track_streamed_requests(self, router):
+        """Time to first token is aggregated for streamed responses only"""
+        stub = register(router, StubClient(AIProviderType.OPENAI))
+        original = stub.generate_response
+
+        async def streamed(request):
+            response = await original(request)
+            if request.get("stream"):
+                response.metadata["ttft_ms"] = 5.0
+            return response
+
+        stub.generate_response = streamed
+        await router.generate_response({"messages": [], "stream": True})
+        await router.generate_response({"messages": []})
+
+        (metrics,) = router.usage_metrics.values()
+        assert (metrics["requests"], metrics["streamed_requests"], metrics["total_ttft"]) == (2, 1, 5.0)
+
+
+class TestTokenEstimates:
+    def test_estimates_use_tiktoken_when_installed(self, monkeypatch):
+        """Token estimates come from the shared tiktoken encoding, or word counts without it"""
+        import services.enhanced_llm_router as router_module
+
+        monkeypatch.setattr(router_module, "tiktoken", None)
+        assert router_module._estimate_tokens("User: Hello there\n") == 3
+
+        encoding = SimpleNamespace(encode=lambda text, disallowed_special: list(text))
+        monkeypatch.setattr(router_module, "tiktoken", SimpleNamespace(get_encoding=lambda name: encoding))
+        router_module._token_encoding.cache_clear()
+        try:
+            assert router_module._estimate_tokens("Hello") == 5
+        finally:
+            router_module._token_encoding.cache_clear()
+
+
+class TestPromptCaching:
+    @pytest.mark.asyncio
+    async def test_anthropic_system_prompt_is_cacheable(self):
+        """The system prompt is sent as a cache_control block and cache reads are billed at the cached rate"""
+        client = AnthropicClient(make_config(AIProviderType.ANTHROPIC, input_cost_per_1k=3.0,
+                                             output_cost_per_1k=15.0, cached_input_cost_per_1k=0.3))
+        create = AsyncMock(return_value=SimpleNamespace(
+            content=[SimpleNamespace(text="Hi")], stop_reason="end_turn", stop_sequence=None,
+            usage=SimpleNamespace(input_tokens=100, output_tokens=10,
+                                  cache_read_input_tokens=1000, cache_creation_input_tokens=0),
+        ))
+        client.client = SimpleNamespace(messages=SimpleNamespace(create=create))
+
+        response = await client.generate_response({"messages": [
+            {"role": "system", "content": "You are a coach."}, {"role": "user", "content": "Hello"}
+        ]})
+
+        assert create.await_args.kwargs["system"] == [
+            {"type": "text", "text": "You are a coach.", "cache_control": {"type": "ephemeral"}}
+        ]
+        assert response.usage["input_tokens"] == 1100
+        assert response.usage["cache_read_input_tokens"] == 1000
+        assert response.cost == pytest.approx((100 * 3.0 + 1000 * 0.3 + 10 * 15.0) / 1000)
+
+    @pytest.mark.asyncio
+    async def test_openai_cached_tokens_are_discounted(self, monkeypatch):
+        """OpenAI cached prompt tokens are reported and billed at half the input rate by default"""
+        client = OpenAIClient(make_config(AIProviderType.OPENAI, input_cost_per_1k=2.0, output_cost_per_1k=8.0))
+        completion = openai_completion(prompt_tokens=1200, completion_tokens=100)
+        completion.usage.prompt_tokens_details = SimpleNamespace(cached_tokens=1000)
+        monkeypatch.setattr(client.client.chat.completions, "create", AsyncMock(return_value=completion))
+
+        response = await client.generate_response({"messages": [{"role": "user", "content": "Hello"}]})
+
+        assert response.usage["cached_tokens"] == 1000
+        assert response.cost == pytest.approx((200 * 2.0 + 1000 * 1.0 + 100 * 8.0) / 1000)
+
+
+class TestConnectionLifecycle:
+    @pytest.mark.asyncio
+    async def test_router_close_closes_client_pools(self, router):
+        """Closing the router closes each provider's HTTP connection pool"""
+        ollama = OllamaClient(make_config(AIProviderType.OLLAMA, api_key=None, timeout=60))
+        assert ollama.client.timeout.connect == 10.0
+        assert ollama.client.timeout.read == 60
+
+        register(router, ollama)
+        await router.close()
+        assert ollama.client.is_closed
+
+    @pytest.mark.asyncio
+    async def test_sdk_clients_share_the_router_pool(self, router):
+        """SDK-based clients send requests through the router's pool, which only the router closes"""
+        shared = router._http_client
+        openai_client = register(router, OpenAIClient(make_config(AIProviderType.OPENAI), http_client=shared))
+        anthropic_client = register(router, AnthropicClient(make_config(AIProviderType.ANTHROPIC), http_client=shared))
+        assert openai_client.client._client is shared
+        assert anthropic_client.client._client is shared
+
+        await openai_client.aclose()
+        assert not shared.is_closed
+        await router.close()
+        assert shared.is_closed
+
+
+class TestResponseCache:
+    def test_cache_key_covers_response_inputs(self):
+        """Equal requests share a key; any field that changes the response changes it"""
+        base = {"messages": [{"role": "user", "content": "Hello"}], "temperature": 0.0}
+        key = EnhancedLLMRouter._generate_cache_key
+        assert key(base) == key({**base, "analysis_type": "general"})
+        variants = [
+            {**base, "temperature": 0.5},
+            {**base, "model": "other"},
+            {**base, "messages": [{"role": "system", "content": "Hello"}]},
+            {**base, "messages": [{"role": "user", "content": "Hel"}, {"role": "user", "content": "lo"}]},
+        ]
+        assert len({key(base), *map(key, variants)}) == len(variants) + 1
+
+    @pytest.mark.asyncio
+    async def test_opt_in_requests_reuse_responses(self, router):
+        """Only requests asking for the cache reuse an earlier response"""
+        stub = register(router, StubClient(AIProviderType.OPENAI))
+        request = {"messages": [{"role": "user", "content": "Hello"}]}
+
+        first = await router.generate_response({**request, "use_cache": True})
+        assert (await router.generate_response({**request, "use_cache": True})) is first
+        assert (await router.generate_response(request)).content == "reply 2"
+        assert stub.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_cached_responses_expire_and_are_counted(self, router):
+        """Cached responses expire after the TTL; hits and misses are counted"""
+        stub = register(router, StubClient(AIProviderType.OPENAI))
+        clock = [0.0]
+        router.response_cache = TTLCache(maxsize=8, ttl=60, timer=lambda: clock[0])
+        request = {"messages": [{"role": "user", "content": "Hello"}], "use_cache": True}
+
+        await router.generate_response(request)
+        assert (await router.generate_response(request)).content == "reply 1"
+        clock[0] += 61
+        assert (await router.generate_response(request)).content == "reply 2"
+        assert (router.cache_hits, router.cache_misses) == (1, 2)
+        assert stub.calls == 2
+
+
+class TestUsageMetrics:
+    @pytest.mark.asyncio
+    async def test_latency_only_responses_are_recorded(self, router):
+        """Responses without response_time_ms are timed from latency instead of failing the request"""
+        stub = register(router, StubClient(AIProviderType.OPENAI))
+        stub.config.max_retries = 1
+        original = stub.generate_response
+
+        async def latency_only(request):
+            response = await original(request)
+            response.response_time_ms = None
+            return response
+
+        stub.generate_response = latency_only
+        await router.generate_response({"messages": [{"role": "user", "content": "Hello"}]})
+
+        (metrics,) = router.usage_metrics.values()
+        assert metrics["requests"] == 1
+        assert metrics["total_time"] == pytest.approx(20.0)
+
+    def test_old_days_are_dropped(self, router, monkeypatch):
+        """Aggregates older than the retention window are evicted as days roll over"""
+        monkeypatch.setattr("services.enhanced_llm_router._USAGE_METRICS_DAYS", 2)
+        recorded = AIResponse(
+            content="reply", model="test-model", provider=AIProviderType.OPENAI, usage={"total_tokens": 5},
+            cost=0.01, latency=0.02, timestamp=datetime.now(timezone.utc), response_time_ms=20.0,
+        )
+        clock = [1_700_000_000.0]
+        monkeypatch.setattr("services.enhanced_llm_router.time.time", lambda: clock[0])
+
+        for _ in range(3):
+            router._record_usage(AIProviderType.OPENAI, recorded)
+            router._record_usage(AIProviderType.ANTHROPIC, recorded)
+            clock[0] += 86400
+
+        assert sorted(router.usage_metrics) == [
+            "anthropic_2023-11-15", "anthropic_2023-11-16", "openai_2023-11-15", "openai_2023-11-16"
+        ]
+
+
+class TestGenerateMany:
+    @pytest.mark.asyncio
+    async def test_requests_run_concurrently_up_to_the_limit(self, router):
+        """Requests overlap up to max_concurrency; results keep request order and failures are returned"""
+        stub = register(router, StubClient(AIProviderType.OPENAI))
+        stub.config.max_retries = 1
+        in_flight = peak = 0
+        original = stub.generate_response
+
+        async def slow(request):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            if request.get("fail"):
+                raise RuntimeError("provider error")
+            return await original(request)
+
+        stub.generate_response = slow
+        requests = [{"messages": [{"role": "user", "content": str(i)}], "fail": i == 3} for i in range(8)]
+        results = await router.generate_many(requests, max_concurrency=3)
+
+        assert peak == 3
+        assert isinstance(results[3], RuntimeError)
+        assert all(isinstance(result, AIResponse) for i, result in enumerate(results) if i != 3)
+
+
+class TestProviderSelection:
+    def test_priority_order_and_fallback(self, router):
+        """Providers are chosen by priority, skipping disabled ones; fallbacks follow in priority order"""
+        register(router, StubClient(AIProviderType.GROQ, priority=6))
+        anthropic_stub = register(router, StubClient(AIProviderType.ANTHROPIC, priority=2))
+        register(router, StubClient(AIProviderType.OLLAMA, priority=5))
+
+        assert router._select_provider({}) == AIProviderType.ANTHROPIC
+        assert list(router._fallback_providers(AIProviderType.ANTHROPIC)) == [AIProviderType.OLLAMA, AIProviderType.GROQ]
+        assert list(router._fallback_providers(AIProviderType.OLLAMA)) == [AIProviderType.ANTHROPIC, AIProviderType.GROQ]
+
+        anthropic_stub.config.enabled = False
+        assert router._select_provider({}) == AIProviderType.OLLAMA
+
+    @pytest.mark.asyncio
+    async def test_retries_walk_the_fallback_order(self, router):
+        """Each failed attempt moves on to the next provider instead of bouncing between the top two"""
+        stubs = [register(router, StubClient(provider, priority=priority)) for priority, provider in
+                 enumerate((AIProviderType.OPENAI, AIProviderType.ANTHROPIC, AIProviderType.GROQ), start=1)]
+
+        async def fail(request):
+            raise RuntimeError("provider error")
+
+        stubs[0].generate_response = stubs[1].generate_response = fail
+
+        response = await router.generate_response({"messages": []})
+        assert response.provider == AIProviderType.GROQ
+
+    def test_preference_and_analysis_routes(self, router):
+        """An available preferred provider wins, then the analysis route, then priority"""
+        register(router, StubClient(AIProviderType.OPENAI, priority=1))
+        register(router, StubClient(AIProviderType.OLLAMA, priority=5))
+        router.analysis_routes["sentiment"] = AIProviderType.OLLAMA
+
+        assert router._select_provider({"provider_preference": "ollama"}) == AIProviderType.OLLAMA
+        assert router._select_provider({"provider_preference": "groq"}) == AIProviderType.OPENAI
+        assert router._select_provider({"analysis_type": "sentiment"}) == AIProviderType.OLLAMA
+        assert router._select_provider({"analysis_type": "sentiment", "provider_preference": "openai"}) == "openai"
+        assert router._select_provider({"analysis_type": "general"}) == AIProviderType.OPENAI
+
+
+class TestDataclasses:
+    def test_hot_path_records_have_no_instance_dict(self):
+        """Responses and configs are slotted: no per-instance __dict__, unknown attributes are rejected"""
+        config = make_config(AIProviderType.OPENAI)
+        response = AIResponse(content="", model="m", provider="openai", usage={}, cost=0.0, latency=0.0,
+                              timestamp=datetime.now(timezone.utc))
+        for record in (config, response):
+            assert not hasattr(record, "__dict__")
+        with pytest.raises(AttributeError):
+            response.cached = True
@@ -0,0 +1,330 @@
+"""
+Tests for FileStorageService upload handling
+"""
+import hashlib
+import io
+import pytest
+import sys
+from pathlib import Path
+
+# Add backend to path
+backend_path = Path(__file__).parent.parent.parent
+if str(backend_path) not in sys.path:
+    sys.path.insert(0, str(backend_path))
+
+from fastapi import UploadFile, HTTPException
+from starlette.datastructures import Headers
+
+from services.file_storage_database import FileStorageDatabase
+from services.file_storage_service import FileStorageService, FileType
+
+
+def make_upload(content: bytes, filename: str = "notes.txt", content_type: str = "text/plain") -> UploadFile:
+    """Build an UploadFile backed by an in-memory buffer"""
+    return UploadFile(
+        file=io.BytesIO(content),
+        filename=filename,
+        headers=Headers({"content-type": content_type}),
+    )
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = FileStorageService(storage_root=str(tmp_path), max_file_size=1024 * 1024)
+    service.database = FileStorageDatabase()
+    return service
+
+
+class TestFileStorageServiceUpload:
+    @pytest.mark.asyncio
+    async def test_upload_stores_content_and_checksums(self, service):
+        """Uploaded bytes are written and both checksums recorded"""
+        content = b"hello catalyst" * 1000
+        metadata = await service.upload_file(make_upload(content), uploaded_by="user-1")
+
+        assert Path(metadata.storage_path).read_bytes() == content
+        assert metadata.size_bytes == len(content)
+        assert metadata.file_type == FileType.TEXT
+        assert metadata.checksum_md5 == hashlib.md5(content).hexdigest()
+        assert metadata.checksum_sha256 == hashlib.sha256(content).hexdigest()
+
+    @pytest.mark.asyncio
+    async def test_upload_rejects_empty_file(self, service):
+        """Empty uploads fail validation"""
+        with pytest.raises(HTTPException) as exc_info:
+            await service.upload_file(make_upload(b""), uploaded_by="user-1")
+        assert exc_info.value.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_concurrent_uploads_hash_independently(self, service):
+        """Uploads hashed concurrently on the shared pool keep their own digests"""
+        import asyncio
+        contents = [bytes([i]) * (256 * 1024 + i) for i in range(1, 6)]
+        results = await asyncio.gather(*[
+            service.upload_file(make_upload(content), uploaded_by="user-1")
+            for content in contents
+        ])
+
+        for content, metadata in zip(contents, results):
+            assert metadata.checksum_sha256 == hashlib.sha256(content).hexdigest()
+
+    @pytest.mark.asyncio
+    async def test_oversize_upload_of_unknown_size_is_rejected(self, service, tmp_path):
+        """Streaming enforces the size limit when it cannot be probed up front"""
+        upload = make_upload(b"x" * (service.max_file_size + 1))
+        upload.size = None
+        upload.file = NonSeekable(upload.file)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await service.upload_file(upload, uploaded_by="user-1")
+        assert exc_info.value.status_code == 400
+        assert not [p for p in tmp_path.rglob("*") if p.is_file()]
+
+    @pytest.mark.asyncio
+    async def test_validation_does_not_consume_upload(self, service):
+        """Validation probes the size without moving the read position"""
+        upload = make_upload(b"hello")
+        result = await service._validate_file(upload)
+
+        assert result.size_bytes == 5
+        assert upload.file.tell() == 0
+
+
+class NonSeekable:
+    """File wrapper exposing only read, like a raw request stream"""
+
+    def __init__(self, raw):
+        self._raw = raw
+
+    def read(self, size=-1):
+        return self._raw.read(size)
+
+
+class TestFileStorageServiceSpooledUpload:
+    @pytest.mark.asyncio
+    async def test_rolled_spool_copied_in_worker(self, service):
+        """Uploads already spilled to disk are copied and hashed intact"""
+        import tempfile
+        content = b"spooled" * 100_000
+        spool = tempfile.SpooledTemporaryFile(max_size=1024)
+        spool.write(content)
+        spool.seek(0)
+        assert spool._rolled
+        upload = UploadFile(file=spool, filename="big.txt", headers=Headers({"content-type": "text/plain"}))
+
+        metadata = await service.upload_file(upload, uploaded_by="user-1")
+
+        assert Path(metadata.storage_path).read_bytes() == content
+        assert metadata.size_bytes == len(content)
+        assert metadata.checksum_sha256 == hashlib.sha256(content).hexdigest()
+
+
+class TestFileStorageServiceDeduplication:
+    @pytest.mark.asyncio
+    async def test_identical_uploads_share_storage(self, service):
+        """A repeated upload is hard-linked and survives deleting the original"""
+        import os
+        content = b"same bytes" * 100
+        first = await service.upload_file(make_upload(content), uploaded_by="user-1")
+        second = await service.upload_file(make_upload(content), uploaded_by="user-1")
+
+        assert first.id != second.id
+        assert first.storage_path != second.storage_path
+        assert os.path.samefile(first.storage_path, second.storage_path)
+
+        await service.delete_file(first.id, "user-1")
+        assert Path(second.storage_path).read_bytes() == content
+
+
+class TestFileStorageServiceMetadataCache:
+    @pytest.mark.asyncio
+    async def test_repeated_lookups_served_from_cache(self, service, monkeypatch):
+        """Metadata and search pages are cached until a write invalidates them"""
+        metadata = await service.upload_file(make_upload(b"cached"), uploaded_by="user-1")
+        calls = []
+        original = service.database.get_file_metadata
+
+        async def counting_get(file_id):
+            calls.append(file_id)
+            return await original(file_id)
+
+        monkeypatch.setattr(service.database, "get_file_metadata", counting_get)
+        assert await service.get_file_metadata(metadata.id) is metadata
+        await service.get_file_content(metadata.id, "user-1")
+        assert calls == []
+
+        assert [f.id for f in await service.search_files(user_id="user-1")] == [metadata.id]
+        await service.delete_file(metadata.id, "user-1")
+        assert await service.get_file_metadata(metadata.id) is None
+        assert await service.search_files(user_id="user-1") == []
+
+
+class TestFileStorageServiceBufferPool:
+    @pytest.mark.asyncio
+    async def test_chunk_buffers_are_reused(self, service):
+        """Copy workers return their chunk buffers to the shared pool"""
+        import services.file_storage_service as module
+        await service.upload_file(make_upload(b"first"), uploaded_by="user-1")
+        buffer = module._BUFFER_POOL.get_nowait()
+        module._BUFFER_POOL.put_nowait(buffer)
+
+        await service.upload_file(make_upload(b"second"), uploaded_by="user-1")
+        assert module._BUFFER_POOL.get_nowait() is buffer
+
+
+class TestFileStorageServiceStoragePath:
+    def test_directory_created_once(self, service, monkeypatch):
+        """Repeated paths in the same directory only mkdir the first time"""
+        from datetime import datetime, timezone
+        timestamp = datetime(2024, 5, 1, tzinfo=timezone.utc)
+        first = service._get_storage_path(FileType.TEXT, "a.txt", timestamp)
+        assert Path(first).parent.is_dir()
+        assert Path(first).parent.as_posix().endswith("uploads/text/2024/05/01")
+
+        def fail_makedirs(*args, **kwargs):
+            raise AssertionError("makedirs called for a known directory")
+
+        monkeypatch.setattr("os.makedirs", fail_makedirs)
+        second = service._get_storage_path(FileType.TEXT, "b.txt", timestamp)
+        assert Path(second).parent == Path(first).parent
+
+
+class TestFileStorageServiceValidation:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("filename,expected", [
+        ("WhatsApp Chat Export.zip", FileType.CHAT_EXPORT),
+        ("CHATS.zip", FileType.CHAT_EXPORT),
+        ("photos.zip", FileType.ARCHIVE),
+        ("chat.txt", FileType.TEXT),
+    ])
+    async def test_chat_exports_detected_by_name(self, service, filename, expected):
+        """Zip files named like chats are classified as chat exports"""
+        content_type = "application/zip" if filename.endswith(".zip") else "text/plain"
+        result = await service._validate_file(make_upload(b"data", filename, content_type))
+
+        assert result.is_valid
+        assert result.file_type == expected
+
+
+class TestFileStorageServiceBlake3:
+    @pytest.mark.asyncio
+    async def test_blake3_digest_stored_when_enabled(self, tmp_path):
+        """With BLAKE3 enabled the content checksum is a BLAKE3 digest"""
+        blake3 = pytest.importorskip("blake3")
+        service = FileStorageService(storage_root=str(tmp_path), max_file_size=1024 * 1024, use_blake3=True)
+        service.database = FileStorageDatabase()
+        content = b"blake3 content" * 100
+
+        metadata = await service.upload_file(make_upload(content), uploaded_by="user-1")
+
+        assert metadata.content_hash == blake3.blake3(content).hexdigest()
+        assert metadata.hash_algorithm == "blake3"
+        assert metadata.checksum_sha256 is None
+        assert metadata.checksum_md5 == hashlib.md5(content).hexdigest()
+
+    @pytest.mark.asyncio
+    async def test_dedupe_stays_within_one_algorithm(self, tmp_path):
+        """SHA-256 and BLAKE3 uploads of the same bytes are not matched against each other"""
+        import os
+        pytest.importorskip("blake3")
+        database = FileStorageDatabase()
+        services = []
+        for use_blake3 in (False, True, True):
+            service = FileStorageService(storage_root=str(tmp_path), max_file_size=1024 * 1024, use_blake3=use_blake3)
+            service.database = database
+            services.append(service)
+        content = b"shared content" * 100
+
+        sha256_file, blake3_file, blake3_copy = [
+            await service.upload_file(make_upload(content), uploaded_by="user-1") for service in services
+        ]
+
+        assert sha256_file.checksum_sha256 == sha256_file.content_hash == hashlib.sha256(content).hexdigest()
+        assert not os.path.samefile(sha256_file.storage_path, blake3_file.storage_path)
+        assert os.path.samefile(blake3_file.storage_path, blake3_copy.storage_path)
+
+
+class TestFileStorageServiceContentLength:
+    @pytest.mark.asyncio
+    async def test_oversized_content_length_rejected_before_reading(self, service):
+        """A declared body far above the limit is refused with 413 unread"""
+        from unittest.mock import MagicMock
+        upload = make_upload(b"small")
+        request = MagicMock(headers={"content-length": str(service.max_file_size * 2)})
+
+        with pytest.raises(HTTPException) as exc_info:
+            await service.upload_file(upload, uploaded_by="user-1", request=request)
+        assert exc_info.value.status_code == 413
+        assert upload.file.tell() == 0
+
+        request.headers = {"content-length": "300"}
+        metadata = await service.upload_file(upload, uploaded_by="user-1", request=request)
+        assert metadata.size_bytes == 5
+
+
+class TestFileStorageServiceMetadataBatching:
+    @pytest.mark.asyncio
+    async def test_concurrent_uploads_saved_in_one_batch(self, service, monkeypatch):
+        """Metadata from concurrent uploads reaches the database together"""
+        import asyncio
+        batches = []
+        original = service.database.save_many
+
+        async def recording_save_many(items):
+            batches.append([m.id for m in items])
+            return await original(items)
+
+        monkeypatch.setattr(service.database, "save_many", recording_save_many)
+        monkeypatch.setattr(service._metadata_batcher, "_max_delay", 0.5)
+        results = await asyncio.gather(*[
+            service.upload_file(make_upload(f"file {i}".encode()), uploaded_by="user-1")
+            for i in range(4)
+        ])
+
+        assert [len(batch) for batch in batches] == [4]
+        assert {f.id for f in await service.list_user_files("user-1")} == {m.id for m in results}
+
+    @pytest.mark.asyncio
+    async def test_batch_failure_reaches_every_caller(self, service, monkeypatch):
+        """A failed batch write fails each waiting save"""
+        async def failing_save_many(items):
+            raise RuntimeError("database down")
+
+        monkeypatch.setattr(service.database, "save_many", failing_save_many)
+        with pytest.raises(HTTPException) as exc_info:
+            await service.upload_file(make_upload(b"data"), uploaded_by="user-1")
+        assert exc_info.value.status_code == 500
+
+
+    @pytest.mark.asyncio
+    async def test_scheduled_flush_task_is_held_until_done(self, service, monkeypatch):
+        """The batcher keeps a reference to its scheduled flush task while it runs"""
+        import asyncio
+        batcher = service._metadata_batcher
+        release = asyncio.Event()
+        original = service.database.save_many
+
+        async def blocking_save_many(items):
+            await release.wait()
+            return await original(items)
+
+        monkeypatch.setattr(service.database, "save_many", blocking_save_many)
+        upload = asyncio.create_task(service.upload_file(make_upload(b"data"), uploaded_by="user-1"))
+        while not batcher._flush_tasks:
+            await asyncio.sleep(0.001)
+
+        assert len(batcher._flush_tasks) == 1
+        release.set()
+        saved = await upload
+        await asyncio.sleep(0)
+        assert batcher._flush_tasks == set()
+        assert await service.get_file_metadata(saved.id) is not None
+
+class TestFileExtension:
+    @pytest.mark.parametrize("filename", [
+        "notes.TXT", "archive.tar.gz", "no_extension", ".hidden", "trailing.", "dir/file.Pdf", "dir.v2/file", "a.b/",
+    ])
+    def test_matches_pathlib_suffix(self, filename):
+        """The string-based extension helper agrees with pathlib"""
+        from services.file_storage_service import _file_extension
+        assert _file_extension(filename) == Path(filename).suffix.lower()
@@ -0,0 +1,130 @@
+"""
+Tests for KnowledgeBaseAIIntegration enrichment and context building
+"""
+import pytest
+import sys
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+# Add backend to path
+backend_path = Path(__file__).parent.parent.parent
+if str(backend_path) not in sys.path:
+    sys.path.insert(0, str(backend_path))
+
+try:
+    from services.kb_ai_integration import KnowledgeBaseAIIntegration
+    from services.vector_search import SearchResult
+except ImportError as e:
+    pytest.skip(f"Import error: {e}", allow_module_level=True)
+
+
+def make_result(document_id: str, content: str) -> SearchResult:
+    """Build a SearchResult with the given content"""
+    return SearchResult(
+        document_id=document_id,
+        content=content,
+        metadata={"title": document_id},
+        similarity_score=0.9
+    )
+
+
+@pytest.fixture
+def kb_service():
+    return MagicMock(search_knowledge_base=AsyncMock())
+
+
+@pytest.fixture
+def ai_service():
+    service = MagicMock()
+    service.generate_summary = AsyncMock(side_effect=lambda content: f"summary of {content}")
+    service.analyze_text = AsyncMock(return_value={"sentiment": "positive"})
+    service.generate_response = AsyncMock(return_value="answer")
+    return service
+
+
+@pytest.fixture
+def integration(kb_service, ai_service):
+    return KnowledgeBaseAIIntegration(kb_service=kb_service, ai_service=ai_service)
+
+
+class TestSemanticSearchEnrichment:
+    @pytest.mark.asyncio
+    async def test_results_converted_and_enriched(self, integration, kb_service):
+        """Each result keeps its fields and gains the requested enrichments"""
+        kb_service.search_knowledge_base.return_value = [make_result("a", "alpha"), make_result("b", "")]
+
+        results = await integration.semantic_search_with_ai_enrichment(
+            "query", enrich_with=["summary", "sentiment"]
+        )
+
+        assert results[0]["document_id"] == "a"
+        assert results[0]["similarity_score"] == 0.9
+        assert results[0]["ai_summary"] == "summary of alpha"
+        assert results[0]["ai_sentiment"] == {"sentiment": "positive"}
+        assert "ai_summary" not in results[1]
+
+    @pytest.mark.asyncio
+    async def test_enrichments_run_concurrently_and_isolate_errors(self, integration, kb_service, ai_service):
+        """All enrichment calls overlap and one failure does not affect others"""
+        import asyncio
+        in_flight = 0
+        peak = 0
+
+        async def slow_summary(content):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            if content == "bad":
+                raise RuntimeError("model down")
+            return f"summary of {content}"
+
+        ai_service.generate_summary.side_effect = slow_summary
+        kb_service.search_knowledge_base.return_value = [
+            make_result("a", "alpha"), make_result("b", "bad"), make_result("c", "gamma")
+        ]
+
+        results = await integration.semantic_search_with_ai_enrichment("query")
+
+        assert peak == 3
+        assert [r["ai_summary"] for r in results] == [
+            "summary of alpha", "Summary unavailable", "summary of gamma"
+        ]
+
+
+class TestAIResultCache:
+    @pytest.mark.asyncio
+    async def test_repeated_content_reuses_ai_result(self, integration, kb_service, ai_service):
+        """The same content is summarized once across searches; failures are retried"""
+        kb_service.search_knowledge_base.return_value = [make_result("a", "alpha")]
+
+        await integration.semantic_search_with_ai_enrichment("first")
+        results = await integration.semantic_search_with_ai_enrichment("second")
+
+        assert results[0]["ai_summary"] == "summary of alpha"
+        assert ai_service.generate_summary.await_count == 1
+
+        ai_service.analyze_text.side_effect = [RuntimeError("down"), {"sentiment": "neutral"}]
+        first = await integration.semantic_search_with_ai_enrichment("q", enrich_with=["sentiment"])
+        second = await integration.semantic_search_with_ai_enrichment("q", enrich_with=["sentiment"])
+        assert first[0]["ai_sentiment"]["status"] == "error"
+        assert second[0]["ai_sentiment"] == {"sentiment": "neutral"}
+
+
+class TestAnswerWithKnowledgeContext:
+    @pytest.mark.asyncio
+    async def test_context_joined_and_bounded(self, integration, kb_service, ai_service, monkeypatch):
+        """Result contents are joined in order and stop at the context limit"""
+        import services.kb_ai_integration as module
+        monkeypatch.setattr(module, "_MAX_KB_CONTEXT_CHARS", 12)
+        kb_service.search_knowledge_base.return_value = [
+            make_result("a", "alpha"), make_result("b", ""), make_result("c", "gamma"), make_result("d", "delta")
+        ]
+
+        response = await integration.answer_with_knowledge_context("question")
+
+        context = ai_service.generate_response.await_args.kwargs["context"]
+        assert context == "alpha\n\ngamma\n\n"
+        assert len(response["sources"]) == 2
+        assert response["kb_results_count"] == 4
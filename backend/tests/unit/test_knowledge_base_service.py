@@ -0,0 +1,854 @@
+"""
+Tests for KnowledgeBaseService document ingestion and persistence
+"""
+import asyncio
+import hashlib
+import numpy as np
+import orjson
+import pytest
+import pytest_asyncio
+import re
+import sys
+import threading
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Add backend to path
+backend_path = Path(__file__).parent.parent.parent
+if str(backend_path) not in sys.path:
+    sys.path.insert(0, str(backend_path))
+
+import services.knowledge_base as knowledge_base
+from services.knowledge_base import (
+    DocumentType, KnowledgeBaseService, KnowledgeDocument, ProcessingStatus, SearchFilters
+)
+from services.vector_search import SearchResult
+
+
+class FakeVectorService:
+    """Records indexing calls instead of embedding anything"""
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 0):
+        self.config = {"chunk_size": chunk_size, "chunk_overlap": chunk_overlap}
+        self.indexed = {}
+        self.searches = []
+        self.cloned = []
+        self.index_calls = 0
+
+    async def index_chunks(self, document_id, chunks, metadata=None):
+        self.index_calls += 1
+        self.indexed[document_id] = " ".join(chunk.content for chunk in chunks)
+        return True
+
+    async def clone_vectors(self, source_document_id, target_document_id, metadata=None):
+        if source_document_id not in self.indexed:
+            return False
+        self.cloned.append((source_document_id, target_document_id))
+        self.indexed[target_document_id] = self.indexed[source_document_id]
+        return True
+
+    async def delete_document(self, document_id):
+        self.indexed.pop(document_id, None)
+        return True
+
+    async def generate_embedding(self, text):
+        # Bag of words over a few hashed buckets; punctuation and case are ignored
+        vector = [0.0] * 16
+        for word in re.findall(r"[a-z]+", text.lower()):
+            vector[zlib.crc32(word.encode()) % 16] += 1.0
+        return vector
+
+    async def search(self, query, limit=10, min_similarity=0.3, filters=None, query_embedding=None):
+        self.searches.append(query)
+        return [SearchResult(document_id="doc", content=query, metadata={}, similarity_score=0.9)]
+
+    async def get_document_count(self):
+        return len(self.indexed)
+
+    async def health_check(self):
+        return {"service": "vector_search", "status": "healthy", "errors": []}
+
+
+@pytest.fixture
+def vector_service():
+    return FakeVectorService()
+
+
+@pytest.fixture
+def kb(tmp_path, vector_service):
+    return KnowledgeBaseService(storage_path=str(tmp_path / "kb"), vector_service=vector_service)
+
+
+class TestSourceHash:
+    @pytest.mark.asyncio
+    async def test_file_path_copied_and_hashed_in_one_pass(self, kb, tmp_path):
+        """A file added by path is copied intact and hashed like its bytes"""
+        source = tmp_path / "guide.txt"
+        data = b"How to listen well. " * 500
+        source.write_bytes(data)
+
+        doc_id = await kb.add_document(title="Listening", file_path=str(source))
+        document = await kb.get_document(doc_id)
+
+        assert Path(document.file_path).read_bytes() == data
+        assert document.source_hash == knowledge_base._source_hash(data)
+        assert len(document.source_hash) == 32
+
+    @pytest.mark.asyncio
+    async def test_same_content_same_hash_across_sources(self, kb):
+        """Direct content and uploaded bytes of the same text hash the same"""
+        text = "Trust is built slowly."
+        direct = await kb.get_document(await kb.add_document(title="a", content=text))
+        uploaded = await kb.get_document(await kb.add_document(title="b.txt", file_data=text.encode()))
+
+        assert direct.source_hash == uploaded.source_hash
+
+    def test_md5_fallback(self, monkeypatch):
+        """Without blake3 the hash falls back to MD5"""
+        monkeypatch.setattr(knowledge_base, "BLAKE3_AVAILABLE", False)
+        assert knowledge_base._source_hash(b"abc") == hashlib.md5(b"abc").hexdigest()
+
+
+    @pytest.mark.parametrize("use_blake3", [True, False])
+    def test_document_id_is_16_hex_chars(self, kb, monkeypatch, use_blake3):
+        """Document IDs keep their format whichever hash backs them"""
+        if use_blake3 and not knowledge_base.BLAKE3_AVAILABLE:
+            pytest.skip("blake3 not installed")
+        monkeypatch.setattr(knowledge_base, "BLAKE3_AVAILABLE", use_blake3)
+        doc_id = kb._generate_document_id("Title", "Some long content " * 1000)
+        assert re.fullmatch(r"[0-9a-f]{16}", doc_id)
+
+class TestChunking:
+    def test_chunks_are_sentence_aligned_slices(self, tmp_path):
+        """Chunks cut at sentence ends, stay within size and cover the text"""
+        kb = KnowledgeBaseService(storage_path=str(tmp_path / "kb"), vector_service=FakeVectorService(chunk_size=50))
+        content = " ".join(f"Sentence number {i} is here." for i in range(20)) + " Trailing words"
+
+        chunks = kb._chunk_document(content)
+
+        assert len(chunks) > 1
+        assert all(chunk.total_chunks == len(chunks) for chunk in chunks)
+        assert [chunk.chunk_index for chunk in chunks] == list(range(len(chunks)))
+        for chunk in chunks:
+            assert chunk.content == content[chunk.start_char:chunk.end_char].strip()
+            assert chunk.end_char - chunk.start_char <= 50
+        assert chunks[0].start_char == 0
+        assert chunks[-1].end_char == len(content)
+        assert all(a.end_char == b.start_char for a, b in zip(chunks, chunks[1:]))
+        assert chunks[0].content.endswith(".")
+
+    def test_chunks_overlap_within_size(self, tmp_path):
+        """Neighbouring chunks share up to chunk_overlap characters and stay within size"""
+        kb = KnowledgeBaseService(storage_path=str(tmp_path / "kb"),
+                                  vector_service=FakeVectorService(chunk_size=60, chunk_overlap=15))
+        content = " ".join(f"Sentence number {i} is here." for i in range(20))
+
+        chunks = kb._chunk_document(content)
+
+        assert len(chunks) > 1
+        for a, b in zip(chunks, chunks[1:]):
+            assert 0 < a.end_char - b.start_char <= 15
+        assert all(chunk.end_char - chunk.start_char <= 60 for chunk in chunks)
+        assert all(content[chunk.start_char - 1] == " " for chunk in chunks[1:])
+
+    def test_long_unpunctuated_text_is_split(self, tmp_path):
+        """Text without sentence ends is hard-split at word boundaries, overlapping"""
+        kb = KnowledgeBaseService(storage_path=str(tmp_path / "kb"),
+                                  vector_service=FakeVectorService(chunk_size=1000, chunk_overlap=200))
+        content = "word " * 2000
+
+        chunks = kb._chunk_document(content)
+
+        assert len(chunks) >= 10
+        assert all(chunk.end_char - chunk.start_char <= 1000 for chunk in chunks)
+        assert all(chunk.content.split() == ["word"] * len(chunk.content.split()) for chunk in chunks)
+        assert all(0 < a.end_char - b.start_char <= 200 for a, b in zip(chunks, chunks[1:]))
+        assert chunks[0].start_char == 0
+        assert chunks[-1].end_char == len(content)
+
+    def test_short_content_is_single_chunk(self, kb):
+        """Content within the chunk size is returned whole"""
+        chunks = kb._chunk_document("Short text.")
+        assert [(c.content, c.start_char, c.end_char) for c in chunks] == [("Short text.", 0, 11)]
+
+
+    @pytest.mark.parametrize("content", [
+        "One. Two!! Three?! Four... " * 40,
+        "No terminators at all " * 50,
+        "Ünïcödé sentence, ok. " * 30 + "trailing words without an end",
+        "x" * 120 + ". " + "y" * 10 + "?",
+        "",
+    ])
+    def test_kernel_matches_regex_bounds(self, content):
+        """The Numba kernel cuts chunks exactly where the regex walk does"""
+        codes = knowledge_base._code_points(content)
+        kernel = knowledge_base._chunk_bounds_kernel(codes, 100).tolist()
+        assert [tuple(b) for b in kernel] == knowledge_base._chunk_bounds(content, 100)
+
+class TestMetadataPersistence:
+    @pytest.mark.asyncio
+    async def test_changes_coalesced_into_one_write(self, kb, monkeypatch):
+        """A burst of document changes is written once when flushed"""
+        writes = []
+        original = kb._save_metadata
+        monkeypatch.setattr(kb, "_save_metadata", lambda: (writes.append(1), original()))
+
+        for i in range(5):
+            await kb.add_document(title=f"doc {i}", content=f"Body {i}.")
+        assert writes == []
+
+        kb.flush_metadata()
+        assert writes == [1]
+
+    @pytest.mark.asyncio
+    async def test_delayed_write_runs_off_event_loop(self, kb, monkeypatch):
+        """The debounced write happens on the metadata writer thread"""
+        monkeypatch.setattr(knowledge_base, "_METADATA_FLUSH_DELAY", 0.01)
+        threads = []
+        original = kb._write_metadata
+        monkeypatch.setattr(kb, "_write_metadata", lambda *args: (threads.append(threading.current_thread().name), original(*args)))
+
+        doc_id = await kb.add_document(title="Guide", content="How to build trust.")
+        await asyncio.sleep(0.1)
+        kb.flush_metadata()
+
+        assert threads and all(name.startswith("kb-metadata") for name in threads)
+        assert [stored_id for stored_id, _ in kb._iter_stored_documents()] == [doc_id]
+
+    @pytest.mark.asyncio
+    async def test_close_writes_pending_changes(self, kb, tmp_path, vector_service):
+        """Closing the service persists changes still waiting for the debounced flush"""
+        doc_id = await kb.add_document(title="Guide", content="How to build trust.")
+        assert kb._metadata_flush_handle is not None
+
+        await kb.close()
+        assert kb._metadata_flush_handle is None
+
+        reloaded = KnowledgeBaseService(storage_path=str(tmp_path / "kb"), vector_service=vector_service)
+        assert list(reloaded.documents) == [doc_id]
+
+    @pytest.mark.asyncio
+    async def test_close_shuts_down_extraction_pool(self, kb):
+        """Closing the service stops the extraction workers; later use starts a new pool"""
+        pool = knowledge_base._extract_pool()
+
+        await kb.close()
+
+        assert knowledge_base._EXTRACT_POOL is None
+        with pytest.raises(RuntimeError):
+            pool.submit(len, "text")
+        new_pool = knowledge_base._extract_pool()
+        assert new_pool is not pool
+        knowledge_base._shutdown_extract_pool()
+
+    @pytest.mark.asyncio
+    async def test_metadata_round_trips(self, kb, tmp_path, vector_service):
+        """Flushed metadata reloads with enums and datetimes restored"""
+        doc_id = await kb.add_document(title="Guide", content="How to build trust.")
+        kb.flush_metadata()
+
+        reloaded = KnowledgeBaseService(storage_path=str(tmp_path / "kb"), vector_service=vector_service)
+        original = await kb.get_document(doc_id)
+        restored = await reloaded.get_document(doc_id)
+        assert restored == original
+        assert type(restored.status) is ProcessingStatus
+        assert type(restored.document_type) is DocumentType
+        assert restored.created_at.tzinfo is not None
+
+    @pytest.mark.parametrize("use_msgspec", [True, False])
+    def test_rows_decode_with_either_decoder(self, tmp_path, vector_service, monkeypatch, use_msgspec):
+        """Stored rows decode to the same document with or without msgspec"""
+        if use_msgspec and knowledge_base._DOCUMENT_DECODER is None:
+            pytest.skip("msgspec not installed")
+        if not use_msgspec:
+            monkeypatch.setattr(knowledge_base, "_DOCUMENT_DECODER", None)
+        document = KnowledgeDocument(
+            id="doc", title="Guide", content=None, document_type=DocumentType.GUIDANCE,
+            tags=["trust"], metadata={"source": "test"},
+            created_at=datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+            status=ProcessingStatus.INDEXED, chunk_count=2,
+        )
+        service = KnowledgeBaseService(storage_path=str(tmp_path / "kb"), vector_service=vector_service)
+        service._upsert_documents([document])
+
+        [(_, restored)] = list(service._iter_stored_documents())
+        assert restored == document
+        assert type(restored.document_type) is DocumentType
+
+    @pytest.mark.asyncio
+    async def test_delete_removes_stored_row(self, kb):
+        """Deleting a document removes its row on the next flush"""
+        keep = await kb.add_document(title="Keep", content="Stays.")
+        drop = await kb.add_document(title="Drop", content="Goes.")
+        kb.flush_metadata()
+
+        await kb.delete_document(drop)
+        kb.flush_metadata()
+
+        assert [doc_id for doc_id, _ in kb._iter_stored_documents()] == [keep]
+
+    def test_legacy_json_is_migrated(self, tmp_path, vector_service):
+        """An existing metadata.json is imported into the database once"""
+        storage = tmp_path / "kb"
+        storage.mkdir()
+        legacy = KnowledgeDocument(
+            id="legacy", title="Old", content="Old body.", document_type=DocumentType.FAQ,
+            created_at=datetime(2024, 1, 2, tzinfo=timezone.utc),
+        )
+        (storage / "metadata.json").write_bytes(orjson.dumps({"legacy": legacy}))
+
+        service = KnowledgeBaseService(storage_path=str(storage), vector_service=vector_service)
+        assert service.documents["legacy"] == legacy
+        assert not (storage / "metadata.json").exists()
+
+        reloaded = KnowledgeBaseService(storage_path=str(storage), vector_service=vector_service)
+        assert reloaded.documents["legacy"] == legacy
+
+
+class TestAutoClassification:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("title, content, expected", [
+        ("Notes", "A tutorial on listening", DocumentType.GUIDANCE),
+        ("Notes", "A research study with one example", DocumentType.CASE_STUDY),
+        ("Notes", "Background information", DocumentType.TEMPLATE),
+        ("FAQ", "Common questions", DocumentType.FAQ),
+        ("Notes", "Nothing in particular", DocumentType.OTHER),
+    ])
+    async def test_categorize_follows_keyword_precedence(self, kb, title, content, expected):
+        """The highest-precedence category with a substring hit wins"""
+        assert await kb._auto_categorize(content, title) == expected
+
+    @pytest.mark.asyncio
+    async def test_tags_include_overlapping_keywords(self, kb):
+        """Keywords found inside other words and mapped aliases are all tagged"""
+        tags = await kb._auto_tag("Trust and Communication in a case study", "Tutorial")
+        assert tags == ["communication", "trust", "guide", "example", "research"]
+
+    @pytest.mark.parametrize("backend", ["regex", "ahocorasick", "hyperscan"])
+    def test_scanner_reports_overlapping_keywords(self, backend):
+        """Keywords sharing characters in the text are each reported"""
+        if backend != "regex":
+            pytest.importorskip(backend)
+        scanner = knowledge_base._KeywordScanner(["case", "case study", "study", "form", "format"], backend=backend)
+        assert scanner.find("a case study format") == {"case", "case study", "study", "form", "format"}
+        assert scanner.find("nothing here") == set()
+
+
+class TestBulkIngestion:
+    @pytest.mark.asyncio
+    async def test_bulk_add_returns_ids_in_order(self, kb):
+        """Documents added in bulk are all stored, with IDs in input order"""
+        items = [{"title": f"doc {i}", "content": f"Body number {i}."} for i in range(4)]
+        items.append({"title": "empty"})
+
+        ids = await kb.add_documents_bulk(items)
+
+        assert ids[-1] is None
+        assert [kb.documents[doc_id].title for doc_id in ids[:-1]] == [f"doc {i}" for i in range(4)]
+
+    @pytest.mark.asyncio
+    async def test_docx_extracted_in_worker_process(self, kb, tmp_path):
+        """DOCX text is extracted through the process pool"""
+        docx = pytest.importorskip("docx")
+        path = tmp_path / "notes.docx"
+        document = docx.Document()
+        document.add_paragraph("First paragraph")
+        document.add_paragraph("")
+        document.add_paragraph("Second paragraph")
+        document.save(path)
+
+        assert await kb._extract_docx_content(path) == "First paragraph\n\nSecond paragraph"
+
+    def test_pdf_pages_joined_skipping_blank(self, monkeypatch):
+        """Non-blank page texts are joined with blank lines between them"""
+        monkeypatch.setattr(knowledge_base, "_iter_pdf_page_text", lambda path: iter(["one", " \n", "two", "three"]))
+        assert knowledge_base._pdf_extract_sync("doc.pdf") == "one\n\ntwo\n\nthree"
+
+
+class TestQueryCache:
+    @pytest.mark.asyncio
+    async def test_near_duplicate_query_skips_vector_search(self, kb, vector_service):
+        """A query differing only in case and punctuation is served from cache"""
+        first = await kb.search_knowledge_base("How to build trust")
+        second = await kb.search_knowledge_base("how to build trust?")
+
+        assert vector_service.searches == ["How to build trust"]
+        assert second == first
+
+    @pytest.mark.asyncio
+    async def test_cache_namespaced_by_search_parameters(self, kb, vector_service):
+        """The same query with different filters or limits searches again"""
+        await kb.search_knowledge_base("trust")
+        await kb.search_knowledge_base("trust", filters=SearchFilters(document_types=["faq"]))
+        await kb.search_knowledge_base("trust", limit=3)
+        await kb.search_knowledge_base("conflict")
+
+        assert vector_service.searches == ["trust", "trust", "trust", "conflict"]
+
+    @pytest.mark.asyncio
+    async def test_document_changes_invalidate_cache(self, kb, vector_service):
+        """Adding a document drops cached results"""
+        await kb.search_knowledge_base("trust")
+        await kb.add_document(title="New", content="Fresh content.")
+        await kb.search_knowledge_base("trust")
+
+        assert vector_service.searches == ["trust", "trust"]
+
+    @pytest.mark.parametrize("use_lsh", [False, True])
+    def test_least_recently_used_entry_evicted(self, use_lsh):
+        """The cache holds max_size queries and evicts the stalest"""
+        cache = knowledge_base._SemanticQueryCache(max_size=2, threshold=0.95, use_lsh=use_lsh)
+        cache.put("ns", [1.0, 0.0, 0.0], ["a"])
+        cache.put("ns", [0.0, 1.0, 0.0], ["b"])
+        assert cache.get("ns", [1.0, 0.0, 0.0]) == ["a"]
+
+        cache.put("ns", [0.0, 0.0, 1.0], ["c"])
+
+        assert cache.get("ns", [0.0, 1.0, 0.0]) is None
+        assert cache.get("ns", [2.0, 0.0, 0.0]) == ["a"]
+        assert cache.get("other", [2.0, 0.0, 0.0]) is None
+
+
+class TestScannedPdf:
+    @pytest.fixture
+    def scanned_pdf(self, monkeypatch):
+        """Two pages without a text layer whose images OCR to known text"""
+        Image = pytest.importorskip("PIL.Image")
+        pytesseract = pytest.importorskip("pytesseract")
+        monkeypatch.setattr(knowledge_base, "_iter_pdf_page_text", lambda path: iter(["", " "]))
+        monkeypatch.setattr(
+            knowledge_base, "_iter_pdf_page_images",
+            lambda path: iter([Image.new("L", (4, 4)), Image.new("L", (4, 4))])
+        )
+        pages = iter(["Page one", "Page two"])
+        monkeypatch.setattr(pytesseract, "image_to_string", lambda image: next(pages))
+
+    def test_scanned_pages_are_ocred(self, scanned_pdf):
+        """PDFs without a text layer fall back to OCR of their page images"""
+        assert knowledge_base._pdf_extract_sync("scan.pdf", ocr=True) == "Page one\n\nPage two"
+
+    def test_ocr_skipped_when_disabled(self, scanned_pdf):
+        """Without OCR the (empty) text layer is returned"""
+        assert knowledge_base._pdf_extract_sync("scan.pdf") == ""
+
+
+class TestHtmlExtraction:
+    def test_fallback_strips_tags(self, monkeypatch):
+        """Without selectolax, tags are stripped with a regex"""
+        monkeypatch.setattr(knowledge_base, "SELECTOLAX_AVAILABLE", False)
+        assert knowledge_base._html_to_text("<p>Hello <b>there</b></p>\n") == "Hello there"
+
+    def test_selectolax_skips_scripts(self):
+        """The HTML parser drops script and style contents"""
+        if not knowledge_base.SELECTOLAX_AVAILABLE:
+            pytest.skip("selectolax not installed")
+        html = "<html><head><style>p {}</style></head><body><p>Hello</p><script>x()</script><p>there</p></body></html>"
+        assert knowledge_base._html_to_text(html) == "Hello there"
+
+
+class TestContentOffload:
+    @pytest.mark.asyncio
+    async def test_indexed_content_moves_to_disk(self, kb):
+        """Indexed documents keep no text in memory or in metadata"""
+        doc_id = await kb.add_document(title="Trust", content="Trust is earned.")
+        kb.flush_metadata()
+
+        assert kb.documents[doc_id].content is None
+        assert kb._content_path(doc_id).read_text(encoding="utf-8") == "Trust is earned."
+        [(_, stored)] = list(kb._iter_stored_documents())
+        assert stored.content is None
+
+    @pytest.mark.asyncio
+    async def test_get_document_loads_content(self, kb):
+        """Callers of get_document still see the full text"""
+        doc_id = await kb.add_document(title="Trust", content="Trust is earned.")
+        document = await kb.get_document(doc_id)
+        assert document.content == "Trust is earned."
+        assert kb.documents[doc_id].content is None
+
+    @pytest.mark.asyncio
+    async def test_update_and_delete_keep_disk_in_sync(self, kb, vector_service):
+        """Changed content is re-indexed and rewritten; deletes remove the file"""
+        doc_id = await kb.add_document(title="Trust", content="Trust is earned.")
+        assert await kb.update_document(doc_id, content="Trust is earned.")
+        assert await kb.update_document(doc_id, content="Trust is rebuilt.")
+
+        assert vector_service.indexed[doc_id] == "Trust is rebuilt."
+        assert (await kb.get_document(doc_id)).content == "Trust is rebuilt."
+
+        await kb.delete_document(doc_id)
+        assert not kb._content_path(doc_id).exists()
+
+
+class TestSupportedTypes:
+    @pytest.mark.asyncio
+    async def test_unsupported_upload_rejected(self, kb):
+        """Uploads whose type is not in the supported set are not stored"""
+        assert isinstance(kb.config["supported_types"], frozenset)
+        assert await kb.add_document(title="tool.exe", file_data=b"MZ\x90\x00") is None
+        assert await kb.add_document(title="notes.md", file_data=b"# Notes\nTrust.") is not None
+
+
+class TestVectorReuse:
+    @pytest.mark.asyncio
+    async def test_identical_content_reuses_vectors(self, kb, vector_service):
+        """A second document with the same content copies the first one's vectors"""
+        first = await kb.add_document(title="Original", content="Trust is earned.")
+        second = await kb.add_document(title="Copy", content="Trust is earned.")
+
+        assert vector_service.index_calls == 1
+        assert vector_service.cloned == [(first, second)]
+        assert kb.documents[second].status == ProcessingStatus.INDEXED
+
+    @pytest.mark.asyncio
+    async def test_reprocessing_unchanged_document_refreshes_in_place(self, kb, vector_service):
+        """Re-processing without a content change does not re-embed"""
+        doc_id = await kb.add_document(title="Guide", content="Trust is earned.")
+        await kb.process_document(doc_id)
+
+        assert vector_service.index_calls == 1
+        assert vector_service.cloned == [(doc_id, doc_id)]
+
+    @pytest.mark.asyncio
+    async def test_changed_content_is_embedded(self, kb, vector_service):
+        """Updated content gets a new source hash and is embedded again"""
+        doc_id = await kb.add_document(title="Guide", content="Trust is earned.")
+        await kb.update_document(doc_id, content="Trust is rebuilt.")
+
+        assert vector_service.index_calls == 2
+        assert vector_service.cloned == []
+        assert kb.documents[doc_id].source_hash == knowledge_base._source_hash(b"Trust is rebuilt.")
+
+    @pytest.mark.asyncio
+    async def test_source_table_rebuilt_on_load(self, kb, tmp_path, vector_service):
+        """Indexed documents are reusable after a restart"""
+        first = await kb.add_document(title="Original", content="Trust is earned.")
+        kb.flush_metadata()
+
+        reloaded = KnowledgeBaseService(storage_path=str(tmp_path / "kb"), vector_service=vector_service)
+        second = await reloaded.add_document(title="Copy", content="Trust is earned.")
+
+        assert vector_service.cloned == [(first, second)]
+
+
+class TestQueryCacheLsh:
+    def test_lsh_finds_near_duplicates_among_many(self):
+        """With LSH on, perturbed copies of cached queries are still hits"""
+        rng = np.random.default_rng(7)
+        vectors = rng.standard_normal((500, 64))
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        cache = knowledge_base._SemanticQueryCache(max_size=500, threshold=0.95, use_lsh=True)
+        for i, vector in enumerate(vectors):
+            cache.put("ns", vector, [i])
+
+        for i in range(0, 500, 10):
+            noise = rng.standard_normal(64)
+            noise -= noise @ vectors[i] * vectors[i]
+            noise /= np.linalg.norm(noise)
+            query = 0.98 * vectors[i] + np.sqrt(1 - 0.98 ** 2) * noise
+            assert cache.get("ns", query) == [i]
+        assert cache.get("ns", rng.standard_normal(64)) is None
+
+    def test_large_caches_enable_lsh(self):
+        """LSH is only used once the cache is big enough to benefit"""
+        assert not knowledge_base._SemanticQueryCache(max_size=1024, threshold=0.95).use_lsh
+        assert knowledge_base._SemanticQueryCache(max_size=100_000, threshold=0.95).use_lsh
+
+
+class TestListDocuments:
+    @pytest_asyncio.fixture
+    async def corpus(self, kb):
+        """Five documents with known types, tags and creation times"""
+        specs = [
+            ("a", DocumentType.FAQ, ["trust"], 1),
+            ("b", DocumentType.GUIDANCE, ["trust", "conflict"], 2),
+            ("c", DocumentType.FAQ, ["conflict"], 3),
+            ("d", DocumentType.RESEARCH, [], 4),
+            ("e", DocumentType.FAQ, ["trust"], 5),
+        ]
+        ids = {}
+        for title, doc_type, tags, day in specs:
+            doc_id = await kb.add_document(
+                title=title, content=f"Body of {title}.", document_type=doc_type, tags=tags or None
+            )
+            kb._unindex_document(kb.documents[doc_id])
+            kb.documents[doc_id].created_at = datetime(2024, 1, day, tzinfo=timezone.utc)
+            kb.documents[doc_id].tags = tags
+            kb.documents[doc_id].refresh_tag_set()
+            kb._index_document(kb.documents[doc_id])
+            ids[title] = doc_id
+        return ids
+
+    @staticmethod
+    def titles(documents):
+        return [document.title for document in documents]
+
+    @pytest.mark.asyncio
+    async def test_newest_first_with_pagination(self, kb, corpus):
+        """Documents come newest first and offset/limit page through them"""
+        assert self.titles(await kb.list_documents()) == ["e", "d", "c", "b", "a"]
+        assert self.titles(await kb.list_documents(limit=2, offset=1)) == ["d", "c"]
+        assert await kb.list_documents(limit=0) == []
+
+    @pytest.mark.asyncio
+    async def test_filters_combine(self, kb, corpus):
+        """Type, tag and date filters intersect"""
+        filters = SearchFilters(document_types=["faq"], tags=["trust", "conflict"])
+        assert self.titles(await kb.list_documents(filters)) == ["e", "c", "a"]
+
+        filters = SearchFilters(
+            tags=["trust"],
+            date_from=datetime(2024, 1, 2, tzinfo=timezone.utc),
+            date_to=datetime(2024, 1, 4, tzinfo=timezone.utc),
+        )
+        assert self.titles(await kb.list_documents(filters)) == ["b"]
+
+    @pytest.mark.asyncio
+    async def test_indexes_follow_updates_and_deletes(self, kb, corpus):
+        """Changing or deleting a document updates the indexes"""
+        await kb.update_document(corpus["d"], document_type=DocumentType.FAQ, tags=["trust"])
+        await kb.delete_document(corpus["e"])
+
+        filters = SearchFilters(document_types=["faq"], tags=["trust"])
+        assert self.titles(await kb.list_documents(filters)) == ["d", "a"]
+        assert self.titles(await kb.list_documents(SearchFilters(document_types=["research"]))) == []
+
+    @pytest.mark.asyncio
+    async def test_chunk_filter_with_other_filters(self, kb, corpus):
+        """has_chunks is applied in the same pass as the index filters and paging"""
+        for title in ("b", "c", "e"):
+            document = kb.documents[corpus[title]]
+            kb._set_status(document, document.status, chunk_count=3)
+
+        filters = SearchFilters(tags=["trust", "conflict"], has_chunks=True)
+        assert self.titles(await kb.list_documents(filters)) == ["e", "c", "b"]
+        assert self.titles(await kb.list_documents(filters, limit=1, offset=1)) == ["c"]
+        assert self.titles(await kb.list_documents(SearchFilters(has_chunks=False))) == ["d", "a"]
+        assert self.titles(await kb.list_documents(limit=1, offset=-3)) == ["e"]
+
+        await kb.delete_document(corpus["c"])
+        assert self.titles(await kb.list_documents(filters)) == ["e", "b"]
+
+    @pytest.mark.asyncio
+    async def test_heap_selection_matches_walk(self, kb, corpus, monkeypatch):
+        """Selecting the page from a bounded heap returns the same documents as the date walk"""
+        kb._set_status(kb.documents[corpus["c"]], ProcessingStatus.INDEXED, chunk_count=3)
+        cases = [
+            (SearchFilters(document_types=["faq"]), 2, 0),
+            (SearchFilters(document_types=["faq"]), 2, 1),
+            (SearchFilters(tags=["trust"], date_to=datetime(2024, 1, 4, tzinfo=timezone.utc)), 5, 0),
+            (SearchFilters(document_types=["faq"], has_chunks=False), 5, 0),
+        ]
+        walked = [self.titles(await kb.list_documents(*case)) for case in cases]
+        monkeypatch.setattr(knowledge_base, "_HEAP_SELECT_RATIO", 0.1)
+        assert [self.titles(await kb.list_documents(*case)) for case in cases] == walked
+        assert walked == [["e", "c"], ["c", "a"], ["b", "a"], ["e", "a"]]
+
+    @pytest.mark.asyncio
+    async def test_total_counts_all_matches(self, kb, corpus):
+        """The total equals the number of matches however the page is cut"""
+        kb._set_status(kb.documents[corpus["b"]], ProcessingStatus.INDEXED, chunk_count=3)
+        day = lambda n: datetime(2024, 1, n, tzinfo=timezone.utc)
+        cases = [
+            None,
+            SearchFilters(document_types=["faq"]),
+            SearchFilters(tags=["trust"], date_from=day(2)),
+            SearchFilters(tags=["trust"], date_from=day(2), date_to=day(2)),
+            SearchFilters(has_chunks=False, date_to=day(3)),
+            SearchFilters(has_chunks=True),
+            SearchFilters(date_from=day(2), date_to=day(4)),
+            SearchFilters(date_from=day(4), date_to=day(2)),
+        ]
+        for filters in cases:
+            matches = await kb.list_documents(filters, limit=100)
+            total, page = await kb.list_documents_with_total(filters, limit=1, offset=1)
+            assert total == len(matches)
+            assert page == matches[1:2]
+
+    @pytest.mark.asyncio
+    async def test_tag_sets_filter_narrow_candidates(self, kb, corpus):
+        """A narrow type filter checks per-document tag sets instead of unioning postings"""
+        filters = SearchFilters(document_types=["guidance", "research"], tags=["conflict", "trust"])
+        assert self.titles(await kb.list_documents(filters)) == ["b"]
+
+        await kb.update_document(corpus["d"], tags=["conflict", "conflict"])
+        assert kb.documents[corpus["d"]]._tag_set == frozenset({"conflict"})
+        assert self.titles(await kb.list_documents(filters)) == ["d", "b"]
+
+
+class TestStatistics:
+    @staticmethod
+    def recount(kb):
+        """Statistics computed by scanning every document"""
+        docs = list(kb.documents.values())
+        by_status, by_type, by_file_type = {}, {}, {}
+        for doc in docs:
+            by_status[doc.status.value] = by_status.get(doc.status.value, 0) + 1
+            by_type[doc.document_type.value] = by_type.get(doc.document_type.value, 0) + 1
+            if doc.file_type:
+                by_file_type[doc.file_type] = by_file_type.get(doc.file_type, 0) + 1
+        return {
+            "total_documents": len(docs),
+            "total_size_bytes": sum(doc.file_size or 0 for doc in docs),
+            "total_chunks": sum(doc.chunk_count for doc in docs),
+            "distribution": {"by_status": by_status, "by_type": by_type, "by_file_type": by_file_type},
+        }
+
+    @staticmethod
+    def comparable(stats):
+        return {key: stats[key] for key in ("total_documents", "total_size_bytes", "total_chunks", "distribution")}
+
+    @pytest.mark.asyncio
+    async def test_counters_match_full_scan(self, kb):
+        """Aggregates stay equal to a full recount through every mutation"""
+        first = await kb.add_document(title="Guide", content="How to listen.")
+        second = await kb.add_document(title="notes.md", file_data=b"# Notes\nTrust.", auto_process=False)
+        assert self.comparable(await kb.get_statistics()) == self.recount(kb)
+
+        await kb.process_document(second)
+        await kb.update_document(first, document_type=DocumentType.FAQ)
+        assert self.comparable(await kb.get_statistics()) == self.recount(kb)
+
+        await kb.delete_document(first)
+        stats = await kb.get_statistics()
+        assert self.comparable(stats) == self.recount(kb)
+        assert stats["indexed_percentage"] == 100
+
+    @pytest.mark.asyncio
+    async def test_string_document_types_normalized(self, kb):
+        """Document types given as strings are stored and counted as enums"""
+        doc_id = await kb.add_document(title="Q", content="Why?", document_type="faq")
+        assert kb.documents[doc_id].document_type is DocumentType.FAQ
+
+        await kb.update_document(doc_id, document_type="research")
+        assert kb.documents[doc_id].document_type is DocumentType.RESEARCH
+        assert (await kb.get_statistics())["distribution"]["by_type"] == {"research": 1}
+
+    @pytest.mark.asyncio
+    async def test_vector_count_cached(self, kb, vector_service, monkeypatch):
+        """The vector count is fetched once per TTL window"""
+        calls = []
+        original = vector_service.get_document_count
+
+        async def counting():
+            calls.append(1)
+            return await original()
+
+        monkeypatch.setattr(vector_service, "get_document_count", counting)
+        await kb.get_statistics()
+        await kb.get_statistics()
+        assert len(calls) == 1
+
+        monkeypatch.setattr(knowledge_base, "_VECTOR_COUNT_TTL", 0)
+        kb._vector_count = None
+        await kb.get_statistics()
+        await kb.get_statistics()
+        assert len(calls) == 3
+
+    @pytest.mark.asyncio
+    async def test_vector_store_failure_keeps_statistics(self, kb, vector_service, monkeypatch):
+        """A failing vector count is reported as the last known value, not an empty result"""
+        await kb.add_document(title="Guide", content="How to listen.")
+        assert (await kb.get_statistics())["vector_count"] == len(vector_service.indexed)
+
+        async def failing():
+            raise ConnectionError("vector store down")
+
+        monkeypatch.setattr(vector_service, "get_document_count", failing)
+        kb._vector_count = (0, 7)
+        stats = await kb.get_statistics()
+        assert stats["total_documents"] == 1
+        assert stats["vector_count"] == 7
+
+
+class TestHealthCheck:
+    @pytest.mark.asyncio
+    async def test_probe_and_result_cached(self, kb, vector_service, monkeypatch):
+        """Healthy results are reused within the TTL and the round-trip probe runs rarely"""
+        status = await kb.health_check()
+        assert status["status"] == "healthy"
+        assert vector_service.index_calls == 1
+        assert kb.documents == {}
+
+        await kb.add_document(title="Guide", content="How to listen.")
+        cached = await kb.health_check()
+        assert cached["document_count"] == 1
+        assert vector_service.index_calls == 2
+
+        # Past the TTL the checks run again, but the probe waits for its own interval
+        monkeypatch.setattr(knowledge_base, "_HEALTH_CHECK_TTL", 0)
+        kb._last_health = None
+        await kb.health_check()
+        assert vector_service.index_calls == 2
+
+        monkeypatch.setattr(knowledge_base, "_HEALTH_PROBE_INTERVAL", 0)
+        await kb.health_check()
+        assert vector_service.index_calls == 3
+
+    @pytest.mark.asyncio
+    async def test_unhealthy_result_not_cached(self, kb, vector_service, monkeypatch):
+        """An unhealthy vector service is re-checked on the next call"""
+        async def unhealthy():
+            return {"status": "unhealthy"}
+
+        monkeypatch.setattr(vector_service, "health_check", unhealthy)
+        assert (await kb.health_check())["status"] == "unhealthy"
+        assert vector_service.index_calls == 0
+
+        monkeypatch.undo()
+        assert (await kb.health_check())["status"] == "healthy"
+
+
+class TestHandleKbErrors:
+    @pytest.mark.asyncio
+    async def test_error_response_by_method_name(self):
+        """The fallback response follows the wrapped method's name prefix"""
+        def failing(name):
+            async def method(self):
+                raise ValueError("boom")
+            method.__name__ = name
+            return knowledge_base.handle_kb_errors(method)
+
+        assert await failing("search_documents")(None) == []
+        assert await failing("get_document")(None) is None
+        assert await failing("process_document")(None) == {"success": False, "error": "boom", "error_type": "ValueError"}
+        assert await failing("delete_document")(None) == {"success": False, "error": "boom"}
+
+
+class TestEnrichSearchResults:
+    @pytest.mark.asyncio
+    async def test_enriches_from_parent_documents(self, kb):
+        """Chunk results are enriched from their parent document; unknown IDs pass through"""
+        doc_id = await kb.add_document(title="Guide", content="How to listen.", tags=["listening"], auto_process=False)
+        results = [
+            SearchResult(document_id=f"{doc_id}_chunk_0", content="How", metadata={"document_id": doc_id}, similarity_score=0.9),
+            SearchResult(document_id=doc_id, content="How to listen.", metadata={}, similarity_score=0.8),
+            SearchResult(document_id="missing", content="?", metadata={}, similarity_score=0.1),
+        ]
+
+        enriched = await kb.enrich_search_results(results)
+
+        assert [r.document_id for r in enriched] == [f"{doc_id}_chunk_0", doc_id, "missing"]
+        for result in enriched[:2]:
+            assert result.metadata["title"] == "Guide"
+            assert result.metadata["tags"] == ["listening"]
+            assert result.metadata["document_type"] == kb.documents[doc_id].document_type.value
+        assert enriched[0].metadata["document_id"] == doc_id
+        assert enriched[2] is results[2]
+
+    @pytest.mark.asyncio
+    async def test_projection_cached_until_update(self, kb):
+        """The per-document projection is built once and rebuilt after an update"""
+        doc_id = await kb.add_document(title="Guide", content="How to listen.", auto_process=False)
+        result = SearchResult(document_id=doc_id, content="How", metadata={}, similarity_score=0.9)
+
+        await kb.enrich_search_results([result])
+        projection = kb.documents[doc_id]._search_projection
+        await kb.enrich_search_results([result])
+        assert kb.documents[doc_id]._search_projection is projection
+
+        await kb.update_document(doc_id, title="Listening guide", metadata={"category": "skills"})
+        [enriched] = await kb.enrich_search_results([result])
+        assert enriched.metadata["title"] == "Listening guide"
+        assert enriched.metadata["category"] == "skills"
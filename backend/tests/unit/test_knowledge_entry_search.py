@@ -0,0 +1,87 @@
+"""
+Tests for the in-memory knowledge entry service (services.knowledge_base_service)
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# Add backend to path
+backend_path = Path(__file__).parent.parent.parent
+if str(backend_path) not in sys.path:
+    sys.path.insert(0, str(backend_path))
+
+from services.knowledge_base_service import KnowledgeBaseService, KnowledgeEntry
+
+
+@pytest.fixture
+def service():
+    return KnowledgeBaseService()
+
+
+async def add(service, title, content, **fields):
+    return await service.add_entry(KnowledgeEntry(title=title, content=content, **fields))
+
+
+def scan(service, query):
+    """Reference result: the substring scan search_entries used to do"""
+    query_lower = query.lower()
+    return [entry.id for entry in service.entries.values()
+            if entry.is_active and (query_lower in entry.title.lower() or query_lower in entry.content.lower())]
+
+
+class TestSearchEntries:
+    @pytest.mark.asyncio
+    async def test_substring_matches_equal_scan(self, service):
+        """The trigram index returns exactly the substring matches, in insertion order"""
+        await add(service, "Active Listening", "Reflect feelings back before replying.")
+        await add(service, "Conflict", "Take a break when the discussion escalates.")
+        await add(service, "Trust", "Rebuild trust with small, consistent actions.")
+        for query in ["listen", "LISTEN", "re", "a", "", "escalat", "ing back", "trust w", "zzz", "g b"]:
+            assert [e.id for e in await service.search_entries(query)] == scan(service, query)
+
+    @pytest.mark.asyncio
+    async def test_category_and_tag_filters(self, service):
+        """Category and tag filters narrow the matches like the per-entry checks did"""
+        first = await add(service, "Trust", "Keep promises.", category="skills", tags=["trust"])
+        second = await add(service, "Repair", "Keep calm and apologise.", category="skills", tags=["repair"])
+        third = await add(service, "Conflict", "Keep it short.", category="conflict", tags=["repair", "trust"])
+
+        assert [e.id for e in await service.search_entries("keep", category="skills")] == [first, second]
+        assert [e.id for e in await service.search_entries("keep", tags=["trust", "missing"])] == [first, third]
+        assert [e.id for e in await service.search_entries("k", category="conflict", tags=["repair"])] == [third]
+        assert await service.search_entries("keep", category="skills", tags=["missing"]) == []
+
+    @pytest.mark.asyncio
+    async def test_index_follows_updates_and_deletes(self, service):
+        """Updated text is searchable, replaced text is not, deleted entries are hidden"""
+        first = await add(service, "Boundaries", "Say no kindly.")
+        second = await add(service, "Repair", "Apologise sincerely.")
+
+        await service.update_entry(first, {"content": "Name your limits clearly."})
+        assert await service.search_entries("kindly") == []
+        assert [e.id for e in await service.search_entries("limits")] == [first]
+
+        await service.delete_entry(second)
+        assert await service.search_entries("apologise") == []
+
+
+class TestEntryIndexes:
+    @pytest.mark.asyncio
+    async def test_category_and_tag_lookups_follow_changes(self, service):
+        """Lookups return active entries in insertion order and follow updates, deletes and re-adds"""
+        first = await add(service, "Trust", "Keep promises.", category="skills", tags=["trust"])
+        second = await add(service, "Repair", "Apologise sincerely.", category="skills", tags=["trust", "repair"])
+        third = await add(service, "Conflict", "Take a break.", category="conflict", tags=["repair"])
+
+        assert [e.id for e in await service.get_entries_by_category("skills")] == [first, second]
+        assert [e.id for e in await service.get_entries_by_tag("repair")] == [second, third]
+
+        await service.delete_entry(first)
+        await service.update_entry(second, {"category": "conflict", "tags": ["repair"]})
+        assert await service.get_entries_by_category("skills") == []
+        assert [e.id for e in await service.get_entries_by_category("conflict")] == [second, third]
+        assert await service.get_entries_by_tag("trust") == []
+
+        # Re-adding an entry does not duplicate it
+        await service.add_entry(service.entries[third])
+        assert [e.id for e in await service.get_entries_by_tag("repair")] == [second, third]
@@ -0,0 +1,97 @@
+"""
+Tests for VectorSearchService batched embedding and chunk indexing
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# Add backend to path
+backend_path = Path(__file__).parent.parent.parent
+if str(backend_path) not in sys.path:
+    sys.path.insert(0, str(backend_path))
+
+from services.knowledge_base import DocumentChunk
+from services.vector_search import VectorSearchService
+
+
+@pytest.fixture
+def vector_service():
+    return VectorSearchService(vector_provider="memory", embedding_provider="simple")
+
+
+def make_chunks(texts):
+    chunks, offset = [], 0
+    for i, text in enumerate(texts):
+        chunks.append(DocumentChunk(
+            chunk_id=str(i), content=text, chunk_index=i, total_chunks=len(texts),
+            start_char=offset, end_char=offset + len(text), metadata={}
+        ))
+        offset += len(text) + 1
+    return chunks
+
+
+class TestGenerateEmbeddings:
+    @pytest.mark.asyncio
+    async def test_batch_matches_single_embeddings(self, vector_service):
+        """Batched embeddings equal per-text embeddings, blanks become zero vectors"""
+        texts = ["trust", "  ", "communication"]
+        batch = await vector_service.generate_embeddings(texts)
+        assert batch == [await vector_service.generate_embedding(text) for text in texts]
+        assert not any(batch[1])
+
+
+class TestIndexChunks:
+    @pytest.mark.asyncio
+    async def test_chunks_stored_with_chunk_metadata(self, vector_service):
+        """Each chunk is stored under its chunk ID with its position"""
+        chunks = make_chunks(["First part.", "Second part."])
+        assert await vector_service.index_chunks("doc", chunks, {"title": "Guide"})
+
+        assert set(vector_service.memory_store) == {"doc_chunk_0", "doc_chunk_1"}
+        second = vector_service.memory_store["doc_chunk_1"]
+        assert second["content"] == "Second part."
+        assert second["metadata"]["title"] == "Guide"
+        assert second["metadata"]["chunk_index"] == 1
+        assert second["metadata"]["total_chunks"] == 2
+        assert second["embedding"] == await vector_service.generate_embedding("Second part.")
+
+    @pytest.mark.asyncio
+    async def test_single_chunk_stored_under_document_id(self, vector_service):
+        """An unchunked document keeps its own ID, like index_document"""
+        assert await vector_service.index_chunks("doc", make_chunks(["Only part."]))
+        assert list(vector_service.memory_store) == ["doc"]
+        assert "is_chunk" not in vector_service.memory_store["doc"]["metadata"]
+
+    @pytest.mark.asyncio
+    async def test_blank_document_not_indexed(self, vector_service):
+        """Documents without text are rejected"""
+        assert not await vector_service.index_chunks("doc", make_chunks(["   "]))
+        assert vector_service.memory_store == {}
+
+
+class TestCloneVectors:
+    @pytest.mark.asyncio
+    async def test_clone_copies_chunks_with_new_metadata(self, vector_service):
+        """Cloned chunks keep their embeddings under the target's IDs"""
+        await vector_service.index_chunks("src", make_chunks(["First part.", "Second part."]),
+                                          {"title": "Old", "owner": "alice"})
+
+        assert await vector_service.clone_vectors("src", "dst", {"title": "New"})
+
+        source = vector_service.memory_store["src_chunk_1"]
+        target = vector_service.memory_store["dst_chunk_1"]
+        assert target["embedding"] == source["embedding"]
+        assert target["content"] == "Second part."
+        assert target["metadata"]["document_id"] == "dst"
+        assert target["metadata"]["title"] == "New"
+        assert target["metadata"]["chunk_index"] == 1
+        assert target["metadata"]["total_chunks"] == 2
+        assert target["metadata"]["is_chunk"] is True
+        assert "owner" not in target["metadata"]
+        assert source["metadata"]["title"] == "Old"
+
+    @pytest.mark.asyncio
+    async def test_clone_of_unknown_document_fails(self, vector_service):
+        """Nothing to copy means the caller must embed"""
+        assert not await vector_service.clone_vectors("missing", "dst")
+        assert vector_service.memory_store == {}